@@ -0,0 +1,90 @@
+# benchmarks/bench_lidar.py
+# Compare the vectorized RayCaster and the sphere-traced SDF lidar against the original per-pixel loop.
+#   python benchmarks/bench_lidar.py --rays 8 64 128 --ray-dist 80 200 --sizes 700x500 2800x2000
+import argparse
+import itertools
+import math
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "scripts"))
+from rl_env import WarehouseNavEnv  # noqa: E402
+
+
+def loop_lidar(env):
+    """Reference implementation: the original nested Python loop from WarehouseNavEnv._lidar_rays."""
+    rays = []
+    start = env.heading - math.pi / 2
+    end = env.heading + math.pi / 2
+    for ang in np.linspace(start, end, env.num_rays):
+        hit = env.RAY_DIST
+        for d in range(env.ROBOT_R, env.RAY_DIST):
+            x = int(env.pos[0] + math.cos(ang) * d)
+            y = int(env.pos[1] + math.sin(ang) * d)
+            if not env._in_bounds(x, y) or env.inflated_mask[y, x] > 0:
+                hit = d
+                break
+        rays.append(hit / env.RAY_DIST)
+    return np.array(rays, dtype=np.float32)
+
+
+def sample_poses(env, n, seed=0):
+    """Random collision-free poses on the env's current map."""
+    rng = np.random.default_rng(seed)
+    poses = []
+    while len(poses) < n:
+        x, y = rng.uniform(0, env.W), rng.uniform(0, env.H)
+        if not env._collides_xy(int(x), int(y)):
+            poses.append((np.array([x, y], dtype=np.float32), float(rng.uniform(0, 2 * math.pi))))
+    return poses
+
+
+def time_per_call(fn, env, poses, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for pos, heading in poses:
+            env.pos, env.heading = pos, heading
+            fn()
+        best = min(best, time.perf_counter() - t0)
+    return best / len(poses)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Lidar ray casting: Python loop vs RayCaster vs SphereTracer")
+    ap.add_argument("--rays", type=int, nargs="+", default=[8, 64, 128])
+    ap.add_argument("--ray-dist", type=int, nargs="+", default=[80, 200, 400])
+    ap.add_argument("--sizes", nargs="+", default=["700x500"], help="map sizes as WIDTHxHEIGHT")
+    ap.add_argument("--poses", type=int, default=200)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    print(f"{'map':>10} {'rays':>5} {'dist':>5} {'loop us':>10} {'numpy us':>10} {'sdf us':>10} "
+          f"{'speedup':>8} {'max |diff|':>10}")
+    for size, n, dist in itertools.product(args.sizes, args.rays, args.ray_dist):
+        width, height = (int(v) for v in size.lower().split("x"))
+        env = WarehouseNavEnv(width, height, num_rays=n, ray_dist=dist)
+        env.reset(seed=42)
+        poses = sample_poses(env, args.poses)
+
+        # parity on every pose (float rounding can move a hit by one sample at most)
+        diff = 0.0
+        for pos, heading in poses:
+            env.pos, env.heading = pos, heading
+            diff = max(diff, float(np.abs(loop_lidar(env) - env._lidar_rays()).max()))
+
+        t_loop = time_per_call(lambda: loop_lidar(env), env, poses, args.repeat)
+        t_vec = time_per_call(env._lidar_rays, env, poses, args.repeat)
+
+        sdf_env = WarehouseNavEnv(width, height, num_rays=n, ray_dist=dist, lidar="sdf")
+        sdf_env.reset(seed=42)
+        t_sdf = time_per_call(sdf_env._lidar_rays, sdf_env, sample_poses(sdf_env, args.poses), args.repeat)
+        print(f"{size:>10} {n:>5} {dist:>5} {t_loop * 1e6:>10.1f} {t_vec * 1e6:>10.1f} {t_sdf * 1e6:>10.1f} "
+              f"{t_loop / t_vec:>7.1f}x {diff:>10.4f}")
+
+
+if __name__ == "__main__":
+    main()
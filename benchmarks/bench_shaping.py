@@ -0,0 +1,94 @@
+# benchmarks/bench_shaping.py
+# Wall-clock time and timesteps for PPO to reach a target success rate, with straight-line vs
+# geodesic (GoalField) reward shaping and optional goal-field observation features.
+#   python benchmarks/bench_shaping.py --target 0.8 --budget 200000 --seeds 0 1 2
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "scripts"))
+from vec_env import WarehouseNavVecEnv  # noqa: E402
+
+CONFIGS = {
+    "euclidean": dict(shaping="euclidean"),
+    "geodesic": dict(shaping="geodesic"),
+    "geodesic+features": dict(shaping="geodesic", goal_features=True),
+}
+
+
+def success_rate(model, env: WarehouseNavVecEnv) -> float:
+    """Run one stochastic episode per eval robot; fraction that reached the goal."""
+    obs = env.reset()
+    done = np.zeros(env.num_envs, dtype=bool)
+    success = np.zeros(env.num_envs, dtype=bool)
+    while not done.all():
+        actions, _ = model.predict(obs, deterministic=False)
+        obs, rewards, dones, _ = env.step(actions)
+        new = dones & ~done
+        success[new] = rewards[new] > 50.0  # only the goal bonus gets a step above +50
+        done |= dones
+    return float(success.mean())
+
+
+def time_to_target(name: str, args, seed: int) -> dict:
+    from stable_baselines3 import PPO
+    from stable_baselines3.common.vec_env import VecMonitor
+
+    cfg = CONFIGS[name]
+    t_build = time.perf_counter()
+    env = VecMonitor(WarehouseNavVecEnv(args.n_envs, **cfg))
+    eval_env = WarehouseNavVecEnv(args.eval_episodes, **cfg)
+    t_build = time.perf_counter() - t_build  # includes the one-off GoalField sweep for geodesic configs
+    model = PPO("MlpPolicy", env, n_steps=args.n_steps, batch_size=64, learning_rate=3e-4,
+                gamma=0.99, seed=seed, verbose=0, device="cpu")
+    train_s, rate, reached = 0.0, 0.0, None
+    while model.num_timesteps < args.budget:
+        t0 = time.perf_counter()
+        model.learn(total_timesteps=args.eval_every, reset_num_timesteps=False)
+        train_s += time.perf_counter() - t0
+        rate = success_rate(model, eval_env)
+        if rate >= args.target:
+            reached = model.num_timesteps
+            break
+    env.close()
+    return dict(config=name, seed=seed, steps=reached, seconds=train_s + t_build if reached else None,
+                final_rate=rate)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="PPO time-to-target success rate: euclidean vs geodesic shaping")
+    ap.add_argument("--configs", nargs="+", choices=list(CONFIGS), default=list(CONFIGS))
+    ap.add_argument("--seeds", type=int, nargs="+", default=[0, 1, 2], help="PPO seeds per config")
+    ap.add_argument("--target", type=float, default=0.8, help="stochastic success rate to reach")
+    ap.add_argument("--budget", type=int, default=200_000, help="max timesteps per run")
+    ap.add_argument("--eval-every", type=int, default=8192, help="timesteps between evaluations")
+    ap.add_argument("--eval-episodes", type=int, default=32)
+    ap.add_argument("--n-envs", type=int, default=8)
+    ap.add_argument("--n-steps", type=int, default=256, help="PPO rollout length per env")
+    args = ap.parse_args()
+
+    print(f"{'config':<20} {'seed':>4} {'steps':>9} {'seconds':>9} {'final':>6}")
+    results = []
+    for name in args.configs:
+        for seed in args.seeds:
+            r = time_to_target(name, args, seed)
+            results.append(r)
+            steps = f"{r['steps']:>9d}" if r["steps"] else f"{'>' + str(args.budget):>9}"
+            secs = f"{r['seconds']:>9.1f}" if r["seconds"] else f"{'-':>9}"
+            print(f"{name:<20} {seed:>4} {steps} {secs} {r['final_rate']:>6.2f}")
+
+    print(f"\nmedian to {args.target:.0%} success (runs that missed the budget count as the budget):")
+    for name in args.configs:
+        rs = [r for r in results if r["config"] == name]
+        steps = np.median([r["steps"] or args.budget for r in rs])
+        hit = sum(r["steps"] is not None for r in rs)
+        secs = [r["seconds"] for r in rs if r["seconds"]]
+        sec = f"{np.median(secs):.1f} s" if secs else "-"
+        print(f"  {name:<20} {steps:>9.0f} steps  {sec:>9}  ({hit}/{len(rs)} reached)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+# benchmarks/run_benchmarks.py
+# Environment throughput suite. Writes JSON results and can compare against a previous run:
+#   python benchmarks/run_benchmarks.py --out bench.json
+#   python benchmarks/run_benchmarks.py --out new.json --compare bench.json --threshold 0.10
+import argparse
+import itertools
+import json
+import platform
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "scripts"))
+from map_cache import MapCache  # noqa: E402
+from rl_env import WarehouseNavEnv  # noqa: E402
+from vec_env import WarehouseNavVecEnv  # noqa: E402
+
+
+def best_of(fn, number: int, repeat: int) -> float:
+    """Best mean seconds per call of fn over `repeat` runs of `number` calls."""
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        best = min(best, (time.perf_counter() - t0) / number)
+    return best
+
+
+def parse_size(size: str):
+    w, h = size.lower().split("x")
+    return int(w), int(h)
+
+
+# --------- cases ----------
+# each case yields (name, value, unit, higher_is_better)
+
+def bench_reset(cfg):
+    for size in cfg.sizes:
+        W, H = parse_size(size)
+        env = WarehouseNavEnv(W, H, map_cache=MapCache(max_bytes=0))
+        seeds = itertools.count()  # a new seed every call, so each reset generates its map
+        cold = best_of(lambda: env.reset(seed=next(seeds)), cfg.n, cfg.repeat)
+        yield f"reset.cold[{size}]", cold * 1e3, "ms", False
+        env = WarehouseNavEnv(W, H, map_cache=MapCache())
+        env.reset(seed=1)
+        yield f"reset.cached[{size}]", best_of(lambda: env.reset(seed=1), cfg.n, cfg.repeat) * 1e3, "ms", False
+
+
+def bench_step(cfg):
+    for size, rays in itertools.product(cfg.sizes, cfg.rays):
+        W, H = parse_size(size)
+        env = WarehouseNavEnv(W, H, num_rays=rays)
+        env.reset(seed=1)
+        actions = itertools.cycle(np.random.default_rng(0).integers(0, 3, 997))
+
+        def step():
+            *_, term, trunc, _ = env.step(next(actions))
+            if term or trunc:
+                env.reset(seed=1)
+
+        yield f"step[{size},rays={rays}]", 1.0 / best_of(step, cfg.n * 10, cfg.repeat), "steps/s", True
+
+
+def bench_lidar(cfg):
+    for size, rays, lidar in itertools.product(cfg.sizes, cfg.rays, ("raycast", "sdf", "boxes")):
+        W, H = parse_size(size)
+        env = WarehouseNavEnv(W, H, num_rays=rays, lidar=lidar)
+        env.reset(seed=1)
+        yield (f"lidar.{lidar}[{size},rays={rays}]",
+               best_of(env._lidar_rays, cfg.n * 10, cfg.repeat) * 1e6, "us", False)
+
+
+def bench_render(cfg):
+    # headless frame composition (rgb_array), the same path a recording takes
+    for size in cfg.sizes:
+        W, H = parse_size(size)
+        env = WarehouseNavEnv(W, H, render_mode="rgb_array")
+        env.reset(seed=1)
+        yield f"render[{size}]", best_of(env.render, cfg.n, cfg.repeat) * 1e3, "ms", False
+
+
+def bench_vec(cfg):
+    from stable_baselines3.common.vec_env import DummyVecEnv
+
+    for n_envs in cfg.n_envs:
+        actions = np.random.default_rng(0).integers(0, 3, (cfg.n, n_envs))
+        for kind in ("native", "dummy"):
+            if kind == "native":
+                venv = WarehouseNavVecEnv(n_envs)
+            else:
+                venv = DummyVecEnv([WarehouseNavEnv for _ in range(n_envs)])
+            venv.reset()
+            it = itertools.cycle(actions)
+            dt = best_of(lambda: venv.step(next(it)), cfg.n, cfg.repeat)
+            venv.close()
+            yield f"vec.{kind}[n_envs={n_envs}]", n_envs / dt, "env-steps/s", True
+
+
+def bench_ppo(cfg):
+    from stable_baselines3 import PPO
+    from stable_baselines3.common.vec_env import VecMonitor
+
+    for n_envs in (4, 64):
+        env = VecMonitor(WarehouseNavVecEnv(n_envs))
+        n_steps = max(2048 // n_envs, 16)
+        model = PPO("MlpPolicy", env, n_steps=n_steps, batch_size=64, verbose=0, device="cpu")
+        total = n_steps * n_envs * cfg.ppo_rollouts
+        t0 = time.perf_counter()
+        model.learn(total_timesteps=total)
+        yield f"ppo[n_envs={n_envs}]", total / (time.perf_counter() - t0), "steps/s", True
+        env.close()
+
+
+CASES = {
+    "reset": bench_reset,
+    "step": bench_step,
+    "lidar": bench_lidar,
+    "render": bench_render,
+    "vec": bench_vec,
+    "ppo": bench_ppo,
+}
+
+
+# --------- results / compare ----------
+def metadata() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "commit": commit,
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+    }
+
+
+def compare(new: dict, old: dict, threshold: float) -> list:
+    """Print a change table; return names of metrics that regressed by more than threshold."""
+    regressions = []
+    print(f"\n{'metric':<40} {'old':>12} {'new':>12} {'change':>8}")
+    for name, r in new["results"].items():
+        if name not in old["results"]:
+            continue
+        before, after = old["results"][name]["value"], r["value"]
+        change = (after - before) / before if before else 0.0
+        # positive "worse" means slower, whichever direction the metric runs
+        worse = -change if r["higher_is_better"] else change
+        flag = "  REGRESSION" if worse > threshold else ""
+        if flag:
+            regressions.append(name)
+        print(f"{name:<40} {before:>12.3f} {after:>12.3f} {change:>+7.1%}{flag}")
+    return regressions
+
+
+def main():
+    ap = argparse.ArgumentParser(description="WarehouseNavEnv benchmark suite")
+    ap.add_argument("--only", nargs="+", choices=list(CASES), default=list(CASES))
+    ap.add_argument("--sizes", nargs="+", default=["700x500", "1400x1000"], help="map sizes as WIDTHxHEIGHT")
+    ap.add_argument("--rays", type=int, nargs="+", default=[8, 64])
+    ap.add_argument("--n-envs", type=int, nargs="+", default=[1, 16, 256])
+    ap.add_argument("--n", type=int, default=50, help="calls per timing run (steps use 10x)")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--ppo-rollouts", type=int, default=2)
+    ap.add_argument("--out", default=None, help="write results JSON here")
+    ap.add_argument("--compare", default=None, help="baseline results JSON to compare against")
+    ap.add_argument("--threshold", type=float, default=0.10, help="relative slowdown counted as a regression")
+    cfg = ap.parse_args()
+
+    results = {}
+    for case in cfg.only:
+        for name, value, unit, higher in CASES[case](cfg):
+            results[name] = {"value": value, "unit": unit, "higher_is_better": higher}
+            print(f"{name:<40} {value:>12.3f} {unit}")
+
+    report = {"meta": metadata(), "results": results}
+    if cfg.out:
+        Path(cfg.out).write_text(json.dumps(report, indent=2))
+        print(f"\nResults written to {cfg.out}")
+
+    if cfg.compare:
+        old = json.loads(Path(cfg.compare).read_text())
+        regressions = compare(report, old, cfg.threshold)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s) beyond {cfg.threshold:.0%}")
+            sys.exit(1)
+        print(f"\n✅ No regressions beyond {cfg.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
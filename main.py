@@ -1,10 +1,121 @@
-import torch
-import gymnasium as gym
-import cv2
-import numpy as np
-
-print("✅ Environment ready!")
-print("PyTorch version:", torch.__version__)
-print("Gymnasium version:", gym.__version__)
-print("OpenCV version:", cv2.__version__)
-print("NumPy version:", np.__version__)
+# main.py: one entry point for the project's scripts.
+#   python main.py train --timesteps 200000        python main.py eval --seeds 2000
+#   python main.py publish --dry-run --count 3     python main.py --import-times simulate --headless
+# Only the chosen command's script is loaded (with its own imports), so lightweight commands never
+# pay for torch / cv2 / gymnasium. --import-times re-runs the command under `python -X importtime`
+# and prints where its start-up time went.
+import os
+import runpy
+import sys
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# command -> (script, help)
+COMMANDS = {
+    "train": ("scripts/train_rl_agent.py", "train the PPO agent (checkpointed, resumable)"),
+    "eval": ("scripts/evaluate.py", "evaluate a policy over seeded maps; promotion gate"),
+    "simulate": ("scripts/robot_simulation.py", "planner-driven robot demo (window or --headless --record)"),
+    "agent": ("scripts/test_trained_agent.py", "run the trained agent in one rendered episode"),
+    "publish": ("scripts/robot_publisher.py", "publish one robot's telemetry to AWS IoT (--dry-run to print)"),
+    "fleet": ("scripts/fleet_publisher.py", "simulated fleet publishing through a connection pool"),
+    "ingest": ("scripts/telemetry_ingest.py", "micro-batched telemetry ingestion benchmark"),
+    "aggregate": ("scripts/fleet_aggregator.py", "rolling-window fleet telemetry metrics service / load benchmark"),
+    "serve": ("scripts/policy_server.py", "batched policy inference server under load"),
+    "traj": ("scripts/trajectory_store.py", "record / replay / benchmark memory-mapped episode trajectories"),
+    "bench": ("benchmarks/run_benchmarks.py", "environment benchmark suite (JSON, regression compare)"),
+}
+IMPORT_TIMES_ENV = "WAREHOUSE_IMPORT_TIMES"
+
+
+def usage() -> str:
+    width = max(map(len, COMMANDS)) + 2
+    lines = ["usage: python main.py [--import-times] COMMAND [args...]", "", "commands:"]
+    lines += [f"  {name:<{width}}{help_}" for name, (_, help_) in COMMANDS.items()]
+    lines += [f"  {'env':<{width}}print library versions (imports torch, gymnasium, cv2, numpy)",
+              "", "python main.py COMMAND --help shows the command's own options"]
+    return "\n".join(lines)
+
+
+def print_versions():
+    import cv2
+    import gymnasium as gym
+    import numpy as np
+    import torch
+
+    print("✅ Environment ready!")
+    print("PyTorch version:", torch.__version__)
+    print("Gymnasium version:", gym.__version__)
+    print("OpenCV version:", cv2.__version__)
+    print("NumPy version:", np.__version__)
+
+
+def run(command: str, args):
+    """Execute the command's script as __main__ with args, as if it had been started directly."""
+    script = os.path.join(ROOT, COMMANDS[command][0])
+    sys.argv = [script] + list(args)
+    sys.path.insert(0, os.path.join(ROOT, "scripts"))
+    if os.path.dirname(script) != sys.path[0]:
+        sys.path.insert(0, os.path.dirname(script))
+    runpy.run_path(script, run_name="__main__")
+
+
+# --------- import-time breakdown ----------
+def parse_importtime(lines):
+    """`-X importtime` stderr lines -> {top-level package: cumulative us} for modules imported at depth 0."""
+    totals = {}
+    for line in lines:
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if name.startswith("   "):  # nested import, already counted in its importer's cumulative time
+            continue
+        pkg = name.strip().split(".")[0]
+        totals[pkg] = totals.get(pkg, 0) + int(cumulative)
+    return totals
+
+
+def import_times(argv, top: int = 15) -> int:
+    """Run `main.py argv` under -X importtime, pass its output through, then print the breakdown."""
+    import subprocess
+
+    env = dict(os.environ, **{IMPORT_TIMES_ENV: "1"})
+    proc = subprocess.Popen([sys.executable, "-X", "importtime", os.path.join(ROOT, "main.py")] + argv,
+                            stderr=subprocess.PIPE, text=True, env=env)
+    timings = []
+    for line in proc.stderr:
+        if line.startswith("import time:"):
+            timings.append(line)
+        else:
+            sys.stderr.write(line)
+    code = proc.wait()
+
+    totals = parse_importtime(timings)
+    total = sum(totals.values())
+    print(f"\nimport time of `{' '.join(argv)}`: {total / 1e3:.1f} ms in {len(totals)} top-level packages")
+    print(f"{'package':<28} {'ms':>8} {'share':>6}")
+    for pkg, us in sorted(totals.items(), key=lambda kv: -kv[1])[:top]:
+        print(f"{pkg:<28} {us / 1e3:>8.1f} {us / total:>6.1%}")
+    return code
+
+
+def main(argv):
+    if argv[:1] == ["--import-times"]:
+        if not os.environ.get(IMPORT_TIMES_ENV):
+            sys.exit(import_times(argv[1:]))
+        argv = argv[1:]
+    if not argv or argv[0] in ("-h", "--help"):
+        print(usage())
+        return
+    command, args = argv[0], argv[1:]
+    if command == "env":
+        print_versions()
+    elif command in COMMANDS:
+        run(command, args)
+    else:
+        print(usage(), file=sys.stderr)
+        sys.exit(f"\nunknown command: {command!r}")
+
+
+# worker processes (spawn) re-import this module, so commands only run from the entry point
+if __name__ == "__main__":
+    main(sys.argv[1:])
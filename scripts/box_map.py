@@ -0,0 +1,342 @@
+import argparse
+import math
+import time
+from typing import Optional, Sequence
+
+import numpy as np
+
+from collision import supercover
+from lidar import RayCaster
+
+_FAR = 1e12  # coordinates of the padding box that empty index slots point at
+
+
+class BoxMap:
+    """
+    Axis-aligned box obstacles of one or more maps (layers) with a uniform-grid index, answering
+    robot-radius queries analytically instead of on a pixel mask:
+    - boxes[l] is an (B, 4) array of solid [x1, x2) x [y1, y2) rectangles in continuous map
+      coordinates (cv2.rectangle(x1, y1, x2, y2) fills [x1, x2 + 1) x [y1, y2 + 1))
+    - a robot of radius robot_r is blocked within robot_r of a box (the box's rounded Minkowski
+      sum) or with its center outside [0, W) x [0, H); no inflation mask, no hollow interiors
+    - every rounded box is bucketed into the cell x cell px grid cells it overlaps; a query only
+      tests the boxes of the cells it passes through, all queries of a batch in one NumPy pass
+    """
+
+    def __init__(self, boxes: Sequence[np.ndarray], width: int, height: int, robot_r: float, cell: int = 64):
+        self.W, self.H = width, height
+        self.robot_r = float(robot_r)
+        self.cell = cell
+        self.nx, self.ny = -(-width // cell), -(-height // cell)
+        L = len(boxes)
+        B = max((len(b) for b in boxes), default=0)
+        # one padding box far outside every map: empty index slots point at index B
+        self.boxes = np.full((L, B + 1, 4), _FAR)
+        self.boxes[:, :, 2:] += 1.0
+        buckets = [[[] for _ in range(self.nx * self.ny)] for _ in range(L)]
+        r = self.robot_r
+        for l, layer in enumerate(boxes):
+            layer = np.asarray(layer, dtype=np.float64).reshape(-1, 4)
+            self.boxes[l, :len(layer)] = layer
+            for i, (x1, y1, x2, y2) in enumerate(layer):
+                cx0, cx1 = self._cell_range(x1 - r, x2 + r, self.nx)
+                cy0, cy1 = self._cell_range(y1 - r, y2 + r, self.ny)
+                for cy in range(cy0, cy1 + 1):
+                    for cx in range(cx0, cx1 + 1):
+                        buckets[l][cy * self.nx + cx].append(i)
+        K = max((len(c) for layer in buckets for c in layer), default=0)
+        self.table = np.full((L, self.ny, self.nx, max(K, 1)), B, dtype=np.int32)
+        for l, layer in enumerate(buckets):
+            flat = self.table[l].reshape(-1, self.table.shape[-1])
+            for c, ids in enumerate(layer):
+                flat[c, :len(ids)] = ids
+        # boxes / table are views of the first `layers` rows of these; append() grows them
+        self._boxes_buf, self._table_buf = self.boxes, self.table
+
+    def _cell_range(self, lo: float, hi: float, n: int):
+        return min(max(int(lo // self.cell), 0), n - 1), min(max(int(hi // self.cell), 0), n - 1)
+
+    @property
+    def layers(self) -> int:
+        return self.boxes.shape[0]
+
+    # --------- construction ----------
+    @classmethod
+    def from_rects(cls, rects, width: int, height: int, robot_r: float, cell: int = 64) -> "BoxMap":
+        """One layer from inclusive pixel rectangles (x1, y1, x2, y2) as drawn by cv2.rectangle."""
+        r = np.asarray(rects, dtype=np.float64).reshape(-1, 4) + (0, 0, 1, 1)
+        return cls([r], width, height, robot_r, cell)
+
+    @classmethod
+    def from_mask(cls, mask: np.ndarray, robot_r: float, cell: int = 64) -> "BoxMap":
+        """
+        One layer from an obstacle (or edge) mask: the bounding box of every outer contour.
+        Exact for rectangular obstacles; other shapes become their (conservative) bounding boxes.
+        """
+        import cv2
+
+        contours, _ = cv2.findContours((np.asarray(mask) > 0).astype(np.uint8), cv2.RETR_EXTERNAL,
+                                       cv2.CHAIN_APPROX_SIMPLE)
+        rects = [cv2.boundingRect(c) for c in contours]
+        boxes = np.array([(x, y, x + w, y + h) for x, y, w, h in rects], dtype=np.float64).reshape(-1, 4)
+        H, W = mask.shape
+        return cls([boxes], W, H, robot_r, cell)
+
+    @classmethod
+    def stack(cls, maps: Sequence["BoxMap"]) -> "BoxMap":
+        """Several same-sized single- or multi-layer maps as one multi-layer map (layer order kept)."""
+        m0 = maps[0]
+        boxes = [layer[:-1][layer[:-1, 0] < _FAR] for m in maps for layer in m.boxes]
+        return cls(boxes, m0.W, m0.H, m0.robot_r, m0.cell)
+
+    def append(self, other: "BoxMap") -> "BoxMap":
+        """
+        Add other's layers after this map's, in place (same size, robot_r and cell). Existing layers
+        keep their index; storage grows geometrically, so appending one map per new seed stays
+        linear. Every box row past a layer's own boxes is a padding box, so index slots of either map
+        still point at padding when the box or slot dimension widens. Returns self.
+        """
+        if (other.W, other.H, other.robot_r, other.cell) != (self.W, self.H, self.robot_r, self.cell):
+            raise ValueError("BoxMap.append needs maps of the same size, robot_r and cell")
+        L, n = self.layers, other.layers
+        B = max(self.boxes.shape[1], other.boxes.shape[1])
+        K = max(self.table.shape[-1], other.table.shape[-1])
+        cap = len(self._boxes_buf)
+        if L + n > cap or B > self._boxes_buf.shape[1] or K > self._table_buf.shape[-1]:
+            cap = max(2 * cap, L + n) if L + n > cap else cap
+            boxes = np.full((cap, B, 4), _FAR)
+            boxes[..., 2:] += 1.0
+            boxes[:L, :self.boxes.shape[1]] = self.boxes
+            table = np.full((cap, self.ny, self.nx, K), B - 1, dtype=np.int32)
+            table[:L, ..., :self.table.shape[-1]] = self.table
+            self._boxes_buf, self._table_buf = boxes, table
+        self._boxes_buf[L:L + n] = _FAR
+        self._boxes_buf[L:L + n, :, 2:] += 1.0
+        self._boxes_buf[L:L + n, :other.boxes.shape[1]] = other.boxes
+        self._table_buf[L:L + n] = B - 1
+        self._table_buf[L:L + n, ..., :other.table.shape[-1]] = other.table
+        self.boxes, self.table = self._boxes_buf[:L + n], self._table_buf[:L + n]
+        return self
+
+    # --------- geometry ----------
+    def _candidates(self, cx: np.ndarray, cy: np.ndarray, layer: np.ndarray) -> np.ndarray:
+        """(N, C) index cells -> (N, C*K, 4) boxes registered in them (padding box where empty)."""
+        cx = np.clip(cx, 0, self.nx - 1)
+        cy = np.clip(cy, 0, self.ny - 1)
+        ids = self.table[layer[:, None], cy, cx].reshape(len(cx), -1)
+        return self.boxes[layer[:, None], ids]
+
+    def _layer(self, layer, n: int) -> np.ndarray:
+        return np.zeros(n, dtype=np.intp) if layer is None else np.broadcast_to(np.asarray(layer, dtype=np.intp), (n,))
+
+    def _first_hit(self, ox, oy, dx, dy, b, t_lo: float, t_hi: np.ndarray) -> np.ndarray:
+        """
+        Smallest t in [t_lo, t_hi] at which o + t * d is inside one of the rounded boxes b (inf if
+        none). o, d, t_hi are (N,), b is (N, M, 4). Candidates are first culled by a slab test on the
+        box grown by r; only the survivors are tested against the rounded box's pieces (the box
+        widened by r, the box heightened by r, four corner discs), whose union it is.
+        """
+        r = self.robot_r
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ix, iy = (1.0 / dx)[:, None], (1.0 / dy)[:, None]
+            t_in, t_out = _slab(ox[:, None], oy[:, None], ix, iy,
+                                b[..., 0] - r, b[..., 1] - r, b[..., 2] + r, b[..., 3] + r)
+        n, m = np.nonzero((t_in <= t_out) & (t_out >= t_lo) & (t_in <= t_hi[:, None]))
+        best = np.full(len(ox), np.inf)
+        if len(n) == 0:
+            return best
+        ox, oy, dx, dy, ix, iy = ox[n], oy[n], dx[n], dy[n], ix[n, 0], iy[n, 0]
+        x1, y1, x2, y2 = b[n, m].T
+
+        def first(t_in, t_out):
+            return np.where((t_in <= t_out) & (t_out >= t_lo), np.maximum(t_in, t_lo), np.inf)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t = np.minimum(first(*_slab(ox, oy, ix, iy, x1 - r, y1, x2 + r, y2)),
+                           first(*_slab(ox, oy, ix, iy, x1, y1 - r, x2, y2 + r)))
+        a = np.maximum(dx * dx + dy * dy, 1e-12)
+        for cx, cy in ((x1, y1), (x2, y1), (x1, y2), (x2, y2)):
+            fx, fy = ox - cx, oy - cy
+            half_b = fx * dx + fy * dy
+            disc = half_b * half_b - a * (fx * fx + fy * fy - r * r)
+            s = np.sqrt(np.maximum(disc, 0.0))
+            t_c = first(np.where(disc >= 0, (-half_b - s) / a, np.inf), (-half_b + s) / a)
+            t = np.minimum(t, t_c)
+        np.minimum.at(best, n, t)
+        return best
+
+    def _outside(self, x, y) -> np.ndarray:
+        return (x < 0) | (x >= self.W) | (y < 0) | (y >= self.H)
+
+    # --------- queries ----------
+    def collides(self, x, y, layer=None) -> np.ndarray:
+        """True where a robot centered at (x, y) overlaps an obstacle or leaves the map."""
+        x, y = (np.atleast_1d(np.asarray(v, dtype=np.float64)) for v in (x, y))
+        layer = self._layer(layer, len(x))
+        cx, cy = (x // self.cell).astype(np.intp)[:, None], (y // self.cell).astype(np.intp)[:, None]
+        b = self._candidates(cx, cy, layer)
+        px, py = x[:, None], y[:, None]
+        ddx = np.maximum(np.maximum(b[..., 0] - px, px - b[..., 2]), 0.0)
+        ddy = np.maximum(np.maximum(b[..., 1] - py, py - b[..., 3]), 0.0)
+        return self._outside(x, y) | (ddx * ddx + ddy * ddy < self.robot_r ** 2).any(axis=1)
+
+    def swept_collides(self, x0, y0, x1, y1, layer=None) -> np.ndarray:
+        """True for each move (x0, y0) -> (x1, y1) that touches an obstacle anywhere along the way."""
+        x0, y0, x1, y1 = (np.atleast_1d(np.asarray(v, dtype=np.float64)) for v in (x0, y0, x1, y1))
+        layer = self._layer(layer, len(x0))
+        c = self.cell
+        cx, cy = supercover(x0 / c, y0 / c, x1 / c, y1 / c)
+        b = self._candidates(cx, cy, layer)
+        hit = self._first_hit(x0, y0, x1 - x0, y1 - y0, b, 0.0, np.ones(len(x0))) <= 1.0
+        return hit | self._outside(x0, y0) | self._outside(x1, y1)
+
+    def ray_distances(self, x, y, angles, r_min: float, r_max: float, layer=None) -> np.ndarray:
+        """
+        Distance along each ray (x, y, angle) to the first blocked point at or beyond r_min, capped
+        at r_max: the analytic counterpart of sampling a ray on the inflated mask.
+        """
+        x, y, angles = (np.atleast_1d(np.asarray(v, dtype=np.float64)) for v in (x, y, angles))
+        layer = self._layer(layer, len(x))
+        dx, dy = np.cos(angles), np.sin(angles)
+        c = self.cell
+        cx, cy = supercover(x / c, y / c, (x + dx * r_max) / c, (y + dy * r_max) / c)
+        b = self._candidates(cx, cy, layer)
+        first = self._first_hit(x, y, dx, dy, b, r_min, np.full(len(x), float(r_max)))
+        # leaving the map counts as a hit where the ray crosses its border
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ex = np.where(dx > 0, (self.W - x) / dx, np.where(dx < 0, -x / dx, np.inf))
+            ey = np.where(dy > 0, (self.H - y) / dy, np.where(dy < 0, -y / dy, np.inf))
+        exit_t = np.where(self._outside(x, y), 0.0, np.minimum(ex, ey))
+        return np.minimum(np.minimum(first, np.maximum(exit_t, r_min)), r_max)
+
+
+def _slab(ox, oy, ix, iy, lx, ly, hx, hy):
+    """Ray parameter interval [t_in, t_out] inside the rectangle [lx, hx] x [ly, hy] (i = 1 / d)."""
+    tx0, tx1 = (lx - ox) * ix, (hx - ox) * ix
+    ty0, ty1 = (ly - oy) * iy, (hy - oy) * iy
+    # fmin/fmax skip the nan of 0 * inf (ray exactly on a slab boundary)
+    return np.fmax(np.fmin(tx0, tx1), np.fmin(ty0, ty1)), np.fmin(np.fmax(tx0, tx1), np.fmax(ty0, ty1))
+
+
+class BoxRayCaster(RayCaster):
+    """RayCaster's fan and outputs (normalized distances, r_min..r_max) computed on a BoxMap."""
+
+    def cast(self, boxes: BoxMap, pos, heading: float) -> np.ndarray:
+        d = boxes.ray_distances(np.full(self.num_rays, float(pos[0])), np.full(self.num_rays, float(pos[1])),
+                                heading + self.fan, self.r_min, self.r_max)
+        return (d / self.r_max).astype(np.float32)
+
+    def cast_batch(self, boxes: BoxMap, pos: np.ndarray, headings: np.ndarray,
+                   layer: Optional[np.ndarray] = None) -> np.ndarray:
+        pos = np.asarray(pos, dtype=np.float64)
+        n, k = len(pos), self.num_rays
+        angles = np.asarray(headings, dtype=np.float64)[:, None] + self.fan[None, :]
+        lay = None if layer is None else np.repeat(np.asarray(layer, dtype=np.intp), k)
+        d = boxes.ray_distances(np.repeat(pos[:, 0], k), np.repeat(pos[:, 1], k), angles.reshape(-1),
+                                self.r_min, self.r_max, lay)
+        return (d / self.r_max).astype(np.float32).reshape(n, k)
+
+
+# --------- checks / benchmark ----------
+if __name__ == "__main__":
+    from collision import swept_collides
+    from map_cache import MapKey, _rectangles, generate_map
+
+    ap = argparse.ArgumentParser(description="Analytic box-map queries: exactness and speed vs pixel masks")
+    ap.add_argument("--robots", type=int, default=256)
+    ap.add_argument("--rays", type=int, default=8)
+    ap.add_argument("--ray-dist", type=int, nargs="+", default=[80, 400])
+    ap.add_argument("--maps", nargs="+", default=["700x500:10", "8000x8000:500", "20000x20000:300"],
+                    help="maps as WIDTHxHEIGHT:OBSTACLES")
+    args = ap.parse_args()
+
+    # exact geometry: one box [100, 200) x [100, 200), robot radius 10
+    bm = BoxMap([np.array([[100, 100, 200, 200]])], 400, 300, 10)
+    assert bm.collides([91, 89, 150, 205, 208], [150, 150, 150, 207, 208]).tolist() == [True, False, True, True, False]
+    d = bm.ray_distances([50, 50, 150, 50], [150, 50, 20, 150], [0, math.pi / 4, math.pi / 2, math.pi], 0, 500)
+    assert np.allclose(d, [40, math.hypot(50, 50) - 10, 70, 50]), d
+    assert bm.swept_collides([80, 50], [150, 89], [95, 300], [150, 89]).tolist() == [True, False]
+    print("exact geometry OK")
+
+    # the grid index returns the same answers as testing every box (one cell = brute force)
+    rng = np.random.default_rng(0)
+    key = MapKey(7, 2000, 1500, 10, 200)
+    rects = _rectangles(key)
+    idx = BoxMap.from_rects(rects, key.width, key.height, 10)
+    brute = BoxMap.from_rects(rects, key.width, key.height, 10, cell=4096)
+    n = 20000
+    x, y = rng.uniform(-5, key.width + 5, n), rng.uniform(-5, key.height + 5, n)
+    ang = rng.uniform(0, 2 * math.pi, n)
+    x1, y1 = x + 30 * np.cos(ang), y + 30 * np.sin(ang)
+    assert (idx.collides(x, y) == brute.collides(x, y)).all()
+    assert (idx.swept_collides(x, y, x1, y1) == brute.swept_collides(x, y, x1, y1)).all()
+    assert np.allclose(idx.ray_distances(x, y, ang, 10, 300), brute.ray_distances(x, y, ang, 10, 300))
+    print(f"grid index matches brute force ({n} points, segments, rays)")
+
+    # append() one map at a time answers like stack() over all of them (layers of different widths)
+    maps = [BoxMap.from_rects(_rectangles(MapKey(s, 2000, 1500, 10, 20 + 40 * (s % 3))), 2000, 1500, 10)
+            for s in range(7)]
+    grown = BoxMap.stack(maps[:1])
+    for m in maps[1:]:
+        grown.append(m)
+    stacked = BoxMap.stack(maps)
+    layer = rng.integers(0, len(maps), n)
+    assert grown.layers == len(maps) and maps[0].layers == 1
+    assert (grown.collides(x, y, layer) == stacked.collides(x, y, layer)).all()
+    assert (grown.swept_collides(x, y, x1, y1, layer) == stacked.swept_collides(x, y, x1, y1, layer)).all()
+    assert np.allclose(grown.ray_distances(x, y, ang, 10, 300, layer), stacked.ray_distances(x, y, ang, 10, 300, layer))
+    print("append() matches stack()")
+
+    # from_mask recovers the generator's rectangles; agreement with the pixel inflated mask
+    wmap = generate_map(MapKey(3, 700, 500, 10, 10))
+    from_edges = BoxMap.from_mask(wmap.obstacle_mask, 10)
+    exact = BoxMap.from_rects(_rectangles(wmap.key), 700, 500, 10)
+    x, y = rng.uniform(0, 700, n), rng.uniform(0, 500, n)
+    a, b = from_edges.collides(x, y), exact.collides(x, y)
+    assert not (b & ~a).any(), "contour boxes must cover the generator's boxes"
+    print(f"from_mask vs generator boxes: {(a == b).mean():.2%} agree (overlapping obstacles merge into one "
+          f"contour and become its bounding box)")
+    # away from box interiors (hollow in the Canny edge mask) the two should differ only on the rim
+    # the pixel kernel rounds off
+    r = np.array(_rectangles(wmap.key), dtype=np.float64)
+    interior = ((x[:, None] >= r[:, 0]) & (x[:, None] < r[:, 2] + 1) &
+                (y[:, None] >= r[:, 1]) & (y[:, None] < r[:, 3] + 1)).any(axis=1)
+    pixel = wmap.inflated_mask[y.astype(int), x.astype(int)] > 0
+    agree = (pixel == exact.collides(x, y))[~interior].mean()
+    print(f"pixel inflated mask vs analytic outside box interiors: {agree:.2%} agree\n")
+
+    # dense masks for the small map, TiledGrids (the repo's large-map occupancy) for the big ones
+    print(f"{'map':<18} {'build ms':>17} {'MiB':>15} {'dist':>5} {'rays us/robot':>17} {'swept us/move':>15}")
+    print(f"{'':<18} {'mask':>8} {'boxes':>8} {'mask':>7} {'boxes':>7} {'':>5} {'mask':>8} {'boxes':>8} "
+          f"{'mask':>7} {'boxes':>7}")
+    for spec in args.maps:
+        size, n_obst = spec.split(":")
+        W, H = map(int, size.split("x"))
+        key = MapKey(11, W, H, 10, int(n_obst), tiled=W * H > 4000 * 4000)
+        t0 = time.perf_counter()
+        wmap = generate_map(key)
+        t1 = time.perf_counter()
+        boxes = BoxMap.from_rects(_rectangles(key), W, H, 10)
+        t2 = time.perf_counter()
+        mask_mb = wmap.inflated_mask.nbytes / 2 ** 20
+        box_mb = (boxes.boxes.nbytes + boxes.table.nbytes) / 2 ** 20
+        pos = np.stack([rng.uniform(0, W, args.robots), rng.uniform(0, H, args.robots)], axis=1)
+        heads = rng.uniform(0, 2 * math.pi, args.robots)
+        ends = pos + 4 * np.stack([np.cos(heads), np.sin(heads)], axis=1)
+
+        def per_robot(fn, *a):
+            fn(*a)
+            t0 = time.perf_counter()
+            for _ in range(5):
+                fn(*a)
+            return (time.perf_counter() - t0) / 5 / args.robots * 1e6
+
+        swept = (per_robot(swept_collides, wmap.inflated_mask, pos[:, 0], pos[:, 1], ends[:, 0], ends[:, 1]),
+                 per_robot(boxes.swept_collides, pos[:, 0], pos[:, 1], ends[:, 0], ends[:, 1]))
+        for j, dist in enumerate(args.ray_dist):
+            rays = (per_robot(RayCaster(args.rays, 10, dist).cast_batch, wmap.inflated_mask, pos, heads),
+                    per_robot(BoxRayCaster(args.rays, 10, dist).cast_batch, boxes, pos, heads))
+            head = (f"{spec:<18} {(t1 - t0) * 1e3:>8.0f} {(t2 - t1) * 1e3:>8.1f} {mask_mb:>7.1f} {box_mb:>7.2f}"
+                    if j == 0 else f"{'':<18} {'':>17} {'':>15}")
+            tail = f"{swept[0]:>7.2f} {swept[1]:>7.2f}" if j == 0 else ""
+            print(f"{head} {dist:>5} {rays[0]:>8.2f} {rays[1]:>8.2f} {tail}")
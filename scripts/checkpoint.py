@@ -0,0 +1,255 @@
+import argparse
+import copy
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+import torch
+
+CKPT_RE = re.compile(r"ckpt_(\d+)\.pt$")
+
+
+# --------- model state ----------
+def snapshot(model) -> dict:
+    """
+    Everything needed to continue training model, copied so training can go on while it is written:
+    policy weights, optimizer moments, step/update counters, RNG states and VecNormalize statistics.
+    """
+    vn = model.get_vec_normalize_env()
+    return {
+        "num_timesteps": model.num_timesteps,
+        "n_updates": model._n_updates,
+        "policy": {k: v.detach().clone() for k, v in model.policy.state_dict().items()},
+        "optimizer": copy.deepcopy(model.policy.optimizer.state_dict()),
+        "rng": {"torch": torch.get_rng_state(), "numpy": np.random.get_state()},
+        "vec_normalize": None if vn is None else {
+            "obs_rms": copy.deepcopy(vn.obs_rms), "ret_rms": copy.deepcopy(vn.ret_rms)},
+    }
+
+
+def restore(model, state: dict):
+    """Load a snapshot() into a model built with the same policy/env configuration."""
+    model.policy.load_state_dict(state["policy"])
+    model.policy.optimizer.load_state_dict(state["optimizer"])
+    model.num_timesteps = state["num_timesteps"]
+    model._n_updates = state["n_updates"]
+    torch.set_rng_state(state["rng"]["torch"])
+    np.random.set_state(state["rng"]["numpy"])
+    vn = model.get_vec_normalize_env()
+    if state["vec_normalize"] is not None:
+        if vn is None:
+            raise ValueError("checkpoint has VecNormalize statistics but the env is not normalized")
+        vn.obs_rms = state["vec_normalize"]["obs_rms"]
+        vn.ret_rms = state["vec_normalize"]["ret_rms"]
+
+
+# --------- files ----------
+def checkpoints(directory) -> List[Path]:
+    """Complete checkpoints in directory, oldest first."""
+    d = Path(directory)
+    if not d.is_dir():
+        return []
+    found = [(int(m.group(1)), p) for p in d.iterdir() if (m := CKPT_RE.match(p.name))]
+    return [p for _, p in sorted(found)]
+
+
+def load_latest(directory) -> Optional[dict]:
+    paths = checkpoints(directory)
+    return torch.load(paths[-1], weights_only=False) if paths else None
+
+
+def resume_latest(model, directory) -> int:
+    """Restore the newest checkpoint in directory into model; returns its timestep (0 if none)."""
+    state = load_latest(directory)
+    if state is None:
+        return 0
+    restore(model, state)
+    return state["num_timesteps"]
+
+
+class CheckpointWriter:
+    """
+    Writes snapshot() dicts to directory from a background thread:
+    - submit(step, state) hands a snapshot over and returns at once; if the previous one is still
+      being written, a snapshot waiting behind it is replaced by the newer one (counted in skipped),
+      so training never waits on the disk
+    - each file is written under a temporary name and renamed into place, so a crash mid-write
+      never leaves a truncated ckpt_<step>.pt; after each write only the newest keep are retained
+    """
+
+    def __init__(self, directory, keep: int = 3):
+        self.dir = Path(directory)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.keep = keep
+        self.written = self.skipped = 0
+        self.write_s = 0.0
+        self._pending = None
+        self._busy = False
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="CheckpointWriter", daemon=True)
+        self._thread.start()
+
+    def submit(self, step: int, state: dict):
+        with self._cond:
+            if self._pending is not None:
+                self.skipped += 1
+            self._pending = (step, state)
+            self._cond.notify_all()
+
+    def flush(self):
+        """Block until every submitted snapshot is on disk."""
+        with self._cond:
+            self._cond.wait_for(lambda: self._pending is None and not self._busy)
+
+    def close(self):
+        self.flush()
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending is not None or self._closed)
+                if self._pending is None:
+                    return
+                (step, state), self._pending = self._pending, None
+                self._busy = True
+            t0 = time.perf_counter()
+            path = self.dir / f"ckpt_{step:012d}.pt"
+            tmp = path.with_suffix(".tmp")
+            torch.save(state, tmp)
+            os.replace(tmp, path)
+            self._prune()
+            with self._cond:
+                self.write_s += time.perf_counter() - t0
+                self.written += 1
+                self._busy = False
+                self._cond.notify_all()
+
+    def _prune(self):
+        for old in checkpoints(self.dir)[:-self.keep] if self.keep > 0 else []:
+            old.unlink(missing_ok=True)
+
+
+def make_checkpoint_callback(writer: CheckpointWriter, every: int, wait: bool = False):
+    """
+    SB3 callback submitting a snapshot at the start of the first rollout after every `every`
+    timesteps, i.e. right after the previous rollout's update (on_rollout_end runs before train(),
+    so a snapshot there would pair the pre-update policy with a step count that includes the
+    rollout), and at the end of training.
+    wait=True blocks until each write finishes (synchronous baseline for the benchmark).
+    """
+    from stable_baselines3.common.callbacks import BaseCallback
+
+    class CheckpointCallback(BaseCallback):
+        def __init__(self):
+            super().__init__()
+            self.snapshot_s = 0.0
+            self._next = None
+
+        def _on_training_start(self) -> None:
+            self._next = (self.num_timesteps // every + 1) * every
+
+        def _on_step(self) -> bool:
+            return True
+
+        def _on_rollout_start(self) -> None:
+            if self.num_timesteps >= self._next:
+                self._save()
+                self._next = (self.num_timesteps // every + 1) * every
+
+        def _on_training_end(self) -> None:
+            # the last rollout's update has no following rollout start
+            self._save()
+            writer.flush()
+
+        def _save(self):
+            t0 = time.perf_counter()
+            writer.submit(self.num_timesteps, snapshot(self.model))
+            if wait:
+                writer.flush()
+            self.snapshot_s += time.perf_counter() - t0
+
+    return CheckpointCallback()
+
+
+# --------- benchmark ----------
+if __name__ == "__main__":
+    import shutil
+    import tempfile
+
+    from stable_baselines3 import PPO
+    from stable_baselines3.common.vec_env import VecNormalize
+
+    from vec_env import WarehouseNavVecEnv
+
+    ap = argparse.ArgumentParser(description="Checkpoint overhead (steps/s) and resume check")
+    ap.add_argument("--timesteps", type=int, default=32768)
+    ap.add_argument("--every", type=int, default=2048, help="checkpoint interval in timesteps")
+    ap.add_argument("--n-envs", type=int, default=8)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    def new_model(seed=0):
+        env = VecNormalize(WarehouseNavVecEnv(args.n_envs))
+        return PPO("MlpPolicy", env, n_steps=256, batch_size=64, seed=seed, verbose=0, device="cpu")
+
+    root = Path(tempfile.mkdtemp(prefix="ckpt_bench_"))
+    try:
+        # resume: a fresh model restored from the latest checkpoint has identical training state
+        a = new_model()
+        with CheckpointWriter(root / "resume", keep=2) as w:
+            a.learn(4096, callback=make_checkpoint_callback(w, 1024))
+        assert len(checkpoints(root / "resume")) == 2, "retention"
+        # every checkpoint holds exactly the updates of the rollouts its step count covers
+        for path in checkpoints(root / "resume"):
+            state = torch.load(path, weights_only=False)
+            rollouts = state["num_timesteps"] // (a.n_steps * a.n_envs)
+            assert state["n_updates"] == rollouts * a.n_epochs, (path.name, state["n_updates"])
+        b = new_model(seed=1)
+        assert resume_latest(b, root / "resume") == a.num_timesteps
+        sa, sb = a.policy.state_dict(), b.policy.state_dict()
+        assert all(torch.equal(sa[k], sb[k]) for k in sa)
+        assert np.array_equal(a.get_vec_normalize_env().obs_rms.mean, b.get_vec_normalize_env().obs_rms.mean)
+        b.learn(1024, reset_num_timesteps=False)
+        print(f"resume OK at {a.num_timesteps} steps, continued to {b.num_timesteps}\n")
+
+        # steps/s is best of --repeat interleaved runs, but on a busy machine its noise is of the order
+        # of the overhead, so also report the share of wall time the training thread spent blocked in
+        # checkpointing and the share the writer thread was busy (competing for the CPU on one core)
+        best = {}
+        for _ in range(args.repeat):
+            for mode in ("none", "sync", "async"):
+                model = new_model()
+                writer = CheckpointWriter(root / mode, keep=3) if mode != "none" else None
+                cb = make_checkpoint_callback(writer, args.every, wait=mode == "sync") if writer else None
+                t0 = time.perf_counter()
+                model.learn(args.timesteps, callback=cb)
+                elapsed = time.perf_counter() - t0
+                rate = model.num_timesteps / elapsed
+                stats = (0, 0.0, 0.0)
+                if writer is not None:
+                    writer.close()
+                    stats = (writer.written + writer.skipped, cb.snapshot_s / elapsed, writer.write_s / elapsed)
+                if rate > best.get(mode, (0,))[0]:
+                    best[mode] = (rate, *stats)
+
+        base = best["none"][0]
+        print(f"{'mode':<8} {'steps/s':>9} {'vs none':>8} {'ckpts':>6} {'blocked':>8} {'writer':>7}")
+        for mode, (rate, n, blocked, busy) in best.items():
+            print(f"{mode:<8} {rate:>9.0f} {rate / base - 1:>+8.1%} {n:>6} {blocked:>8.2%} {busy:>7.2%}")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
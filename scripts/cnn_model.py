@@ -1,5 +1,8 @@
 # scripts/cnn_model.py
+import warnings
+import numpy as np
 import torch, torch.nn as nn
+from preprocess import FramePreprocessor
 
 class TinyObstacleCNN(nn.Module):
     def __init__(self):
@@ -13,3 +16,121 @@ def __init__(self):
         )
     def forward(self, x):
         return self.net(x)
+
+# --------- int8 quantization (CPU) ----------
+def _quant_engine():
+    engines = torch.backends.quantized.supported_engines
+    # x86 kernels on servers, qnnpack on ARM edge boxes
+    return next(e for e in ("x86", "fbgemm", "qnnpack") if e in engines)
+
+def quantize_dynamic(model):
+    """int8 weights for the Linear head; activations are quantized on the fly (convs stay fp32)."""
+    import torch.ao.quantization as tq
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")  # torch.ao.quantization deprecation notices
+        return tq.quantize_dynamic(model.eval(), {nn.Linear}, dtype=torch.qint8)
+
+def quantize_static(model, calibration):
+    """
+    Full int8 model: conv+relu pairs fused, activation ranges observed on a calibration batch
+    (float32 NCHW, as FramePreprocessor produces), then every layer converted to quantized kernels.
+    """
+    import copy
+    import torch.ao.quantization as tq
+    engine = _quant_engine()
+    torch.backends.quantized.engine = engine
+    wrapped = tq.QuantWrapper(copy.deepcopy(model).eval())
+    wrapped.qconfig = tq.get_default_qconfig(engine)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        tq.fuse_modules(wrapped.module, [["net.0", "net.1"], ["net.2", "net.3"]], inplace=True)
+        tq.prepare(wrapped, inplace=True)
+        with torch.inference_mode():
+            wrapped(torch.as_tensor(calibration))
+        tq.convert(wrapped, inplace=True)
+    return wrapped
+
+class ObstacleClassifier:
+    """
+    Batched obstacle classification for camera frames on CPU:
+    - N BGR frames are preprocessed into one preallocated float32 NCHW batch (FramePreprocessor)
+    - the CNN runs once per batch under torch.inference_mode, sharing memory with that buffer
+    - quantize=None | "dynamic" | "static" (int8; static needs calibration frames)
+    """
+    def __init__(self, model=None, weights=None, quantize=None, calibration=None,
+                 size=(84,84), max_batch=64):
+        model = model if model is not None else TinyObstacleCNN()
+        if weights is not None:
+            model.load_state_dict(torch.load(weights, map_location="cpu"))
+        model.eval()
+        self.preprocess = FramePreprocessor(size, max_batch)
+        if quantize == "dynamic":
+            model = quantize_dynamic(model)
+        elif quantize == "static":
+            if calibration is None or len(calibration) == 0:
+                raise ValueError("quantize='static' needs calibration frames")
+            model = quantize_static(model, self.preprocess(calibration).copy())
+        elif quantize is not None:
+            raise ValueError(f"Unknown quantize mode: {quantize!r} (expected None, 'dynamic' or 'static')")
+        self.model = model
+        self.quantize = quantize
+
+    def probs(self, frames_bgr):
+        """(N, 2) softmax of [no_obstacle, obstacle] for a list of BGR frames."""
+        if len(frames_bgr) == 0:
+            return np.empty((0, 2), dtype=np.float32)
+        x = torch.from_numpy(self.preprocess(frames_bgr))  # no copy
+        with torch.inference_mode():
+            return torch.softmax(self.model(x), dim=1).numpy()
+
+    def predict(self, frames_bgr):
+        """1 where a frame shows an obstacle, else 0."""
+        return self.probs(frames_bgr).argmax(axis=1)
+
+if __name__ == "__main__":
+    # per-frame loop vs batched fp32 / int8 on a tick of camera frames
+    import argparse, time
+    from preprocess import preprocess_frame
+
+    ap = argparse.ArgumentParser(description="TinyObstacleCNN batched/quantized inference timing")
+    ap.add_argument("--frames", type=int, default=32, help="camera frames per tick")
+    ap.add_argument("--size", default="640x480", help="camera resolution WIDTHxHEIGHT")
+    ap.add_argument("--repeat", type=int, default=20)
+    args = ap.parse_args()
+    w, h = map(int, args.size.split("x"))
+
+    rng = np.random.default_rng(0)
+    frames = []
+    for _ in range(args.frames):  # random boxes on a light floor
+        f = np.full((h, w, 3), 230, dtype=np.uint8)
+        for _ in range(rng.integers(0, 4)):
+            x1, y1 = rng.integers(0, w - 60), rng.integers(0, h - 60)
+            f[y1:y1 + rng.integers(20, 60), x1:x1 + rng.integers(20, 60)] = rng.integers(0, 255, 3)
+        frames.append(f)
+
+    torch.manual_seed(0)
+    model = TinyObstacleCNN().eval()
+
+    def per_frame():
+        with torch.no_grad():
+            return np.array([model(torch.from_numpy(preprocess_frame(f))[None]).argmax(1).item() for f in frames])
+
+    def best(fn):
+        fn()
+        ts = []
+        for _ in range(args.repeat):
+            t0 = time.perf_counter(); fn(); ts.append(time.perf_counter() - t0)
+        return min(ts) * 1e3
+
+    ref = per_frame()
+    print(f"{'path':<18} {'ms/tick':>8} {'cnn ms':>7} {'frames/s':>9} {'agree':>6}")
+    t = best(per_frame)
+    print(f"{'per-frame fp32':<18} {t:>8.2f} {'':>7} {args.frames / t * 1e3:>9.0f} {1.0:>6.2f}")
+    for q in (None, "dynamic", "static"):
+        clf = ObstacleClassifier(model, quantize=q, calibration=frames, max_batch=args.frames)
+        agree = (clf.predict(frames) == ref).mean()
+        t = best(lambda: clf.predict(frames))
+        x = torch.from_numpy(clf.preprocess(frames))
+        with torch.inference_mode():
+            t_cnn = best(lambda: clf.model(x))
+        print(f"{'batched ' + (q or 'fp32'):<18} {t:>8.2f} {t_cnn:>7.2f} {args.frames / t * 1e3:>9.0f} {agree:>6.2f}")
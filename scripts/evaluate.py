@@ -0,0 +1,275 @@
+import argparse
+import json
+import multiprocessing as mp
+import sys
+import time
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from policy_server import DEFAULT_MODEL, NumpyPolicy
+
+# one row per evaluated episode (one episode per map seed)
+EPISODE_DTYPE = np.dtype([
+    ("seed", np.int64),
+    ("success", np.bool_),
+    ("collided", np.bool_),
+    ("timeout", np.bool_),
+    ("steps", np.int32),
+    ("path_px", np.float32),      # distance travelled
+    ("shortest_px", np.float32),  # planned shortest distance to the goal radius; nan if the map has no path
+    ("efficiency", np.float32),   # shortest_px / path_px for successful episodes, else nan
+])
+
+START, GOAL_MARGIN, GOAL_R = (40.0, 40.0), 40.0, 20.0  # as WarehouseNavEnv.reset / step
+
+
+class EpisodeLog:
+    """
+    Columnar, append-only episode results: one raw little-endian file per EPISODE_DTYPE field plus
+    meta.json. append() writes each column straight through, so a killed run keeps everything
+    finished so far; read() memory-maps the columns back into a structured array.
+    """
+
+    def __init__(self, path: str, meta: Optional[dict] = None):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        for name in EPISODE_DTYPE.names:
+            (self.path / f"{name}.bin").unlink(missing_ok=True)
+        (self.path / "meta.json").write_text(json.dumps({
+            "columns": {n: EPISODE_DTYPE[n].str for n in EPISODE_DTYPE.names}, **(meta or {})}, indent=2))
+        self._files = {n: open(self.path / f"{n}.bin", "ab") for n in EPISODE_DTYPE.names}
+        self.rows = 0
+
+    def append(self, rows: np.ndarray):
+        for name, f in self._files.items():
+            f.write(np.ascontiguousarray(rows[name]).tobytes())
+            f.flush()
+        self.rows += len(rows)
+
+    def close(self):
+        for f in self._files.values():
+            f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @staticmethod
+    def read(path: str) -> np.ndarray:
+        path = Path(path)
+        cols = json.loads((path / "meta.json").read_text())["columns"]
+        data = {n: np.memmap(path / f"{n}.bin", dtype=dt, mode="r") if (path / f"{n}.bin").stat().st_size
+                else np.empty(0, dtype=dt) for n, dt in cols.items()}
+        n = min(len(c) for c in data.values())  # a column may be one chunk ahead if the writer died
+        out = np.empty(n, dtype=EPISODE_DTYPE)
+        for name in EPISODE_DTYPE.names:
+            out[name] = data[name][:n]
+        return out
+
+
+# --------- worker side ----------
+_WORKER = {}
+
+
+def _init_worker(layers, activation: str, obs_norm, env_kw: dict, deterministic: bool,
+                 map_pool: Optional[str] = None):
+    # pool_dir is set here, not inherited: spawn/forkserver workers start with a fresh map_cache module
+    if map_pool:
+        from map_cache import MAP_CACHE
+
+        MAP_CACHE.pool_dir = Path(map_pool)
+    _WORKER.update(policy=NumpyPolicy(layers, activation, obs_norm), env_kw=env_kw, deterministic=deterministic)
+
+
+def evaluate_seeds(first_seed: int, n: int) -> np.ndarray:
+    """
+    One episode on each map seed in [first_seed, first_seed + n): all n robots step together in one
+    WarehouseNavVecEnv, one batched forward pass per step, until every robot has finished.
+    """
+    from planner import PathPlanner, path_length
+    from vec_env import WarehouseNavVecEnv
+
+    policy, env_kw = _WORKER["policy"], _WORKER["env_kw"]
+    venv = WarehouseNavVecEnv(n, **env_kw)
+    W, H = venv.W, venv.H
+    goal = np.array([W - GOAL_MARGIN, H - GOAL_MARGIN])
+    rng = np.random.default_rng(first_seed)
+
+    out = np.zeros(n, dtype=EPISODE_DTYPE)
+    out["seed"] = np.arange(first_seed, first_seed + n)
+    venv.seed(first_seed)
+    obs = venv.reset()
+    pos = venv.pos.astype(np.float64)
+    running = np.ones(n, dtype=bool)
+    t = 0
+    while running.any():
+        actions = policy.act(obs, _WORKER["deterministic"], rng)
+        obs, rewards, dones, infos = venv.step(actions)
+        t += 1
+        # positions from the observation (goal - d * size); finished robots report their terminal obs
+        ended = np.flatnonzero(dones & running)
+        last = obs[:, :2].astype(np.float64)
+        for i in ended:
+            last[i] = infos[i]["terminal_observation"][:2]
+        new = goal - last * (W, H)
+        out["path_px"][running] += np.hypot(*(new - pos)[running].T)
+        pos = new
+
+        if ended.size:
+            success = rewards[ended] > 50.0  # only the goal bonus gets a step above +50
+            timeout = np.array([infos[i]["TimeLimit.truncated"] for i in ended])
+            out["success"][ended] = success
+            out["timeout"][ended] = timeout
+            out["collided"][ended] = ~success & ~timeout
+            out["steps"][ended] = t
+            running[ended] = False
+    venv.close()
+
+    # reference: any-angle planned path, minus the success radius the robot only has to enter
+    proto = venv.proto
+    for row in out:
+        proto._build_map(int(row["seed"]))
+        pts = PathPlanner(proto.inflated_mask).plan(START, tuple(goal), method="jps")
+        row["shortest_px"] = max(path_length(pts) - GOAL_R, 0.0) if pts is not None else np.nan
+    out["efficiency"] = np.where(out["success"], out["shortest_px"] / np.maximum(out["path_px"], 1e-6), np.nan)
+    return out
+
+
+def _chunks(first_seed: int, count: int, size: int) -> List[Tuple[int, int]]:
+    return [(s, min(size, first_seed + count - s)) for s in range(first_seed, first_seed + count, size)]
+
+
+def run_suite(policy: NumpyPolicy, first_seed: int, count: int, env_kw: dict, workers: int = 1,
+              chunk: int = 64, deterministic: bool = True, map_pool: Optional[str] = None) -> Iterator[np.ndarray]:
+    """Yield EPISODE_DTYPE results chunk by chunk (in completion order) as the worker processes finish them."""
+    init = ([(w.T, b) for w, b in policy.layers], policy.activation, policy.obs_norm, env_kw, deterministic, map_pool)
+    jobs = _chunks(first_seed, count, chunk)
+    if workers <= 1:
+        _init_worker(*init)
+        for job in jobs:
+            yield evaluate_seeds(*job)
+        return
+    with mp.get_context().Pool(workers, initializer=_init_worker, initargs=init) as pool:
+        yield from pool.imap_unordered(_evaluate_job, jobs)
+
+
+def _evaluate_job(job: Tuple[int, int]) -> np.ndarray:
+    return evaluate_seeds(*job)
+
+
+# --------- reports ----------
+def summarize(rows: np.ndarray) -> dict:
+    """Aggregate metrics -> {name: {"value", "higher_is_better"}} (benchmarks/run_benchmarks.py format)."""
+    ok = rows["success"]
+    solvable = np.isfinite(rows["shortest_px"])
+    eff = rows["efficiency"][ok]
+    steps = rows["steps"][ok]
+
+    def metric(value, higher):
+        return {"value": float(value), "higher_is_better": higher}
+
+    return {
+        "episodes": metric(len(rows), True),
+        "success_rate": metric(ok.mean(), True),
+        "success_rate_solvable": metric(ok[solvable].mean() if solvable.any() else 0.0, True),
+        "collision_rate": metric(rows["collided"].mean(), False),
+        "timeout_rate": metric(rows["timeout"].mean(), False),
+        "steps_to_goal_p50": metric(np.median(steps) if len(steps) else np.nan, False),
+        "steps_to_goal_p90": metric(np.percentile(steps, 90) if len(steps) else np.nan, False),
+        "path_efficiency_mean": metric(np.nanmean(eff) if len(eff) else np.nan, True),
+        "path_efficiency_p10": metric(np.nanpercentile(eff, 10) if len(eff) else np.nan, True),
+    }
+
+
+def print_report(results: dict, rows: np.ndarray, worst: int = 10):
+    for name, r in results.items():
+        print(f"{name:<24} {r['value']:>10.3f}")
+    failed = rows[~rows["success"] & np.isfinite(rows["shortest_px"])]
+    if len(failed):
+        kinds = np.where(failed["collided"], "collision", "timeout")
+        print(f"\nfailed solvable seeds (first {min(worst, len(failed))} of {len(failed)}): " +
+              ", ".join(f"{s}:{k}" for s, k in zip(failed["seed"][:worst], kinds[:worst])))
+
+
+def gate(results: dict, baseline: Optional[dict], min_success: float, tolerance: float) -> List[str]:
+    """Reasons to reject the candidate: success below min_success, or any rate metric worse than
+    the baseline report by more than tolerance (absolute)."""
+    reasons = []
+    if results["success_rate"]["value"] < min_success:
+        reasons.append(f"success_rate {results['success_rate']['value']:.3f} < {min_success:.3f}")
+    if baseline:
+        print(f"\n{'metric':<24} {'baseline':>10} {'candidate':>10} {'change':>8}")
+        for name, r in results.items():
+            old = baseline["results"].get(name)
+            if old is None or name == "episodes":
+                continue
+            change = r["value"] - old["value"]
+            worse = -change if r["higher_is_better"] else change
+            rate = name.endswith("_rate") or name.startswith("path_efficiency")
+            flag = "  REGRESSION" if rate and worse > tolerance else ""
+            if flag:
+                reasons.append(f"{name} {old['value']:.3f} -> {r['value']:.3f}")
+            print(f"{name:<24} {old['value']:>10.3f} {r['value']:>10.3f} {change:>+8.3f}{flag}")
+    return reasons
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Evaluate a trained policy headless over a suite of seeded maps")
+    ap.add_argument("--model", default=DEFAULT_MODEL)
+    ap.add_argument("--seeds", type=int, default=2000, help="number of maps (one episode each)")
+    ap.add_argument("--first-seed", type=int, default=100_000, help="keep away from the training seed (42)")
+    ap.add_argument("--workers", type=int, default=mp.cpu_count())
+    ap.add_argument("--chunk", type=int, default=64, help="maps per worker task (= batched robots)")
+    ap.add_argument("--stochastic", action="store_true", help="sample actions instead of argmax")
+    ap.add_argument("--collision", choices=["endpoint", "swept"], default="endpoint")
+    ap.add_argument("--goal-features", action="store_true", help="the model was trained with --goal-features")
+    ap.add_argument("--map-pool", default=None, help="directory of pre-generated maps (map_cache.py)")
+    ap.add_argument("--out", default="runs/eval", help="directory for the columnar episode log and report.json")
+    ap.add_argument("--compare", default=None, help="report.json of the current model to gate against")
+    ap.add_argument("--min-success", type=float, default=0.0,
+                    help="lowest acceptable success rate; with neither this nor --compare no gate runs")
+    ap.add_argument("--tolerance", type=float, default=0.02, help="allowed absolute drop in rate metrics")
+    args = ap.parse_args()
+
+    policy = NumpyPolicy.load(args.model)
+    num_rays = policy.obs_dim - 4 - 3 * args.goal_features
+    env_kw = dict(num_rays=num_rays, collision=args.collision, goal_features=args.goal_features)
+    meta = {"model": args.model, "first_seed": args.first_seed, "seeds": args.seeds,
+            "deterministic": not args.stochastic, "env": env_kw}
+
+    t0 = time.perf_counter()
+    with EpisodeLog(args.out, meta) as log:
+        for rows in run_suite(policy, args.first_seed, args.seeds, env_kw, args.workers, args.chunk,
+                              not args.stochastic, args.map_pool):
+            log.append(rows)
+            done = log.rows
+            print(f"\r{done}/{args.seeds} episodes  {done / (time.perf_counter() - t0):.1f}/s", end="", flush=True)
+    elapsed = time.perf_counter() - t0
+    print(f"\n{args.seeds} episodes in {elapsed:.1f} s ({args.workers} workers)\n")
+
+    rows = EpisodeLog.read(args.out)
+    results = summarize(rows)
+    print_report(results, rows)
+    report = {"meta": {**meta, "seconds": elapsed}, "results": results}
+    Path(args.out, "report.json").write_text(json.dumps(report, indent=2))
+
+    baseline = json.loads(Path(args.compare).read_text()) if args.compare else None
+    if baseline and any(baseline["meta"].get(k) != meta[k] for k in ("first_seed", "seeds", "env")):
+        print("\n⚠️ baseline was evaluated on a different suite; rates are not directly comparable")
+    if not baseline and args.min_success <= 0:
+        print("\nℹ️ No promotion gate configured (pass --compare and/or --min-success); results recorded only")
+        return
+    reasons = gate(results, baseline, args.min_success, args.tolerance)
+    if reasons:
+        print("\n❌ Not promotable: " + "; ".join(reasons))
+        sys.exit(1)
+    print("\n✅ Promotion gate passed")
+
+
+# worker processes re-import this module, so the suite only runs from the entry point
+if __name__ == "__main__":
+    main()
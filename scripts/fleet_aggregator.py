@@ -0,0 +1,512 @@
+import argparse
+import asyncio
+import threading
+import time
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from preprocess import BATTERY_RANGE, SPEED_RANGE
+from telemetry_ingest import TelemetryIngestor, parse_batch
+
+STATUS_TOPIC = "warehouse/+/status"
+
+# latest known state per robot; row i is device id i (TelemetryIngestor.devices)
+STATE_DTYPE = np.dtype([
+    ("battery", np.float32),  # percent
+    ("speed", np.float32),  # m/s
+    ("ts", np.int64),  # of the newest message; INT64_MIN before the first
+    ("messages", np.int64),
+    ("collisions", np.int64),  # lifetime
+])
+
+# per-window sums kept per bucket and as running totals; t is seconds since the aggregator's time base
+_N, _COLL, _T, _B, _TT, _TB = range(6)
+
+
+class FleetAggregator:
+    """
+    Rolling-window fleet metrics over parsed telemetry rows (TELEMETRY_DTYPE, e.g. from parse_batch):
+    - the window is window_s of wall time in bucket_s buckets, by message ts; the newest ts seen
+      is "now", rows older than the window are counted in `late` and otherwise ignored
+    - per robot and bucket: message count, collisions, the least-squares sums of battery over time
+      and a speed histogram (speed_bins over SPEED_RANGE); running totals hold the window's sum
+    - update() adds a batch into its buckets and totals; when now moves into a new bucket, that
+      bucket's old contents are subtracted from the totals first, so no history is ever rescanned
+    - queries: snapshot() per robot, top_k() by metric, fleet() for fleet-wide numbers
+    Robots are rows of array-backed tables that grow (doubling) as new device ids appear.
+    """
+
+    def __init__(self, window_s: int = 60, bucket_s: int = 5, speed_bins: int = 30,
+                 quantiles: Sequence[float] = (0.5, 0.9, 0.99), capacity: int = 1024):
+        if window_s % bucket_s:
+            raise ValueError(f"window_s={window_s} is not a multiple of bucket_s={bucket_s}")
+        if not all(0 < q <= 1 for q in quantiles):
+            raise ValueError(f"quantiles must be in (0, 1], got {quantiles}")
+        self.window_s = window_s
+        self.bucket_s = bucket_s
+        self.n_buckets = window_s // bucket_s
+        self.speed_bins = speed_bins
+        self.quantiles = tuple(quantiles)
+        self.now = None  # newest bucket index (ts // bucket_s)
+        self.t0 = 0  # time base of the _T/_TT/_TB sums
+        self.robots = 0  # highest device id seen + 1
+        self.messages = self.late = 0
+        self.lock = threading.Lock()
+        self._alloc(capacity)
+
+    def _alloc(self, capacity: int):
+        self.capacity = capacity
+        self.state = np.zeros(capacity, dtype=STATE_DTYPE)
+        self.state["ts"] = np.iinfo(np.int64).min
+        self.state["battery"] = self.state["speed"] = np.nan
+        self._sums = np.zeros((self.n_buckets, capacity, 6))
+        self._hist = np.zeros((self.n_buckets, capacity, self.speed_bins), dtype=np.int32)
+        self._sum_tot = np.zeros((capacity, 6))
+        self._hist_tot = np.zeros((capacity, self.speed_bins), dtype=np.int32)
+
+    def _grow(self, robots: int):
+        old = (self.state, self._sums, self._hist, self._sum_tot, self._hist_tot)
+        n = self.capacity
+        self._alloc(max(2 * n, robots))
+        self.state[:n] = old[0]
+        self._sums[:, :n] = old[1]
+        self._hist[:, :n] = old[2]
+        self._sum_tot[:n] = old[3]
+        self._hist_tot[:n] = old[4]
+
+    @property
+    def nbytes(self) -> int:
+        return sum(a.nbytes for a in (self.state, self._sums, self._hist, self._sum_tot, self._hist_tot))
+
+    # --------- ingestion ----------
+    def update(self, rows: np.ndarray):
+        if not len(rows):
+            return
+        with self.lock:
+            self._update(rows)
+
+    def _update(self, rows: np.ndarray):
+        dev = rows["device"].astype(np.intp)
+        ts = rows["ts"]
+        robots = int(dev.max()) + 1
+        if robots > self.capacity:
+            self._grow(robots)
+        self.robots = max(self.robots, robots)
+        self.messages += len(rows)
+        battery = BATTERY_RANGE[0] + rows["battery_norm"] * np.float32(BATTERY_RANGE[1] - BATTERY_RANGE[0])
+        speed = SPEED_RANGE[0] + rows["speed_norm"] * np.float32(SPEED_RANGE[1] - SPEED_RANGE[0])
+
+        # latest state and lifetime counters take every row, in or out of the window
+        st = self.state
+        np.add.at(st["messages"], dev, 1)
+        np.add.at(st["collisions"], dev, rows["collisions"])
+        order = np.lexsort((ts, dev))  # stable: equal ts keep arrival order, so the last row wins
+        last = order[np.r_[dev[order][1:] != dev[order][:-1], True]]
+        newer = ts[last] >= st["ts"][dev[last]]
+        last, d = last[newer], dev[last[newer]]
+        st["battery"][d], st["speed"][d], st["ts"][d] = battery[last], speed[last], ts[last]
+
+        bucket = ts // self.bucket_s
+        self._advance(int(bucket.max()))
+        keep = bucket > self.now - self.n_buckets
+        if not keep.all():
+            self.late += int(np.count_nonzero(~keep))
+            dev, ts, bucket, battery, speed = dev[keep], ts[keep], bucket[keep], battery[keep], speed[keep]
+            rows = rows[keep]
+        slot = bucket % self.n_buckets
+        t = (ts - self.t0).astype(np.float64)
+        b = battery.astype(np.float64)
+        vals = np.stack([np.ones_like(t), rows["collisions"].astype(np.float64), t, b, t * t, t * b], axis=1)
+        np.add.at(self._sums, (slot, dev), vals)
+        np.add.at(self._sum_tot, dev, vals)
+        k = np.minimum((rows["speed_norm"] * self.speed_bins).astype(np.intp), self.speed_bins - 1)
+        np.add.at(self._hist, (slot, dev, k), 1)
+        np.add.at(self._hist_tot, (dev, k), 1)
+
+    def _advance(self, bucket: int):
+        """Move now to `bucket`, expiring the buckets that fall out of the window."""
+        if self.now is None:
+            self.now, self.t0 = bucket, bucket * self.bucket_s
+            return
+        if bucket <= self.now:
+            return
+        for k in range(self.now + 1, min(bucket, self.now + self.n_buckets) + 1):
+            slot = k % self.n_buckets
+            self._sum_tot -= self._sums[slot]
+            self._hist_tot -= self._hist[slot]
+            self._sums[slot] = 0
+            self._hist[slot] = 0
+        self.now = bucket
+        # once per window: move the time base to the window start (keeps the t sums small) and
+        # re-add the totals from the buckets so float drift from subtracting never accumulates
+        shift = (bucket - self.n_buckets + 1) * self.bucket_s - self.t0
+        if shift >= self.window_s:
+            s = self._sums
+            s[..., _TT] -= 2 * shift * s[..., _T] - shift * shift * s[..., _N]
+            s[..., _TB] -= shift * s[..., _B]
+            s[..., _T] -= shift * s[..., _N]
+            self.t0 += shift
+            self._sum_tot = s.sum(axis=0)
+            self._hist_tot = self._hist.sum(axis=0, dtype=np.int32)
+
+    # --------- queries ----------
+    def snapshot_dtype(self) -> np.dtype:
+        return np.dtype([("device", np.int32)] + STATE_DTYPE.descr + [
+            ("window_messages", np.int32),
+            ("window_collisions", np.int32),
+            ("drain", np.float32),  # battery percent per minute, from a least-squares fit over the window
+        ] + [(f"speed_p{q * 100:g}", np.float32) for q in self.quantiles])
+
+    def snapshot(self, devices: Optional[np.ndarray] = None) -> np.ndarray:
+        """One row per robot seen (or per id in devices): latest state plus window metrics."""
+        with self.lock:
+            ids = np.arange(self.robots) if devices is None else np.asarray(devices, dtype=np.intp)
+            out = np.empty(len(ids), dtype=self.snapshot_dtype())
+            out["device"] = ids
+            for name in STATE_DTYPE.names:
+                out[name] = self.state[name][ids]
+            s = self._sum_tot[ids]
+            out["window_messages"] = np.rint(s[:, _N])
+            out["window_collisions"] = np.rint(s[:, _COLL])
+            out["drain"] = -60 * _slope(s)
+            for q, p in zip(self.quantiles, _percentiles(self._hist_tot[ids], self.quantiles)):
+                out[f"speed_p{q * 100:g}"] = p
+            return out
+
+    def top_k(self, metric: str, k: int = 10) -> np.ndarray:
+        """
+        snapshot() rows of the k robots that are most urgent by metric, most urgent first:
+        "battery" (lowest), "collisions" (most in the window), "drain" (fastest).
+        """
+        if metric not in ("battery", "collisions", "drain"):
+            raise ValueError(f"unknown top-k metric {metric!r} (expected battery, collisions or drain)")
+        with self.lock:
+            n = self.robots
+            if metric == "battery":
+                key = self.state["battery"][:n].astype(np.float64)
+            elif metric == "collisions":
+                key = -self._sum_tot[:n, _COLL]
+            else:
+                key = _slope(self._sum_tot[:n])
+            key = np.where(np.isnan(key), np.inf, key)  # robots without data sort last
+            k = min(k, n)
+            top = np.argpartition(key, k - 1)[:k] if 0 < k < n else np.arange(n)[:k]
+            top = top[np.argsort(key[top], kind="stable")]
+        return self.snapshot(top)
+
+    def fleet(self) -> dict:
+        """Fleet-wide window numbers: active robots, messages, collisions, speed percentiles."""
+        with self.lock:
+            n = self.robots
+            s = self._sum_tot[:n]
+            hist = self._hist_tot[:n].sum(axis=0, keepdims=True)
+            out = {
+                "robots": n,
+                "active": int(np.count_nonzero(s[:, _N] > 0.5)),
+                "window_messages": int(round(s[:, _N].sum())),
+                "window_collisions": int(round(s[:, _COLL].sum())),
+                "messages": self.messages,
+                "late": self.late,
+            }
+            for q, p in zip(self.quantiles, _percentiles(hist, self.quantiles)):
+                out[f"speed_p{q * 100:g}"] = float(p[0])
+            return out
+
+
+def _slope(s: np.ndarray) -> np.ndarray:
+    """Least-squares d(battery)/dt per row of window sums; NaN with fewer than two distinct times."""
+    n, t, b = s[:, _N], s[:, _T], s[:, _B]
+    den = n * s[:, _TT] - t * t
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(den > 1e-9 * np.maximum(n, 1) ** 2, (n * s[:, _TB] - t * b) / den, np.nan)
+
+
+def _percentiles(hist: np.ndarray, quantiles: Sequence[float]) -> List[np.ndarray]:
+    """Per-row quantiles of histograms over SPEED_RANGE, interpolated linearly inside a bin."""
+    cum = np.cumsum(hist, axis=1)
+    n = cum[:, -1]
+    lo, hi = SPEED_RANGE
+    width = (hi - lo) / hist.shape[1]
+    out = []
+    for q in quantiles:
+        target = q * n
+        k = np.minimum((cum < target[:, None]).sum(axis=1), hist.shape[1] - 1)
+        rows = np.arange(len(k))
+        before = cum[rows, k] - hist[rows, k]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            frac = np.clip((target - before) / hist[rows, k], 0, 1)
+        out.append(np.where(n > 0, lo + (k + frac) * width, np.nan))
+    return out
+
+
+class FleetTelemetryService:
+    """
+    Aggregation service: MQTT status messages -> TelemetryIngestor (micro-batched parsing) ->
+    a consumer thread feeding FleetAggregator. on_message is a paho-style callback, so the same
+    service attaches to a real broker (connect()) or to fleet_publisher.FakeBroker.subscribe.
+    Queries may run on any thread while messages keep arriving.
+    """
+
+    def __init__(self, batch_size: int = 1024, max_wait_ms: float = 50.0, **aggregator_kw):
+        self.ingestor = TelemetryIngestor(batch_size, max_wait_ms)
+        self.aggregator = FleetAggregator(**aggregator_kw)
+        self.on_message = self.ingestor.on_message
+        self.client = None
+        self._names: List[str] = []
+        self._consumer = threading.Thread(target=self._consume, name="FleetAggregator", daemon=True)
+        self._consumer.start()
+
+    def _consume(self):
+        out = self.ingestor.out
+        while True:
+            rows = out.get()
+            try:
+                if rows is None:
+                    return
+                self.aggregator.update(rows)
+            finally:
+                out.task_done()
+
+    def connect(self, host: str, port: int, topic: str = STATUS_TOPIC, tls: Optional[dict] = None,
+                client_id: str = "fleet-aggregator"):
+        """Subscribe to topic on an MQTT broker (paho network thread); resubscribes on reconnect."""
+        import paho.mqtt.client as mqtt
+
+        if hasattr(mqtt, "CallbackAPIVersion"):  # paho-mqtt >= 2.0
+            client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id=client_id)
+        else:
+            client = mqtt.Client(client_id=client_id)
+        if tls:
+            client.tls_set(**tls)
+        client.on_connect = lambda c, *rest: c.subscribe(topic, qos=1)
+        client.on_message = self.on_message
+        client.connect_async(host, port)
+        client.loop_start()
+        self.client = client
+
+    def drain(self):
+        """Block until every message received so far is in the aggregator."""
+        self.ingestor.flush()
+        self.ingestor.out.join()
+
+    def close(self):
+        if self.client is not None:
+            self.client.disconnect()
+            self.client.loop_stop()
+        self.ingestor.close()
+        self._consumer.join()
+
+    # --------- queries ----------
+    def names(self, ids) -> List[str]:
+        devices = self.ingestor.devices
+        if len(self._names) < len(devices):
+            names = dict(devices)  # the ingestor may add devices meanwhile
+            self._names = [""] * len(names)
+            for name, i in names.items():
+                self._names[i] = name
+        return [self._names[i] for i in ids]
+
+    def snapshot(self) -> np.ndarray:
+        return self.aggregator.snapshot()
+
+    def top_k(self, metric: str, k: int = 10) -> List[dict]:
+        """top_k rows as dicts, device ids replaced by robot names."""
+        rows = self.aggregator.top_k(metric, k)
+        return [dict(zip(rows.dtype.names, r.tolist()), device=name)
+                for r, name in zip(rows, self.names(rows["device"]))]
+
+    def fleet(self) -> dict:
+        """FleetAggregator.fleet() plus the payloads the ingestor rejected as undecodable."""
+        return dict(self.aggregator.fleet(), rejected=self.ingestor.rejected)
+
+
+# --------- reference + benchmark ----------
+def reference(rows: np.ndarray, agg: FleetAggregator) -> np.ndarray:
+    """snapshot() recomputed from the full history of rows, by brute force."""
+    out = np.zeros(agg.robots, dtype=agg.snapshot_dtype())
+    out["device"] = np.arange(agg.robots)
+    window = rows[rows["ts"] // agg.bucket_s > agg.now - agg.n_buckets]
+    for d in range(agg.robots):
+        mine = rows[rows["device"] == d]
+        w = window[window["device"] == d]
+        newest = mine[np.lexsort((mine["ts"],))[-1]]
+        out[d]["battery"] = newest["battery_norm"] * np.float32(BATTERY_RANGE[1] - BATTERY_RANGE[0])
+        out[d]["speed"] = newest["speed_norm"] * np.float32(SPEED_RANGE[1] - SPEED_RANGE[0])
+        out[d]["ts"] = newest["ts"]
+        out[d]["messages"], out[d]["collisions"] = len(mine), mine["collisions"].sum()
+        out[d]["window_messages"], out[d]["window_collisions"] = len(w), w["collisions"].sum()
+        t = w["ts"].astype(np.float64)
+        b = (w["battery_norm"] * np.float32(BATTERY_RANGE[1] - BATTERY_RANGE[0])).astype(np.float64)
+        out[d]["drain"] = -60 * np.polyfit(t, b, 1)[0] if len(np.unique(t)) > 1 else np.nan
+        k = np.minimum((w["speed_norm"] * agg.speed_bins).astype(np.intp), agg.speed_bins - 1)
+        hist = np.bincount(k, minlength=agg.speed_bins)[None]
+        for q, p in zip(agg.quantiles, _percentiles(hist, agg.quantiles)):
+            out[d][f"speed_p{q * 100:g}"] = p[0]
+    return out
+
+
+def fleet_payloads(robots: int, hz: int, second: int, rng: np.random.Generator, battery: np.ndarray) -> List[bytes]:
+    """One second of robot_publisher-style JSON from every robot at hz (battery drains in place)."""
+    out = []
+    for _ in range(hz):
+        battery -= rng.random(robots) < 0.05
+        np.maximum(battery, 0, out=battery)
+        speed = rng.uniform(0.2, 1.0, robots)
+        collisions = rng.random(robots) < 0.01
+        out += [b'{"device": "robot%d", "status": "%s", "battery": %d, "speed": %.2f, "collisions": %d, "ts": %d}'
+                % (i, b"online" if bat > 0 else b"shutdown", bat, v, c, second)
+                for i, (bat, v, c) in enumerate(zip(battery.tolist(), speed.tolist(), collisions.tolist()))]
+    return out
+
+
+def check_exact(args):
+    """Incremental metrics == brute force, with out-of-order, late and growing-fleet traffic."""
+    rng = np.random.default_rng(0)
+    agg = FleetAggregator(window_s=20, bucket_s=5, capacity=4)
+    devices: Dict[str, int] = {}
+    battery = np.full(300, 100)
+    history = []
+    for sec in range(1000, 1090):
+        robots = min(50 + 3 * (sec - 1000), 300)  # fleet grows mid-run
+        payloads = fleet_payloads(robots, 2, sec, rng, battery[:robots])
+        payloads = [payloads[i] for i in rng.permutation(len(payloads))]
+        if sec % 7 == 0:  # stragglers from further back, some beyond the window
+            payloads += fleet_payloads(20, 1, sec - int(rng.integers(1, 40)), rng, battery[:20].copy())
+        rows = parse_batch(payloads, devices)
+        agg.update(rows)
+        history.append(rows)
+        if sec % 15 == 0 or sec == 1089:
+            got, want = agg.snapshot(), reference(np.concatenate(history), agg)
+            for name in want.dtype.names:
+                assert np.allclose(got[name], want[name], rtol=1e-6, atol=1e-6, equal_nan=True), (sec, name)
+    assert agg.late > 0 and agg.t0 > 1000
+    assert (agg.top_k("battery", 5)["battery"] == np.sort(agg.state["battery"][:agg.robots])[:5]).all()
+    assert (agg.top_k("collisions", 5)["window_collisions"] == np.sort(got["window_collisions"])[::-1][:5]).all()
+    print(f"incremental window metrics match brute force ({agg.messages} messages, {agg.late} late)")
+
+
+def check_fake_broker(args):
+    """End to end: a pooled fleet publishing through FakeBroker into the service via warehouse/+/status."""
+    from fleet_publisher import FakeBroker, run_fleet
+
+    broker = FakeBroker(latency_ms=1.0)
+    service = FleetTelemetryService(window_s=60, bucket_s=1)
+    delivered = []
+    broker.subscribe(STATUS_TOPIC, service.on_message)
+    broker.subscribe("warehouse/#", lambda c, u, msg: delivered.append(msg.payload))
+    broker.subscribe("warehouse/+/batch", lambda c, u, msg: delivered.append(None))  # must never match
+    pub, _ = asyncio.run(run_fleet(broker.connect, 200, 2.0, 0.1, n_connections=4, max_batch=20,
+                                   topic="warehouse/fleet-{conn}/status"))
+    service.drain()
+    assert None not in delivered and service.aggregator.messages == broker.messages == pub.sent
+    lines = [line for p in delivered for line in p.split(b"\n")]
+    want = reference(parse_batch(lines, dict(service.ingestor.devices)), service.aggregator)
+    got = service.snapshot()
+    for name in ("messages", "collisions", "battery", "window_collisions", "drain"):
+        assert np.allclose(got[name], want[name], equal_nan=True), name
+    worst = service.top_k("collisions", 3)
+    assert worst[0]["window_collisions"] == want["window_collisions"].max() and worst[0]["device"].startswith("robot")
+
+    # junk from any publisher on the wildcard is rejected; flushing and aggregation carry on
+    async def rogue():
+        conn = await broker.connect("rogue")
+        await conn.publish("warehouse/rogue/status", b"not json")
+        await conn.publish("warehouse/rogue/status", lines[-1] + b"\n")  # newline-terminated NDJSON
+    before = service.aggregator.messages
+    asyncio.run(rogue())
+    time.sleep(0.2)  # left to the ingestor's time-based flush
+    assert service.ingestor._ticker.is_alive() and service.aggregator.messages == before + 1
+    service.drain()
+    assert service.fleet()["rejected"] == 1 and service.fleet()["messages"] == before + 1
+    service.close()
+    print(f"fake broker -> {STATUS_TOPIC} -> service: {pub.sent} messages from 200 robots aggregated, junk rejected")
+
+
+def bench(args):
+    robots, hz = args.robots, args.hz
+    rng = np.random.default_rng(1)
+    battery = np.full(robots, 100)
+    seconds = [fleet_payloads(robots, hz, 10_000 + s, rng, battery) for s in range(args.seconds)]
+    n = sum(map(len, seconds))
+    need = robots * hz
+    print(f"\n{robots} robots x {hz} Hz = {need} msg/s needed; {args.seconds} s of traffic ({n} messages)")
+
+    devices: Dict[str, int] = {}
+    t0 = time.perf_counter()
+    parsed = [[parse_batch(p[i:i + args.batch], devices) for i in range(0, len(p), args.batch)] for p in seconds]
+    t_parse = time.perf_counter() - t0
+
+    agg = FleetAggregator(window_s=args.window, bucket_s=args.bucket, capacity=robots)
+    t0 = time.perf_counter()
+    for batches in parsed:
+        for rows in batches:
+            agg.update(rows)
+    t_agg = time.perf_counter() - t0
+
+    service = FleetTelemetryService(args.batch, window_s=args.window, bucket_s=args.bucket, capacity=robots)
+    t_service = 0.0
+    for payloads in seconds:
+        t0 = time.perf_counter()
+        service.ingestor.feed_many(payloads)
+        service.drain()
+        t_service += time.perf_counter() - t0
+    assert service.aggregator.messages == n
+
+    print(f"{'stage':<30} {'msgs/s':>10} {'us/msg':>7} {'core share at load':>19}")
+    for name, t in (("parse_batch", t_parse), ("FleetAggregator.update", t_agg),
+                    ("service (ingest + aggregate)", t_service)):
+        print(f"{name:<30} {n / t:>10.0f} {t / n * 1e6:>7.2f} {need * t / n:>19.0%}")
+
+    queries = (("snapshot()", service.snapshot), ("top_k('battery', 10)", lambda: service.top_k("battery")),
+               ("top_k('collisions', 10)", lambda: service.top_k("collisions")), ("fleet()", service.fleet))
+    print(f"\n{'query':<30} {'ms':>8}")
+    for name, fn in queries:
+        t0 = time.perf_counter()
+        for _ in range(10):
+            fn()
+        print(f"{name:<30} {(time.perf_counter() - t0) * 100:>8.2f}")
+    f = service.fleet()
+    print(f"\naggregator tables: {service.aggregator.nbytes / 2 ** 20:.1f} MiB; fleet: {f['active']} active, "
+          f"{f['window_collisions']} collisions in window, speed p50/p99 {f['speed_p50']:.2f}/{f['speed_p99']:.2f} m/s")
+    service.close()
+
+
+def live(args):
+    host, port = args.broker.rsplit(":", 1)
+    service = FleetTelemetryService(window_s=args.window, bucket_s=args.bucket)
+    service.connect(host, int(port), args.topic)
+    print(f"aggregating {args.topic} from {args.broker}; Ctrl-C to stop")
+    try:
+        while True:
+            time.sleep(args.report)
+            print(service.fleet())
+            for metric in ("battery", "collisions"):
+                for r in service.top_k(metric, 5):
+                    print(f"  {metric:<10} {r['device']:<16} battery={r['battery']:.0f}% "
+                          f"collisions={r['window_collisions']} drain={r['drain']:.2f}%/min p50={r['speed_p50']:.2f}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Fleet telemetry aggregation: rolling-window metrics per robot")
+    ap.add_argument("--robots", type=int, default=10_000)
+    ap.add_argument("--hz", type=int, default=10, help="messages per robot per second")
+    ap.add_argument("--seconds", type=int, default=10, help="seconds of simulated traffic in the load benchmark")
+    ap.add_argument("--batch", type=int, default=1024, help="ingestor micro-batch size")
+    ap.add_argument("--window", type=int, default=60, help="rolling window, seconds")
+    ap.add_argument("--bucket", type=int, default=5, help="window bucket, seconds")
+    ap.add_argument("--broker", default="fake", help="'fake' (self-check + load benchmark) or HOST:PORT to serve live")
+    ap.add_argument("--topic", default=STATUS_TOPIC)
+    ap.add_argument("--report", type=float, default=5.0, help="live mode: seconds between reports")
+    args = ap.parse_args()
+
+    if args.broker == "fake":
+        check_exact(args)
+        check_fake_broker(args)
+        bench(args)
+    else:
+        live(args)
@@ -0,0 +1,394 @@
+import argparse
+import asyncio
+import itertools
+import random
+import threading
+import time
+import zlib
+from typing import Awaitable, Callable, Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+from telemetry_wire import BINARY, JSON, FormatNegotiator, encode_or_json, record_count
+
+
+class FakeMessage(NamedTuple):
+    """What paho hands to on_message callbacks (the fields subscribers here read)."""
+    topic: str
+    payload: bytes
+
+
+def topic_matches(topic_filter: str, topic: str) -> bool:
+    """MQTT wildcard match: `+` is one level, a trailing `#` any number of levels (including none)."""
+    levels = topic.split("/")
+    for i, f in enumerate(topic_filter.split("/")):
+        if f == "#":
+            return True
+        if i >= len(levels) or (f != "+" and f != levels[i]):
+            return False
+    return len(levels) == i + 1
+
+
+class FakeBroker:
+    """
+    In-process stand-in for an MQTT broker: QoS-1 publishes are acked after a simulated network
+    delay, and with drop_rate a publish kills its connection so reconnect paths get exercised.
+    subscribe(filter, on_message) delivers every acked publish on a matching topic to a paho-style
+    on_message(client, userdata, msg) callback, synchronously on the publisher's event loop.
+    """
+
+    def __init__(self, latency_ms: float = 2.0, jitter_ms: float = 1.0, drop_rate: float = 0.0, seed: int = 0):
+        self.latency = latency_ms / 1e3
+        self.jitter = jitter_ms / 1e3
+        self.drop_rate = drop_rate
+        self.rng = random.Random(seed)
+        self.messages = 0  # telemetry records received
+        self.payloads = 0
+        self.bytes = 0
+        self.connections = 0
+        self.subscriptions: List[tuple] = []
+
+    def subscribe(self, topic_filter: str, on_message: Callable):
+        self.subscriptions.append((topic_filter, on_message))
+
+    async def connect(self, client_id: str) -> "FakeConnection":
+        await asyncio.sleep(self.latency)
+        self.connections += 1
+        return FakeConnection(self, client_id)
+
+
+class FakeConnection:
+    def __init__(self, broker: FakeBroker, client_id: str):
+        self.broker = broker
+        self.client_id = client_id
+        self.closed = False
+
+    async def publish(self, topic: str, payload: bytes, qos: int = 1):
+        b = self.broker
+        if self.closed:
+            raise ConnectionError(f"{self.client_id}: connection closed")
+        if b.drop_rate and b.rng.random() < b.drop_rate:
+            self.closed = True
+            raise ConnectionError(f"{self.client_id}: connection dropped")
+        await asyncio.sleep(b.latency + b.rng.random() * b.jitter)
+        b.payloads += 1
+        b.bytes += len(payload)
+        b.messages += record_count(payload)
+        for topic_filter, on_message in b.subscriptions:
+            if topic_matches(topic_filter, topic):
+                on_message(None, None, FakeMessage(topic, payload))
+
+    def close(self):
+        self.closed = True
+
+
+class PahoConnection:
+    """
+    A paho-mqtt client (network thread via loop_start) behind an async publish(): each QoS-1 publish
+    returns once its PUBACK arrives; a disconnect fails every pending publish with ConnectionError.
+    """
+
+    def __init__(self, client, loop: asyncio.AbstractEventLoop):
+        self.client = client
+        self.loop = loop
+        self.closed = False
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._early = set()  # mids acked before publish() registered them
+        self._lock = threading.Lock()
+
+    @classmethod
+    async def open(cls, host: str, port: int, client_id: str, tls: Optional[dict] = None,
+                   keepalive: int = 60, timeout: float = 10.0) -> "PahoConnection":
+        import paho.mqtt.client as mqtt
+
+        loop = asyncio.get_running_loop()
+        if hasattr(mqtt, "CallbackAPIVersion"):  # paho-mqtt >= 2.0
+            client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id=client_id)
+        else:
+            client = mqtt.Client(client_id=client_id)
+        if tls:
+            client.tls_set(**tls)
+        conn = cls(client, loop)
+        connected = loop.create_future()
+
+        def on_connect(c, userdata, flags, rc, *rest):
+            ok = getattr(rc, "is_failure", None)
+            failed = ok if ok is not None else rc != 0
+            result = ConnectionError(f"{client_id}: connect rc={rc}") if failed else None
+            loop.call_soon_threadsafe(_settle, connected, result)
+
+        def on_publish(c, userdata, mid, *rest):
+            with conn._lock:
+                fut = conn._pending.pop(mid, None)
+                if fut is None:
+                    conn._early.add(mid)
+                    return
+            loop.call_soon_threadsafe(_settle, fut, None)
+
+        def on_disconnect(c, userdata, *rest):
+            conn.closed = True
+            with conn._lock:
+                pending, conn._pending = conn._pending, {}
+            err = ConnectionError(f"{client_id}: disconnected")
+            for fut in pending.values():
+                loop.call_soon_threadsafe(_settle, fut, err)
+            loop.call_soon_threadsafe(_settle, connected, err)
+
+        client.on_connect, client.on_publish, client.on_disconnect = on_connect, on_publish, on_disconnect
+        client.connect_async(host, port, keepalive)
+        client.loop_start()
+        try:
+            await asyncio.wait_for(connected, timeout)
+        except BaseException:
+            conn.close()
+            raise
+        return conn
+
+    async def publish(self, topic: str, payload: bytes, qos: int = 1):
+        if self.closed:
+            raise ConnectionError("connection closed")
+        info = self.client.publish(topic, payload, qos=qos)
+        if info.rc != 0:
+            raise ConnectionError(f"publish rc={info.rc}")
+        if qos == 0:
+            return
+        fut = self.loop.create_future()
+        # the PUBACK may already have arrived on the network thread
+        with self._lock:
+            if info.mid in self._early:
+                self._early.discard(info.mid)
+                return
+            self._pending[info.mid] = fut
+        await fut
+
+    def close(self):
+        self.closed = True
+        self.client.disconnect()
+        self.client.loop_stop()
+
+
+def _settle(fut: asyncio.Future, error: Optional[BaseException]):
+    if not fut.done():
+        if error is None:
+            fut.set_result(None)
+        else:
+            fut.set_exception(error)
+
+
+class _Slot:
+    """One pooled connection with its outgoing queue, in-flight limit and reconnect state."""
+
+    def __init__(self, index: int, max_queue: int, max_inflight: int):
+        self.index = index
+        self.queue: asyncio.Queue = asyncio.Queue(max_queue)
+        self.inflight = asyncio.Semaphore(max_inflight)
+        self.conn = None
+        self.generation = 0
+        self.lock = asyncio.Lock()
+        self.tasks = set()
+
+
+class PooledPublisher:
+    """
+    Telemetry for a fleet of simulated robots over a small pool of MQTT connections:
+    - send(robot, payload) routes each robot to a fixed connection and waits only for queue space
+    - per connection, a batcher coalesces messages into one payload when max_batch are waiting or the
+      oldest has lingered linger_ms: NDJSON (one robot_publisher-style JSON object per line) or, on
+      topics where formats (a telemetry_wire.FormatNegotiator) settles on it, one binary frame
+    - at most max_inflight QoS-1 publishes per connection await their ack at once
+    - a failed publish reconnects that connection with exponential backoff + jitter and retries the batch
+    connect(client_id) is any coroutine returning an object with async publish() and close():
+    FakeBroker.connect, or PahoConnection.open bound to a broker address.
+    """
+
+    def __init__(self, connect: Callable[[str], Awaitable], n_connections: int = 4, max_batch: int = 50,
+                 linger_ms: float = 20.0, max_inflight: int = 32, max_queue: int = 10_000,
+                 topic: str = "warehouse/fleet/{conn}/batch", client_prefix: str = "fleet",
+                 backoff: tuple = (0.05, 5.0), formats: Optional[FormatNegotiator] = None):
+        self.connect = connect
+        self.n_connections = n_connections
+        self.max_batch = max_batch
+        self.linger = linger_ms / 1e3
+        self.max_inflight = max_inflight
+        self.max_queue = max_queue
+        self.topic = topic
+        self.client_prefix = client_prefix
+        self.backoff = backoff
+        self.formats = formats
+        self.sent = self.payloads = self.bytes = self.retries = self.reconnects = 0
+        self.latencies: List[float] = []  # enqueue -> ack, seconds, per message
+        self._slots: List[_Slot] = []
+        self._batchers = []
+
+    # --------- lifecycle ----------
+    async def start(self):
+        self._slots = [_Slot(k, self.max_queue, self.max_inflight) for k in range(self.n_connections)]
+        await asyncio.gather(*(self._reconnect(s, s.generation, first=True) for s in self._slots))
+        self._batchers = [asyncio.create_task(self._batcher(s)) for s in self._slots]
+
+    async def close(self):
+        """Flush everything queued, wait for its acks, then close the connections."""
+        for s in self._slots:
+            await s.queue.put(None)
+        await asyncio.gather(*self._batchers)
+        for s in self._slots:
+            if s.tasks:
+                await asyncio.gather(*s.tasks)
+            if s.conn is not None:
+                s.conn.close()
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    # --------- producer side ----------
+    async def send(self, robot: str, payload: dict):
+        """Queue one telemetry dict; it is encoded with its batch, so don't mutate it afterwards."""
+        slot = self._slots[zlib.crc32(robot.encode()) % len(self._slots)]
+        await slot.queue.put((time.perf_counter(), payload))  # waits while the queue is full
+
+    # --------- per-connection loop ----------
+    async def _batcher(self, slot: _Slot):
+        loop = asyncio.get_running_loop()
+        done = False
+        while not done:
+            item = await slot.queue.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = loop.time() + self.linger
+            while len(batch) < self.max_batch:
+                try:
+                    item = slot.queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(slot.queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                if item is None:
+                    done = True
+                    break
+                batch.append(item)
+            await slot.inflight.acquire()
+            task = asyncio.create_task(self._publish(slot, batch))
+            slot.tasks.add(task)
+            task.add_done_callback(slot.tasks.discard)
+
+    async def _publish(self, slot: _Slot, batch: list):
+        topic = self.topic.format(conn=slot.index)
+        fmt = self.formats.format_for(topic) if self.formats is not None else JSON
+        payload = encode_or_json([msg for _, msg in batch], fmt)
+        try:
+            while True:
+                conn, generation = slot.conn, slot.generation
+                try:
+                    await conn.publish(topic, payload, qos=1)
+                    break
+                except (ConnectionError, OSError):
+                    self.retries += 1
+                    await self._reconnect(slot, generation)
+        finally:
+            slot.inflight.release()
+        now = time.perf_counter()
+        self.latencies.extend(now - t for t, _ in batch)
+        self.sent += len(batch)
+        self.payloads += 1
+        self.bytes += len(payload)
+
+    async def _reconnect(self, slot: _Slot, generation: int, first: bool = False):
+        """Replace slot.conn unless another task already did since `generation` was read."""
+        async with slot.lock:
+            if slot.generation != generation:
+                return
+            if slot.conn is not None:
+                slot.conn.close()
+            attempt = 0
+            while True:
+                try:
+                    slot.conn = await self.connect(f"{self.client_prefix}-{slot.index}")
+                    break
+                except (ConnectionError, OSError, asyncio.TimeoutError):
+                    lo, hi = self.backoff
+                    await asyncio.sleep(min(hi, lo * 2 ** attempt) * random.uniform(0.5, 1.5))
+                    attempt += 1
+            slot.generation += 1
+            if not first:
+                self.reconnects += 1
+
+
+# --------- simulated fleet ----------
+async def simulate_robot(pub: PooledPublisher, robot: str, interval: float, until: float, rng: random.Random):
+    """robot_publisher.py's fake telemetry, every `interval` seconds until loop time `until`."""
+    loop = asyncio.get_running_loop()
+    battery = 100
+    await asyncio.sleep(rng.random() * interval)  # spread robots over the interval
+    while loop.time() < until:
+        battery = max(0, battery - rng.randint(0, 2))
+        await pub.send(robot, {
+            "device": robot,
+            "status": "online" if battery > 0 else "shutdown",
+            "battery": battery,
+            "speed": round(rng.uniform(0.2, 1.0), 2),
+            "collisions": rng.choice([0, 0, 1]),
+            "ts": int(time.time()),
+        })
+        await asyncio.sleep(interval)
+
+
+async def run_fleet(connect, robots: int, seconds: float, interval: float, **pool_kw):
+    pub = PooledPublisher(connect, **pool_kw)
+    await pub.start()
+    loop = asyncio.get_running_loop()
+    until = loop.time() + seconds
+    t0 = time.perf_counter()
+    rng = random.Random(0)
+    await asyncio.gather(*(simulate_robot(pub, f"robot{i}", interval, until, random.Random(rng.random()))
+                           for i in range(robots)))
+    await pub.close()
+    return pub, time.perf_counter() - t0
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Multi-robot MQTT publisher throughput/latency")
+    ap.add_argument("--robots", type=int, default=500)
+    ap.add_argument("--interval", type=float, default=0.05, help="seconds between messages per robot")
+    ap.add_argument("--seconds", type=float, default=3.0)
+    ap.add_argument("--connections", type=int, nargs="+", default=[1, 4])
+    ap.add_argument("--batch", type=int, nargs="+", default=[1, 50], help="max messages per payload")
+    ap.add_argument("--linger-ms", type=float, default=20.0)
+    ap.add_argument("--inflight", type=int, default=32)
+    ap.add_argument("--broker", default="fake", help="'fake' (in-process) or HOST:PORT of an MQTT broker")
+    ap.add_argument("--latency-ms", type=float, default=2.0, help="fake broker ack delay")
+    ap.add_argument("--drop-rate", type=float, default=0.0, help="fake broker: chance a publish drops its connection")
+    ap.add_argument("--wire", nargs="+", choices=[JSON, BINARY], default=[JSON],
+                    help="payload format, as if the topics' subscribers had announced it")
+    args = ap.parse_args()
+
+    print(f"{args.robots} robots x {1 / args.interval:.0f} msg/s for {args.seconds}s via {args.broker}")
+    print(f"{'wire':>5} {'conns':>5} {'batch':>5} {'msgs/s':>9} {'payloads/s':>10} {'B/msg':>6} "
+          f"{'p50 ms':>8} {'p99 ms':>8} {'reconn':>6}")
+    for wire, n_conn, max_batch in itertools.product(args.wire, args.connections, args.batch):
+        if args.broker == "fake":
+            broker = FakeBroker(args.latency_ms, drop_rate=args.drop_rate)
+            connect = broker.connect
+        else:
+            host, port = args.broker.rsplit(":", 1)
+
+            def connect(client_id, host=host, port=int(port)):
+                return PahoConnection.open(host, port, client_id)
+
+        formats = FormatNegotiator()
+        for k in range(n_conn):
+            formats.accept(f"warehouse/fleet/{k}/batch", [wire])
+        pub, dt = asyncio.run(run_fleet(connect, args.robots, args.seconds, args.interval,
+                                        n_connections=n_conn, max_batch=max_batch, linger_ms=args.linger_ms,
+                                        max_inflight=args.inflight, formats=formats))
+        p50, p99 = np.percentile(np.array(pub.latencies) * 1e3, [50, 99]) if pub.latencies else (0, 0)
+        print(f"{wire:>5} {n_conn:>5} {max_batch:>5} {pub.sent / dt:>9.0f} {pub.payloads / dt:>10.0f} "
+              f"{pub.bytes / max(pub.sent, 1):>6.1f} {p50:>8.2f} {p99:>8.2f} {pub.reconnects:>6}")
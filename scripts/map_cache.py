@@ -0,0 +1,271 @@
+import argparse
+import random
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from box_map import BoxMap
+from distance_field import ClearanceField, GoalField
+from occupancy import TiledGrid
+
+
+class MapKey(NamedTuple):
+    seed: int
+    width: int
+    height: int
+    robot_r: int
+    num_obstacles: int = 10
+    with_field: bool = False
+    tiled: bool = False
+    goal: Optional[Tuple[int, int]] = None  # also build a GoalField towards this pixel
+
+    def dirname(self) -> str:
+        return (f"s{self.seed}_{self.width}x{self.height}_r{self.robot_r}_n{self.num_obstacles}"
+                f"{'_sdf' if self.with_field else ''}{'_tiled' if self.tiled else ''}"
+                f"{f'_goal{self.goal[0]}x{self.goal[1]}' if self.goal else ''}")
+
+
+class WarehouseMap:
+    """
+    One generated map: BGR canvas, edge obstacle mask, robot-radius inflated mask, optional
+    ClearanceField and optional GoalField (key.goal). All arrays are read-only so a single instance
+    can be shared by every env.
+    Tiled maps (key.tiled) hold the two masks as occupancy.TiledGrid and have no canvas.
+    boxes is the analytic BoxMap of the generator's rectangles, built on first use (cheap, not pooled).
+    """
+
+    ARRAYS = ("canvas", "obstacle_mask", "inflated_mask")
+
+    def __init__(self, key: MapKey, canvas: Optional[np.ndarray], obstacle_mask, inflated_mask,
+                 field: Optional[ClearanceField] = None, goal_field: Optional[GoalField] = None):
+        self.key = key
+        self.canvas = canvas
+        self.obstacle_mask = obstacle_mask
+        self.inflated_mask = inflated_mask
+        self.field = field
+        self.goal_field = goal_field
+        self._boxes = None
+        for arr in self._arrays():
+            arr.flags.writeable = False
+
+    @property
+    def boxes(self) -> BoxMap:
+        if self._boxes is None:
+            k = self.key
+            self._boxes = BoxMap.from_rects(_rectangles(k), k.width, k.height, k.robot_r)
+        return self._boxes
+
+    def _arrays(self):
+        arrs = []
+        for name in self.ARRAYS:
+            arr = getattr(self, name)
+            if isinstance(arr, TiledGrid):
+                arrs += arr.arrays()
+            elif arr is not None:
+                arrs.append(arr)
+        if self.field is not None:
+            arrs += [self.field.dist, self.field.clearance]
+        if self.goal_field is not None:
+            arrs.append(self.goal_field.dist)
+        return arrs
+
+    @property
+    def nbytes(self) -> int:
+        return sum(a.nbytes for a in self._arrays())
+
+    # --------- disk pool ----------
+    def save(self, root: Path):
+        d = Path(root) / self.key.dirname()
+        d.mkdir(parents=True, exist_ok=True)
+        for name in self.ARRAYS:
+            arr = getattr(self, name)
+            if isinstance(arr, TiledGrid):
+                arr.save(d, name)
+            elif arr is not None:
+                np.save(d / f"{name}.npy", arr)
+        if self.field is not None:
+            np.save(d / "dist.npy", self.field.dist)
+        if self.goal_field is not None:
+            np.save(d / "goal_dist.npy", self.goal_field.dist)
+
+    @classmethod
+    def load(cls, key: MapKey, root: Path) -> Optional["WarehouseMap"]:
+        """Memory-map a pooled map from disk (pages shared across processes); None if not pooled."""
+        d = Path(root) / key.dirname()
+        if key.tiled:
+            if not (d / "inflated_mask.tiles.npy").exists():
+                return None
+            masks = {name: TiledGrid.load(d, name, key.width, key.height)
+                     for name in ("obstacle_mask", "inflated_mask")}
+            return cls(key, None, **masks)
+        if not (d / "inflated_mask.npy").exists():
+            return None
+        arrs = {name: np.load(d / f"{name}.npy", mmap_mode="r") for name in cls.ARRAYS}
+        field = goal_field = None
+        if key.with_field:
+            field = ClearanceField.from_dist(np.load(d / "dist.npy", mmap_mode="r"), key.robot_r)
+        if key.goal is not None:
+            goal_field = GoalField.from_dist(np.load(d / "goal_dist.npy", mmap_mode="r"), key.goal)
+        return cls(key, field=field, goal_field=goal_field, **arrs)
+
+
+def _rectangles(key: MapKey):
+    """The random obstacle rectangles (x1, y1, x2, y2) for key.seed."""
+    W, H = key.width, key.height
+    rng = random.Random(key.seed)
+    rects = []
+    for _ in range(key.num_obstacles):
+        x1, y1 = rng.randint(30, W - 180), rng.randint(30, H - 140)
+        x2, y2 = x1 + rng.randint(40, 160), y1 + rng.randint(40, 140)
+        rects.append((x1, y1, x2, y2))
+    return rects
+
+
+def generate_map(key: MapKey) -> WarehouseMap:
+    """Draw random rectangle obstacles for key.seed and derive the collision masks."""
+    import cv2
+
+    if key.tiled:
+        return generate_tiled_map(key)
+    W, H = key.width, key.height
+
+    # canvas & obstacles
+    canvas = np.ones((H, W, 3), dtype=np.uint8) * 255
+    for x1, y1, x2, y2 in _rectangles(key):
+        cv2.rectangle(canvas, (x1, y1), (x2, y2), (0, 0, 255), -1)
+
+    # edge mask + inflate by robot radius
+    gray = cv2.cvtColor(canvas, cv2.COLOR_BGR2GRAY)
+    edges = cv2.Canny(gray, 50, 150)
+    obstacle_mask = (edges > 0).astype(np.uint8)
+    field = None
+    if key.with_field:
+        field = ClearanceField(obstacle_mask, key.robot_r)
+        inflated_mask = field.inflate()
+    else:
+        kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (key.robot_r * 2, key.robot_r * 2))
+        inflated_mask = cv2.dilate(obstacle_mask, kernel, iterations=1)
+    goal_field = GoalField(inflated_mask, key.goal) if key.goal is not None else None
+    return WarehouseMap(key, canvas, obstacle_mask, inflated_mask, field, goal_field)
+
+
+def generate_tiled_map(key: MapKey, tile: int = 64) -> WarehouseMap:
+    """
+    Same obstacles and masks as generate_map, built as TiledGrids one band of tile rows at a time,
+    so no full-map canvas or mask ever exists. Canny only looks a few pixels around each edge
+    (obstacle gradients are far above the hysteresis threshold), so a small halo per band suffices.
+    """
+    import cv2
+
+    if key.with_field or key.goal is not None:
+        raise ValueError("tiled maps have no distance fields; use lidar='raycast' and euclidean shaping")
+    W, H = key.width, key.height
+    rects = np.array(_rectangles(key), dtype=np.int64).reshape(-1, 4)
+    red_gray = int(cv2.cvtColor(np.array([[[0, 0, 255]]], dtype=np.uint8), cv2.COLOR_BGR2GRAY)[0, 0])
+    halo = 4
+    obstacle_mask = TiledGrid(W, H, tile)
+    for y0 in range(0, H, tile):
+        y1 = min(y0 + tile, H)
+        b0, b1 = max(y0 - halo, 0), min(y1 + halo, H)
+        hit = rects[(rects[:, 1] < b1 + halo) & (rects[:, 3] >= b0 - halo)]
+        if len(hit) == 0:
+            continue
+        band = np.full((b1 - b0, W), 255, dtype=np.uint8)
+        for x1, y1r, x2, y2r in hit:
+            cv2.rectangle(band, (int(x1), int(y1r - b0)), (int(x2), int(y2r - b0)), red_gray, -1)
+        edges = cv2.Canny(band, 50, 150)
+        obstacle_mask.or_block(0, y0, edges[y0 - b0:y1 - b0])
+    inflated_mask = obstacle_mask.inflate(key.robot_r)
+    obstacle_mask.compact()
+    inflated_mask.compact()
+    return WarehouseMap(key, None, obstacle_mask, inflated_mask)
+
+
+class MapCache:
+    """
+    LRU cache of WarehouseMaps keyed on MapKey, capped at max_bytes of map arrays.
+    Lookup order on a miss: pool_dir on disk (memory-mapped), then generate_map.
+    """
+
+    def __init__(self, max_bytes: int = 256 * 2**20, pool_dir: Optional[str] = None):
+        self.max_bytes = max_bytes
+        self.pool_dir = Path(pool_dir) if pool_dir else None
+        self._maps = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def __len__(self):
+        return len(self._maps)
+
+    @property
+    def nbytes(self) -> int:
+        return self._bytes
+
+    def get(self, key: MapKey) -> WarehouseMap:
+        with self._lock:
+            wmap = self._maps.get(key)
+            if wmap is not None:
+                self._maps.move_to_end(key)
+                self.hits += 1
+                return wmap
+            self.misses += 1
+
+        wmap = WarehouseMap.load(key, self.pool_dir) if self.pool_dir else None
+        if wmap is None:
+            wmap = generate_map(key)
+
+        with self._lock:
+            if key not in self._maps:
+                self._maps[key] = wmap
+                self._bytes += wmap.nbytes
+                # evict least recently used, always keeping the newest entry
+                while self._bytes > self.max_bytes and len(self._maps) > 1:
+                    _, old = self._maps.popitem(last=False)
+                    self._bytes -= old.nbytes
+            return self._maps[key]
+
+    def clear(self):
+        with self._lock:
+            self._maps.clear()
+            self._bytes = 0
+
+
+def build_pool(root: str, seeds, width: int = 700, height: int = 500, robot_r: int = 10,
+               num_obstacles: int = 10, with_field: bool = False, tiled: bool = False,
+               goal: Optional[Tuple[int, int]] = None) -> int:
+    """Pre-generate maps for seeds into root so env resets become memory-mapped lookups."""
+    n = 0
+    for seed in seeds:
+        key = MapKey(seed, width, height, robot_r, num_obstacles, with_field, tiled, goal)
+        if WarehouseMap.load(key, root) is None:
+            generate_map(key).save(root)
+            n += 1
+    return n
+
+
+# process-wide cache shared by every env instance that doesn't bring its own
+MAP_CACHE = MapCache()
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Pre-generate a pool of warehouse maps to disk")
+    ap.add_argument("pool_dir")
+    ap.add_argument("--count", type=int, default=100, help="seeds 0..count-1")
+    ap.add_argument("--width", type=int, default=700)
+    ap.add_argument("--height", type=int, default=500)
+    ap.add_argument("--robot-r", type=int, default=10)
+    ap.add_argument("--obstacles", type=int, default=10)
+    ap.add_argument("--sdf", action="store_true", help="also store the distance field")
+    ap.add_argument("--tiled", action="store_true", help="sparse tiled masks (large maps)")
+    ap.add_argument("--goal-field", action="store_true",
+                    help="also store the geodesic distance to the env's goal (--shaping geodesic)")
+    args = ap.parse_args()
+
+    goal = (args.width - 40, args.height - 40) if args.goal_field else None
+    made = build_pool(args.pool_dir, range(args.count), args.width, args.height,
+                      args.robot_r, args.obstacles, args.sdf, args.tiled, goal)
+    print(f"Map pool at {args.pool_dir}: {made} generated, {args.count - made} already present")
@@ -0,0 +1,237 @@
+import time
+from pathlib import Path
+from typing import Optional, Tuple
+
+import numpy as np
+
+
+class TiledGrid:
+    """
+    Sparse occupancy grid for floor plans too large for a dense per-pixel mask:
+    - The map is cut into tile x tile blocks; only blocks holding an occupied cell are stored,
+      bit-packed at 1 bit per cell, so memory follows the occupied area, not the bounding box
+    - An (H/tile, W/tile) index maps every block to its slot in the tile stack; slot 0 is a shared
+      all-free tile, so lookups never branch on whether a block exists
+    - Tiles are materialized lazily, the first time a write puts an occupied cell in them
+    - sample() has the (values, out_of_bounds) contract of lidar.sample_grid, so RayCaster and
+      swept_collides run on a TiledGrid unchanged; grid[y, x] works like the dense mask
+    """
+
+    def __init__(self, width: int, height: int, tile: int = 64):
+        if tile < 8 or tile & (tile - 1):
+            raise ValueError(f"tile must be a power of two >= 8, got {tile}")
+        self.W, self.H, self.tile = width, height, tile
+        self._shift = tile.bit_length() - 1
+        self._mask = tile - 1
+        self._row_bytes = tile // 8
+        self._index = np.zeros((-(-height // tile), -(-width // tile)), dtype=np.int32)
+        self._tiles = np.zeros((8, tile, self._row_bytes), dtype=np.uint8)
+        self._n = 1  # slot 0 stays all-free
+        self._free = []
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self.H, self.W
+
+    @property
+    def n_tiles(self) -> int:
+        """Materialized (non-free) tiles."""
+        return self._n - 1 - len(self._free)
+
+    @property
+    def nbytes(self) -> int:
+        return self._index.nbytes + self._n * self._tiles[0].nbytes
+
+    # --------- lookups ----------
+    def __getitem__(self, yx) -> int:
+        y, x = yx
+        if not (0 <= x < self.W and 0 <= y < self.H):
+            raise IndexError(f"cell ({x}, {y}) outside {self.W}x{self.H} grid")
+        slot = self._index[y >> self._shift, x >> self._shift]
+        if slot == 0:
+            return 0
+        byte = self._tiles[slot, y & self._mask, (x & self._mask) >> 3]
+        return (int(byte) >> (7 - (x & 7))) & 1
+
+    def sample(self, xs: np.ndarray, ys: np.ndarray, layer: Optional[np.ndarray] = None):
+        """Occupancy (0/1) at truncated (xs, ys) plus out-of-bounds flags, like lidar.sample_grid."""
+        if layer is not None:
+            raise ValueError("TiledGrid holds a single map layer")
+        xi = xs.astype(np.intp)
+        yi = ys.astype(np.intp)
+        oob = (xi.view(np.uintp) >= self.W) | (yi.view(np.uintp) >= self.H)
+        xi[oob] = 0
+        yi[oob] = 0
+        s, m = self._shift, self._mask
+        slot = self._index.take((yi >> s) * self._index.shape[1] + (xi >> s))
+        flat = (slot * self.tile + (yi & m)) * self._row_bytes + ((xi & m) >> 3)
+        byte = self._tiles[:self._n].reshape(-1).take(flat)
+        return (byte >> (7 - (xi & 7)).astype(np.uint8)) & 1, oob
+
+    def window(self, x0: int, y0: int, x1: int, y1: int) -> np.ndarray:
+        """Dense uint8 copy of cells [y0:y1, x0:x1]; cells outside the map read as free."""
+        out = np.zeros((max(y1 - y0, 0), max(x1 - x0, 0)), dtype=np.uint8)
+        cx0, cy0, cx1, cy1 = max(x0, 0), max(y0, 0), min(x1, self.W), min(y1, self.H)
+        if cx0 >= cx1 or cy0 >= cy1:
+            return out
+        t, s = self.tile, self._shift
+        tx0, ty0, tx1, ty1 = cx0 >> s, cy0 >> s, ((cx1 - 1) >> s) + 1, ((cy1 - 1) >> s) + 1
+        slots = self._index[ty0:ty1, tx0:tx1]
+        if not slots.any():
+            return out
+        blocks = np.unpackbits(self._tiles[slots], axis=-1)  # (nty, ntx, t, t)
+        dense = blocks.transpose(0, 2, 1, 3).reshape((ty1 - ty0) * t, (tx1 - tx0) * t)
+        out[cy0 - y0:cy1 - y0, cx0 - x0:cx1 - x0] = dense[cy0 - ty0 * t:cy1 - ty0 * t,
+                                                          cx0 - tx0 * t:cx1 - tx0 * t]
+        return out
+
+    def to_dense(self) -> np.ndarray:
+        return self.window(0, 0, self.W, self.H)
+
+    # --------- writes ----------
+    def _alloc(self) -> int:
+        if self._free:
+            return self._free.pop()
+        if self._n == len(self._tiles):
+            grown = np.zeros((2 * len(self._tiles),) + self._tiles.shape[1:], dtype=np.uint8)
+            grown[:self._n] = self._tiles[:self._n]
+            self._tiles = grown
+        self._n += 1
+        return self._n - 1
+
+    def _aligned(self, x0: int, y0: int, block: np.ndarray):
+        """Clip block at (x0, y0) to the map and pad it to whole tiles: (ty0, tx0, (nty, ntx, t, t))."""
+        h, w = block.shape
+        cx0, cy0, cx1, cy1 = max(x0, 0), max(y0, 0), min(x0 + w, self.W), min(y0 + h, self.H)
+        if cx0 >= cx1 or cy0 >= cy1:
+            return None
+        t, s = self.tile, self._shift
+        tx0, ty0, tx1, ty1 = cx0 >> s, cy0 >> s, ((cx1 - 1) >> s) + 1, ((cy1 - 1) >> s) + 1
+        aligned = np.zeros(((ty1 - ty0) * t, (tx1 - tx0) * t), dtype=bool)
+        aligned[cy0 - ty0 * t:cy1 - ty0 * t, cx0 - tx0 * t:cx1 - tx0 * t] = \
+            block[cy0 - y0:cy1 - y0, cx0 - x0:cx1 - x0]
+        return ty0, tx0, aligned.reshape(ty1 - ty0, t, tx1 - tx0, t).transpose(0, 2, 1, 3)
+
+    def or_block(self, x0: int, y0: int, block: np.ndarray):
+        """Mark the nonzero cells of a dense block placed at (x0, y0) as occupied."""
+        aligned = self._aligned(x0, y0, np.asarray(block) != 0)
+        if aligned is None:
+            return
+        ty0, tx0, blocks = aligned
+        for ty, tx in np.argwhere(blocks.any(axis=(2, 3))):
+            slot = self._index[ty0 + ty, tx0 + tx]
+            if slot == 0:
+                slot = self._index[ty0 + ty, tx0 + tx] = self._alloc()
+            self._tiles[slot] |= np.packbits(blocks[ty, tx], axis=-1)
+
+    def fill_rect(self, x0: int, y0: int, x1: int, y1: int, value: bool = True):
+        """Set cells [y0:y1, x0:x1] occupied (value=True) or free; emptied tiles are released."""
+        if value:
+            self.or_block(x0, y0, np.ones((max(y1 - y0, 0), max(x1 - x0, 0)), dtype=bool))
+            return
+        aligned = self._aligned(x0, y0, np.ones((max(y1 - y0, 0), max(x1 - x0, 0)), dtype=bool))
+        if aligned is None:
+            return
+        ty0, tx0, blocks = aligned
+        for ty, tx in np.argwhere(blocks.any(axis=(2, 3))):
+            slot = self._index[ty0 + ty, tx0 + tx]
+            if slot == 0:
+                continue
+            self._tiles[slot] &= ~np.packbits(blocks[ty, tx], axis=-1)
+            if not self._tiles[slot].any():
+                self._index[ty0 + ty, tx0 + tx] = 0
+                self._free.append(int(slot))
+
+    @classmethod
+    def from_dense(cls, mask: np.ndarray, tile: int = 64) -> "TiledGrid":
+        grid = cls(mask.shape[1], mask.shape[0], tile)
+        grid.or_block(0, 0, mask)
+        return grid
+
+    # --------- inflation ----------
+    def inflate(self, radius: int) -> "TiledGrid":
+        """
+        Dilate with the same (2r x 2r) elliptical kernel as the dense masks, one tile row at a time:
+        each band is the tile row plus radius of halo, restricted to the columns of nearby tiles.
+        """
+        import cv2
+
+        kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (radius * 2, radius * 2))
+        out = TiledGrid(self.W, self.H, self.tile)
+        t = self.tile
+        reach = -(-radius // t)  # tile rows/cols within radius of a tile
+        occupied = self._index > 0
+        for ty in range(occupied.shape[0]):
+            near = occupied[max(ty - reach, 0):ty + reach + 1].any(axis=0)
+            cols = np.flatnonzero(near)
+            if cols.size == 0:
+                continue
+            x0 = max((cols[0] - reach) * t, 0)
+            x1 = min((cols[-1] + reach + 1) * t, self.W)
+            y0, y1 = ty * t, min((ty + 1) * t, self.H)
+            band = self.window(x0 - radius, y0 - radius, x1 + radius, y1 + radius)
+            band = cv2.dilate(band, kernel, iterations=1)
+            out.or_block(x0, y0, band[radius:radius + y1 - y0, radius:radius + x1 - x0])
+        return out
+
+    # --------- disk ----------
+    def compact(self):
+        """Trim spare tile capacity (call once a grid is fully built)."""
+        self._tiles = self._tiles[:self._n].copy()
+
+    def arrays(self):
+        """The backing arrays, including spare tile capacity until compact()."""
+        return [self._index, self._tiles]
+
+    def save(self, d: Path, name: str):
+        np.save(Path(d) / f"{name}.index.npy", self._index)
+        np.save(Path(d) / f"{name}.tiles.npy", self._tiles[:self._n])
+
+    @classmethod
+    def load(cls, d: Path, name: str, width: int, height: int) -> "TiledGrid":
+        """Memory-map a saved grid (read-only)."""
+        tiles = np.load(Path(d) / f"{name}.tiles.npy", mmap_mode="r")
+        grid = cls(width, height, tiles.shape[1])
+        grid._index = np.load(Path(d) / f"{name}.index.npy", mmap_mode="r")
+        grid._tiles, grid._n = tiles, len(tiles)
+        return grid
+
+
+if __name__ == "__main__":
+    # parity with the dense masks on a normal map, then memory on a large sparse floor plan
+    import sys
+
+    from lidar import RayCaster, sample_grid
+    from map_cache import MapKey, generate_map
+
+    key = MapKey(7, 700, 500, 10)
+    dense, tiled = generate_map(key), generate_map(key._replace(tiled=True))
+    assert (tiled.obstacle_mask.to_dense() == dense.obstacle_mask).all(), "obstacle mask differs"
+    assert (tiled.inflated_mask.to_dense() == dense.inflated_mask).all(), "inflated mask differs"
+
+    rng = np.random.default_rng(0)
+    xs, ys = rng.uniform(-20, 720, 10000), rng.uniform(-20, 520, 10000)
+    for a, b in zip(sample_grid(dense.inflated_mask, xs, ys), tiled.inflated_mask.sample(xs, ys)):
+        assert (a == b).all()
+    rc = RayCaster(8)
+    pos, heads = rng.uniform(0, 500, (500, 2)), rng.uniform(0, 6.3, 500)
+    assert (rc.cast_batch(dense.inflated_mask, pos, heads) == rc.cast_batch(tiled.inflated_mask, pos, heads)).all()
+    g = TiledGrid.from_dense(dense.inflated_mask)
+    g.fill_rect(100, 100, 400, 300, value=False)
+    ref = dense.inflated_mask.copy()
+    ref[100:300, 100:400] = 0
+    assert (g.to_dense() == ref).all()
+    print("TiledGrid parity OK")
+
+    side = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    t0 = time.perf_counter()
+    big = generate_map(MapKey(1, side, side, 10, num_obstacles=200, tiled=True))
+    build = time.perf_counter() - t0
+    dense_mb = side * side * 5 / 2**20  # BGR canvas + two uint8 masks
+    print(f"{side}x{side} map: {big.nbytes / 2**20:.1f} MiB tiled vs {dense_mb:.0f} MiB dense, "
+          f"{big.inflated_mask.n_tiles} tiles, built in {build:.2f}s")
+    xs, ys = rng.uniform(0, side, (8, 70)), rng.uniform(0, side, (8, 70))
+    t0 = time.perf_counter()
+    for _ in range(1000):
+        big.inflated_mask.sample(xs, ys)
+    print(f"sample 8x70 cells: {(time.perf_counter() - t0) * 1e3:.1f} us")
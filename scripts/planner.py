@@ -0,0 +1,545 @@
+import argparse
+import heapq
+import math
+import time
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from collision import swept_collides
+
+INF = float("inf")
+# integer move costs (99/70 ~ sqrt(2)): searches compare exact sums, so key ties in D* Lite can't be
+# broken by float rounding the wrong way
+STRAIGHT, DIAGONAL = 70, 99
+# 8-connected moves (dx, dy, cost)
+MOVES = ((1, 0, STRAIGHT), (-1, 0, STRAIGHT), (0, 1, STRAIGHT), (0, -1, STRAIGHT),
+         (1, 1, DIAGONAL), (1, -1, DIAGONAL), (-1, 1, DIAGONAL), (-1, -1, DIAGONAL))
+
+
+def octile(ax: int, ay: int, bx: int, by: int) -> int:
+    """Exact cost of the cheapest obstacle-free move sequence between two cells (the A* heuristic)."""
+    dx, dy = abs(ax - bx), abs(ay - by)
+    return STRAIGHT * (dx + dy) + (DIAGONAL - 2 * STRAIGHT) * min(dx, dy)
+
+
+def pool_blocked(mask, cell: int, cx0: int, cy0: int, cx1: int, cy1: int) -> np.ndarray:
+    """
+    Blocked flags (uint8) for cells [cy0:cy1, cx0:cx1] of size cell x cell px: a cell is blocked if any
+    of its pixels is (conservative, so paths through free cells never touch the inflated mask).
+    Pixels outside the map count as blocked. mask is a dense (H, W) array or an occupancy.TiledGrid.
+    """
+    H, W = mask.shape
+    x0, y0, x1, y1 = cx0 * cell, cy0 * cell, cx1 * cell, cy1 * cell
+    px = np.ones((y1 - y0, x1 - x0), dtype=np.uint8)
+    ix1, iy1 = min(x1, W), min(y1, H)
+    if x0 < ix1 and y0 < iy1:
+        inner = mask.window(x0, y0, ix1, iy1) if hasattr(mask, "window") else mask[y0:iy1, x0:ix1]
+        px[:iy1 - y0, :ix1 - x0] = inner != 0
+    return px.reshape(cy1 - cy0, cell, cx1 - cx0, cell).max(axis=(1, 3))
+
+
+class CellGrid:
+    """
+    8-connected search graph over pooled cells (flat index i = y * w + x). Diagonal moves may not
+    cut a corner: both orthogonal cells next to the move must be free.
+    """
+
+    def __init__(self, blocked: np.ndarray):
+        self.h, self.w = blocked.shape
+        self.blocked = bytearray(blocked.astype(np.uint8).tobytes())
+
+    def free(self, x: int, y: int) -> bool:
+        return 0 <= x < self.w and 0 <= y < self.h and not self.blocked[y * self.w + x]
+
+    def edges(self, i: int) -> List[Tuple[int, int]]:
+        """(neighbor, cost) for every move out of free cell i."""
+        w, b = self.w, self.blocked
+        if b[i]:
+            return []
+        x, y = i % w, i // w
+        out = []
+        for dx, dy, c in MOVES:
+            nx, ny = x + dx, y + dy
+            if 0 <= nx < w and 0 <= ny < self.h:
+                j = ny * w + nx
+                if b[j] or (dx and dy and (b[y * w + nx] or b[ny * w + x])):
+                    continue
+                out.append((j, c))
+        return out
+
+    def adjacent(self, i: int) -> List[int]:
+        """All in-bounds neighbors, blocked or not (whose edges change when i does)."""
+        w = self.w
+        x, y = i % w, i // w
+        return [(y + dy) * w + x + dx for dx, dy, _ in MOVES if 0 <= x + dx < w and 0 <= y + dy < self.h]
+
+    def heuristic(self, a: int, b: int) -> int:
+        w = self.w
+        return octile(a % w, a // w, b % w, b // w)
+
+
+# --------- one-shot search: A* with jump point search ----------
+def jps(grid: CellGrid, start: int, goal: int) -> Optional[List[int]]:
+    """
+    A* over jump points (Harabor & Grastien 2011, no-corner-cutting variant): straight and diagonal runs
+    are scanned without touching the open list, which only sees cells with forced neighbors.
+    Returns the jump-point cells from start to goal (consecutive ones lie on straight/diagonal
+    lines of free cells), or None if goal is unreachable.
+    """
+    w, free = grid.w, grid.free
+    gx, gy = goal % w, goal // w
+
+    def jump(x, y, dx, dy):
+        while True:
+            if not free(x, y):
+                return None
+            if x == gx and y == gy:
+                return x, y
+            if dx and dy:
+                if jump(x + dx, y, dx, 0) is not None or jump(x, y + dy, 0, dy) is not None:
+                    return x, y
+                if not (free(x + dx, y) and free(x, y + dy)):
+                    return None
+            elif dx:
+                if (free(x, y - 1) and not free(x - dx, y - 1)) or (free(x, y + 1) and not free(x - dx, y + 1)):
+                    return x, y
+            elif (free(x - 1, y) and not free(x - 1, y - dy)) or (free(x + 1, y) and not free(x + 1, y - dy)):
+                return x, y
+            x += dx
+            y += dy
+
+    def directions(x, y, parent):
+        if parent is None:
+            return [(dx, dy) for dx, dy, _ in MOVES
+                    if free(x + dx, y + dy) and not (dx and dy and not (free(x + dx, y) and free(x, y + dy)))]
+        px, py = parent % w, parent // w
+        dx, dy = (x > px) - (x < px), (y > py) - (y < py)
+        out = []
+        if dx and dy:
+            if free(x, y + dy):
+                out.append((0, dy))
+            if free(x + dx, y):
+                out.append((dx, 0))
+            if free(x, y + dy) and free(x + dx, y):
+                out.append((dx, dy))
+        elif dx:
+            ahead, up, down = free(x + dx, y), free(x, y + 1), free(x, y - 1)
+            if ahead:
+                out.append((dx, 0))
+                if up and free(x + dx, y + 1):
+                    out.append((dx, 1))
+                if down and free(x + dx, y - 1):
+                    out.append((dx, -1))
+            if up:
+                out.append((0, 1))
+            if down:
+                out.append((0, -1))
+        else:
+            ahead, right, left = free(x, y + dy), free(x + 1, y), free(x - 1, y)
+            if ahead:
+                out.append((0, dy))
+                if right and free(x + 1, y + dy):
+                    out.append((1, dy))
+                if left and free(x - 1, y + dy):
+                    out.append((-1, dy))
+            if right:
+                out.append((1, 0))
+            if left:
+                out.append((-1, 0))
+        return out
+
+    if grid.blocked[start] or grid.blocked[goal]:
+        return None
+    g = {start: 0}
+    parent = {start: None}
+    closed = set()
+    open_ = [(grid.heuristic(start, goal), 0, start)]
+    while open_:
+        _, gs, i = heapq.heappop(open_)
+        if i in closed:
+            continue
+        if i == goal:
+            path = []
+            while i is not None:
+                path.append(i)
+                i = parent[i]
+            return path[::-1]
+        closed.add(i)
+        x, y = i % w, i // w
+        for dx, dy in directions(x, y, parent[i]):
+            jp = jump(x + dx, y + dy, dx, dy)
+            if jp is None:
+                continue
+            j = jp[1] * w + jp[0]
+            if j in closed:
+                continue
+            gj = gs + octile(x, y, jp[0], jp[1])
+            if gj < g.get(j, INF):
+                g[j] = gj
+                parent[j] = i
+                heapq.heappush(open_, (gj + grid.heuristic(j, goal), gj, j))
+    return None
+
+
+# --------- incremental search: D* Lite ----------
+class DStarLite:
+    """
+    D* Lite (Koenig & Likhachev 2002) rooted at one goal cell:
+    - g / rhs hold cost-to-goal estimates; the search only settles cells until the current start is
+      consistent, so later queries from other starts resume the same search (keys stay valid
+      through the km offset)
+    - update_cells() repairs the search after cells flip between free and blocked, touching only
+      the region whose cost-to-goal actually changed
+    """
+
+    def __init__(self, grid: CellGrid, goal: int, start: int):
+        n = grid.w * grid.h
+        self.grid = grid
+        self.goal = goal
+        self.start = self.last = start
+        self.km = 0
+        self.g = [INF] * n
+        self.rhs = [INF] * n
+        self.expanded = 0
+        self._open = []
+        self._key = {}  # cell -> key it is queued under (older heap entries are stale)
+        self.rhs[goal] = 0
+        self._push(goal)
+
+    def _calc(self, s: int) -> Tuple[float, float]:
+        m = min(self.g[s], self.rhs[s])
+        return m + self.grid.heuristic(self.start, s) + self.km, m
+
+    def _push(self, s: int):
+        k = self._calc(s)
+        self._key[s] = k
+        heapq.heappush(self._open, (k[0], k[1], s))
+
+    def _top(self) -> Tuple[float, float]:
+        while self._open:
+            k1, k2, s = self._open[0]
+            if self._key.get(s) == (k1, k2):
+                return k1, k2
+            heapq.heappop(self._open)
+        return INF, INF
+
+    def _update(self, u: int):
+        if u != self.goal:
+            g = self.g
+            self.rhs[u] = min((c + g[j] for j, c in self.grid.edges(u)), default=INF)
+        if self.g[u] != self.rhs[u]:
+            self._push(u)
+        else:
+            self._key.pop(u, None)
+
+    def set_start(self, start: int):
+        if start != self.start:
+            self.start = start
+            self.km += self.grid.heuristic(self.last, start)
+            self.last = start
+
+    def compute(self):
+        g, rhs, s = self.g, self.rhs, self.start
+        while True:
+            top = self._top()
+            if top[0] == INF or not (top < self._calc(s) or rhs[s] != g[s]):
+                return
+            _, _, u = heapq.heappop(self._open)
+            del self._key[u]
+            self.expanded += 1
+            k_new = self._calc(u)
+            if top < k_new:
+                self._push(u)
+            elif g[u] > rhs[u]:
+                g[u] = rhs[u]
+                for j in self.grid.adjacent(u):
+                    self._update(j)
+            else:
+                g[u] = INF
+                self._update(u)
+                for j in self.grid.adjacent(u):
+                    self._update(j)
+
+    def update_cells(self, cells):
+        """Cells whose blocked flag changed in the grid."""
+        touched = set()
+        for c in cells:
+            touched.add(c)
+            touched.update(self.grid.adjacent(c))
+        for u in touched:
+            self._update(u)
+
+    def path(self) -> Optional[List[int]]:
+        """Cells from start to goal by steepest descent of g (after compute()); None if unreachable."""
+        g, i = self.g, self.start
+        if g[i] == INF:
+            return None
+        path = [i]
+        for _ in range(len(g)):
+            if i == self.goal:
+                return path
+            i = min(self.grid.edges(i), key=lambda e: e[1] + g[e[0]])[0]
+            path.append(i)
+        return None
+
+
+class PathPlanner:
+    """
+    Global planner for one map's inflated mask:
+    - plans run on cell x cell px pooled cells (blocked if any pixel is), then are shortened by
+      string pulling with exact swept checks against the full-resolution mask
+    - method="dstar" keeps one D* Lite search per goal cell (LRU, max_plans), so replanning to a
+      cached goal from anywhere on the map resumes it instead of starting over
+    - method="jps" runs a fresh jump-point A* for one-off queries
+    - update(x0, y0, x1, y1) re-pools a changed pixel region and repairs every cached search
+    """
+
+    def __init__(self, inflated_mask, cell: int = 5, max_plans: int = 16):
+        self.mask = inflated_mask
+        self.cell = cell
+        H, W = inflated_mask.shape
+        self.grid = CellGrid(pool_blocked(inflated_mask, cell, 0, 0, -(-W // cell), -(-H // cell)))
+        self.max_plans = max_plans
+        self._plans: "OrderedDict[int, DStarLite]" = OrderedDict()
+        self.hits = self.misses = 0
+
+    # --------- cells <-> pixels ----------
+    def center(self, i: int) -> Tuple[float, float]:
+        w, c = self.grid.w, self.cell
+        return (i % w + 0.5) * c, (i // w + 0.5) * c
+
+    def free_cell(self, p, reach: int = 3) -> Optional[int]:
+        """Nearest free cell (within reach cells) whose center is reachable in a straight line from pixel p."""
+        cx, cy = int(p[0] // self.cell), int(p[1] // self.cell)
+        cand = [(dx * dx + dy * dy, (cy + dy) * self.grid.w + cx + dx)
+                for dy in range(-reach, reach + 1) for dx in range(-reach, reach + 1)
+                if self.grid.free(cx + dx, cy + dy)]
+        if not cand:
+            return None
+        cand.sort()
+        cells = [i for _, i in cand]
+        centers = np.array([self.center(i) for i in cells])
+        n = len(cells)
+        hit = swept_collides(self.mask, np.full(n, float(p[0])), np.full(n, float(p[1])), centers[:, 0], centers[:, 1])
+        ok = np.flatnonzero(~hit)
+        return cells[ok[0]] if ok.size else None
+
+    # --------- planning ----------
+    def search(self, goal: int, start: int) -> DStarLite:
+        """The cached D* Lite search towards goal, moved to start and brought up to date."""
+        ds = self._plans.get(goal)
+        if ds is None:
+            self.misses += 1
+            ds = self._plans[goal] = DStarLite(self.grid, goal, start)
+            while len(self._plans) > self.max_plans:
+                self._plans.popitem(last=False)
+        else:
+            self.hits += 1
+            self._plans.move_to_end(goal)
+            ds.set_start(start)
+        ds.compute()
+        return ds
+
+    def plan(self, start, goal, method: str = "dstar", smooth: bool = True) -> Optional[np.ndarray]:
+        """(K, 2) pixel waypoints from start to goal (both included); None if there is no path."""
+        s, g = self.free_cell(start), self.free_cell(goal)
+        if s is None or g is None:
+            return None
+        if method == "dstar":
+            cells = self.search(g, s).path()
+        elif method == "jps":
+            cells = jps(self.grid, s, g)
+            if cells is not None:
+                cells = self._expand(cells)  # every cell, so string pulling has the same choices
+        else:
+            raise ValueError(f"Unknown planning method: {method!r} (expected 'dstar' or 'jps')")
+        if cells is None:
+            return None
+        pts = np.array([start] + [self.center(i) for i in cells] + [goal], dtype=np.float64)
+        return self.shorten(pts) if smooth else pts
+
+    def _expand(self, jump_points: List[int]) -> List[int]:
+        w = self.grid.w
+        cells = [jump_points[0]]
+        for a, b in zip(jump_points, jump_points[1:]):
+            ax, ay, bx, by = a % w, a // w, b % w, b // w
+            dx, dy = (bx > ax) - (bx < ax), (by > ay) - (by < ay)
+            for k in range(1, max(abs(bx - ax), abs(by - ay)) + 1):
+                cells.append((ay + k * dy) * w + ax + k * dx)
+        return cells
+
+    def shorten(self, pts: np.ndarray) -> np.ndarray:
+        """String pulling: from each kept waypoint jump to the farthest one in straight-line sight."""
+        keep = [0]
+        i, n = 0, len(pts)
+        while i < n - 1:
+            rest = pts[i + 1:]
+            blocked = swept_collides(self.mask, np.full(len(rest), pts[i, 0]), np.full(len(rest), pts[i, 1]),
+                                     rest[:, 0], rest[:, 1])
+            clear = np.flatnonzero(~blocked)
+            i = i + 1 + (int(clear[-1]) if clear.size else 0)
+            keep.append(i)
+        return pts[keep]
+
+    def update(self, x0: int, y0: int, x1: int, y1: int):
+        """The inflated mask changed inside pixels [y0:y1, x0:x1]: re-pool those cells, repair searches."""
+        c, grid = self.cell, self.grid
+        cx0, cy0 = max(x0 // c, 0), max(y0 // c, 0)
+        cx1, cy1 = min(-(-x1 // c), grid.w), min(-(-y1 // c), grid.h)
+        if cx0 >= cx1 or cy0 >= cy1:
+            return []
+        fresh = pool_blocked(self.mask, c, cx0, cy0, cx1, cy1)
+        old = np.frombuffer(grid.blocked, dtype=np.uint8).reshape(grid.h, grid.w)[cy0:cy1, cx0:cx1]
+        ys, xs = np.nonzero(fresh != old)
+        changed = ((ys + cy0) * grid.w + xs + cx0).tolist()
+        for i in changed:
+            grid.blocked[i] ^= 1
+        if changed:
+            for ds in self._plans.values():
+                ds.update_cells(changed)
+        return changed
+
+
+def path_length(pts: np.ndarray) -> float:
+    return float(np.linalg.norm(np.diff(pts, axis=0), axis=1).sum())
+
+
+# --------- benchmark baseline ----------
+def reactive_walk(mask: np.ndarray, start, goal, speed: float = 2.5, robot_r: int = 10, ray_dist: int = 30,
+                  max_steps: int = 4000, seed: int = 0):
+    """
+    robot_simulation.py's reactive walker, steered at the goal: head straight for it while the
+    look-ahead is free, else sweep +-45 deg for a free heading, else a random nudge.
+    Returns (reached, travelled px, steps).
+    """
+    rng = np.random.default_rng(seed)
+    H, W = mask.shape
+    pos = np.array(start, dtype=np.float64)
+    goal = np.asarray(goal, dtype=np.float64)
+    heading = math.atan2(goal[1] - pos[1], goal[0] - pos[0])
+    ds = np.arange(robot_r, ray_dist, 2)
+
+    def free_ahead(angle):
+        xs = (pos[0] + math.cos(angle) * ds).astype(np.intp)
+        ys = (pos[1] + math.sin(angle) * ds).astype(np.intp)
+        inside = (xs >= 0) & (xs < W) & (ys >= 0) & (ys < H)
+        return inside.all() and not mask[ys, xs].any()
+
+    travelled = 0.0
+    for step in range(max_steps):
+        d = goal - pos
+        if math.hypot(d[0], d[1]) < speed:
+            return True, travelled + math.hypot(d[0], d[1]), step + 1
+        to_goal = math.atan2(d[1], d[0])
+        if free_ahead(to_goal):
+            heading = to_goal
+        elif not free_ahead(heading):
+            for delta in np.linspace(0, math.pi / 4, 20):
+                cands = [a for a in (heading + delta, heading - delta) if free_ahead(a)]
+                if cands:
+                    heading = cands[0]
+                    break
+            else:
+                heading += rng.uniform(-math.pi, math.pi)
+        new = pos + np.array([math.cos(heading), math.sin(heading)]) * speed
+        if swept_collides(mask, pos[0], pos[1], new[0], new[1])[0]:
+            heading += rng.uniform(math.radians(20), math.radians(160))
+        else:
+            travelled += speed
+            pos = new
+    return False, travelled, max_steps
+
+
+if __name__ == "__main__":
+    from map_cache import MapKey, generate_map
+
+    ap = argparse.ArgumentParser(description="Global planner vs reactive walker: planning time and path length")
+    ap.add_argument("--maps", type=int, default=10)
+    ap.add_argument("--goals", type=int, default=5, help="random goals per map")
+    ap.add_argument("--cell", type=int, default=5)
+    args = ap.parse_args()
+
+    stats = {k: [] for k in ("jps", "dstar", "dstar_cached", "dstar_repair", "dstar_scratch")}
+    lengths = {"straight line": [], "jps": [], "dstar": [], "reactive": [], "dstar, same goals": []}
+    reactive_ok = 0
+    n_pairs = 0
+    for seed in range(args.maps):
+        wmap = generate_map(MapKey(seed, 700, 500, 10))
+        mask = np.array(wmap.inflated_mask)  # writable copy for the obstacle-change test
+        rng = np.random.default_rng(seed)
+        planner = PathPlanner(mask, args.cell)
+        start = (40.0, 40.0)
+        pairs = 0
+        while pairs < args.goals:
+            goal = (float(rng.uniform(20, 680)), float(rng.uniform(20, 480)))
+            if mask[int(goal[1]), int(goal[0])]:
+                continue
+            t0 = time.perf_counter()
+            a = planner.plan(start, goal, "jps")
+            t1 = time.perf_counter()
+            b = planner.plan(start, goal, "dstar")
+            t2 = time.perf_counter()
+            if a is None or b is None:
+                assert a is None and b is None, "JPS and D* Lite disagree on reachability"
+                continue  # goal inside a hollow obstacle
+            stats["jps"].append(t1 - t0)
+            stats["dstar"].append(t2 - t1)
+            # every waypoint-to-waypoint move is collision-free at full resolution
+            for p in (a, b):
+                assert not swept_collides(mask, p[:-1, 0], p[:-1, 1], p[1:, 0], p[1:, 1]).any()
+            la, lb = path_length(a), path_length(b)
+            raw_a = path_length(planner.plan(start, goal, "jps", smooth=False))
+            raw_b = path_length(planner.plan(start, goal, "dstar", smooth=False))
+            assert abs(raw_a - raw_b) < 2 * args.cell, (raw_a, raw_b)  # both optimal on the cell graph
+            lengths["straight line"].append(math.dist(start, goal))
+            lengths["jps"].append(la)
+            lengths["dstar"].append(lb)
+
+            # replan from midway along the path (robot has moved): resumes the cached search
+            mid = tuple(b[len(b) // 2])
+            t0 = time.perf_counter()
+            planner.plan(mid, goal, "dstar")
+            stats["dstar_cached"].append(time.perf_counter() - t0)
+
+            # drop a 40x40 px box on the path and repair vs replanning from scratch
+            bx, by = int(b[1][0]), int(b[1][1])
+            if not (abs(bx - start[0]) < 60 and abs(by - start[1]) < 60) and not \
+                    (abs(bx - goal[0]) < 60 and abs(by - goal[1]) < 60):
+                saved = mask[by - 20:by + 20, bx - 20:bx + 20].copy()
+                mask[by - 20:by + 20, bx - 20:bx + 20] = 1
+                t0 = time.perf_counter()
+                planner.update(bx - 20, by - 20, bx + 20, by + 20)
+                repaired = planner.plan(start, goal, "dstar", smooth=False)
+                stats["dstar_repair"].append(time.perf_counter() - t0)
+                fresh = PathPlanner(mask, args.cell)
+                t0 = time.perf_counter()
+                scratch = fresh.plan(start, goal, "dstar", smooth=False)
+                stats["dstar_scratch"].append(time.perf_counter() - t0)
+                # the repaired search must find the same optimal cost as a fresh one
+                s_cell, g_cell = fresh.free_cell(start), fresh.free_cell(goal)
+                assert planner.search(g_cell, s_cell).g[s_cell] == fresh.search(g_cell, s_cell).g[s_cell]
+                mask[by - 20:by + 20, bx - 20:bx + 20] = saved
+                planner.update(bx - 20, by - 20, bx + 20, by + 20)
+
+            ok, travelled, steps = reactive_walk(mask, start, goal, seed=pairs)
+            reactive_ok += ok
+            if ok:
+                lengths["reactive"].append(travelled)
+                lengths["dstar, same goals"].append(lb)
+            pairs += 1
+            n_pairs += 1
+
+    print(f"{n_pairs} start/goal pairs on {args.maps} maps, {args.cell}px cells\n")
+    print(f"{'planning':<32} {'mean ms':>8} {'p99 ms':>8}")
+    names = {"jps": "JPS A* (fresh)", "dstar": "D* Lite (new goal)", "dstar_cached": "D* Lite (cached goal, moved)",
+             "dstar_repair": "D* Lite repair after new box", "dstar_scratch": "D* Lite from scratch (same)"}
+    for k, v in stats.items():
+        if v:
+            v = np.array(v) * 1e3
+            print(f"{names[k]:<32} {v.mean():>8.2f} {np.percentile(v, 99):>8.2f}")
+    print(f"\n{'path':<32} {'reached':>8} {'mean px':>8}")
+    for k, v in lengths.items():
+        print(f"{k:<32} {f'{len(v)}/{n_pairs}':>8} {np.mean(v) if v else float('nan'):>8.1f}")
+    print("(the reactive walker gives up after 4000 steps; the last row is the planner on the goals it reached)")
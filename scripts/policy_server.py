@@ -0,0 +1,315 @@
+import argparse
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+DEFAULT_MODEL = "models/ppo_nav/warehouse_robot_rl.zip"
+VEC_NORMALIZE = "vec_normalize.pkl"  # written next to the model by train_rl_agent.py --normalize
+
+ACTIVATIONS = {
+    "Tanh": np.tanh,
+    "ReLU": lambda x: np.maximum(x, 0, out=x),
+}
+
+
+def load_obs_norm(model_path: str) -> Optional[Tuple[np.ndarray, np.ndarray, float]]:
+    """(mean, std, clip) of the VecNormalize statistics saved next to model_path; None if it has none."""
+    path = Path(model_path).with_name(VEC_NORMALIZE)
+    if not path.exists():
+        return None
+    import pickle
+
+    with open(path, "rb") as f:
+        vn = pickle.load(f)  # VecNormalize without its venv
+    if not vn.norm_obs:
+        return None
+    return vn.obs_rms.mean, np.sqrt(vn.obs_rms.var + vn.epsilon), float(vn.clip_obs)
+
+
+def normalize_obs(obs: np.ndarray, obs_norm) -> np.ndarray:
+    """VecNormalize.normalize_obs with load_obs_norm() statistics (float64 math, float32 result)."""
+    if obs_norm is None:
+        return obs
+    mean, std, clip = obs_norm
+    return np.clip((obs - mean) / std, -clip, clip).astype(np.float32)
+
+
+class NumpyPolicy:
+    """
+    Actor of a trained SB3 MlpPolicy (policy_net layers + action_net) as a pure-NumPy forward pass:
+    float32 matmuls on a (N, obs_dim) batch, no torch / SB3 dispatch per call.
+    Deterministic actions are the argmax of the logits, exactly as model.predict(deterministic=True).
+    obs_norm (load_obs_norm) applies the training run's VecNormalize statistics to raw observations.
+    """
+
+    def __init__(self, layers: List[Tuple[np.ndarray, np.ndarray]], activation: str = "Tanh", obs_norm=None):
+        if activation not in ACTIVATIONS:
+            raise ValueError(f"Unsupported activation {activation!r} (expected one of {list(ACTIVATIONS)})")
+        # stored as (in, out) so the forward pass is x @ W + b
+        self.layers = [(np.ascontiguousarray(w.T, dtype=np.float32), b.astype(np.float32)) for w, b in layers]
+        self.activation = activation
+        self._act = ACTIVATIONS[activation]
+        self.obs_norm = obs_norm
+
+    @property
+    def obs_dim(self) -> int:
+        return self.layers[0][0].shape[0]
+
+    @property
+    def n_actions(self) -> int:
+        return self.layers[-1][0].shape[1]
+
+    @classmethod
+    def from_sb3(cls, model, obs_norm=None) -> "NumpyPolicy":
+        import torch.nn as nn
+
+        policy = model.policy
+        layers = [(m.weight.detach().cpu().numpy(), m.bias.detach().cpu().numpy())
+                  for m in policy.mlp_extractor.policy_net if isinstance(m, nn.Linear)]
+        head = policy.action_net
+        layers.append((head.weight.detach().cpu().numpy(), head.bias.detach().cpu().numpy()))
+        return cls(layers, policy.activation_fn.__name__, obs_norm)
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_MODEL) -> "NumpyPolicy":
+        """Model plus the VecNormalize statistics saved next to it, if it was trained with --normalize."""
+        from stable_baselines3 import PPO
+
+        return cls.from_sb3(PPO.load(path, device="cpu"), load_obs_norm(path))
+
+    def logits(self, obs: np.ndarray) -> np.ndarray:
+        x = np.asarray(normalize_obs(obs, self.obs_norm), dtype=np.float32).reshape(-1, self.obs_dim)
+        for w, b in self.layers[:-1]:
+            x = x @ w
+            x += b
+            x = self._act(x)
+        w, b = self.layers[-1]
+        return x @ w + b
+
+    def act(self, obs: np.ndarray, deterministic: bool = True,
+            rng: Optional[np.random.Generator] = None) -> np.ndarray:
+        """Actions for a (N, obs_dim) batch (or one obs -> shape (1,))."""
+        logits = self.logits(obs)
+        if deterministic:
+            return logits.argmax(axis=1)
+        # sample from the categorical distribution via the Gumbel-max trick
+        rng = rng if rng is not None else np.random.default_rng()
+        return (logits - np.log(-np.log(rng.random(logits.shape)))).argmax(axis=1)
+
+    def torchscript(self):
+        """The same network as a TorchScript module (obs tensor -> logits), for torch-side deployment."""
+        import warnings
+
+        import torch
+        import torch.nn as nn
+
+        class ObsNorm(nn.Module):
+            """normalize_obs as the first layer (float64 math, like VecNormalize)."""
+
+            def __init__(self, mean, std, clip: float):
+                super().__init__()
+                self.register_buffer("mean", torch.from_numpy(np.asarray(mean, dtype=np.float64)))
+                self.register_buffer("std", torch.from_numpy(np.asarray(std, dtype=np.float64)))
+                self.clip = clip
+
+            def forward(self, x):
+                return torch.clamp((x.double() - self.mean) / self.std, -self.clip, self.clip).float()
+
+        mods = [] if self.obs_norm is None else [ObsNorm(*self.obs_norm)]
+        for i, (w, b) in enumerate(self.layers):
+            lin = nn.Linear(w.shape[0], w.shape[1])
+            lin.weight.data = torch.from_numpy(w.T.copy())
+            lin.bias.data = torch.from_numpy(b.copy())
+            mods.append(lin)
+            if i < len(self.layers) - 1:
+                mods.append(getattr(nn, self.activation)())
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", FutureWarning)  # torch >= 2.5 flags jit as deprecated
+            return torch.jit.script(nn.Sequential(*mods).eval())
+
+
+class TorchScriptPolicy:
+    """NumpyPolicy's interface on top of its TorchScript export (inference mode, CPU)."""
+
+    def __init__(self, policy: NumpyPolicy):
+        import torch
+
+        self._torch = torch
+        self.module = policy.torchscript()
+        self.obs_dim, self.n_actions = policy.obs_dim, policy.n_actions
+
+    def logits(self, obs: np.ndarray) -> np.ndarray:
+        x = self._torch.from_numpy(np.asarray(obs, dtype=np.float32).reshape(-1, self.obs_dim))
+        with self._torch.inference_mode():
+            return self.module(x).numpy()
+
+    def act(self, obs: np.ndarray, deterministic: bool = True,
+            rng: Optional[np.random.Generator] = None) -> np.ndarray:
+        logits = self.logits(obs)
+        if deterministic:
+            return logits.argmax(axis=1)
+        rng = rng if rng is not None else np.random.default_rng()
+        return (logits - np.log(-np.log(rng.random(logits.shape)))).argmax(axis=1)
+
+
+class PolicyServer:
+    """
+    Micro-batching inference loop shared by many robots:
+    - submit(obs) queues one observation and returns a Future of its action
+    - a worker thread takes the first waiting request, gathers more for up to max_wait_ms (or until
+      max_batch), runs one batched forward pass and resolves every Future in the batch
+    - it only waits while the batch is smaller than the recent typical batch (running average), so
+      a lone robot is served immediately and a busy fleet waits for its stragglers
+    """
+
+    def __init__(self, policy, max_batch: int = 64, max_wait_ms: float = 1.0, deterministic: bool = True):
+        self.policy = policy
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1e3
+        self.deterministic = deterministic
+        self.requests = self.batches = 0
+        self._expected = 1.0  # running average batch size
+        self._queue = queue.SimpleQueue()
+        self._rng = np.random.default_rng()
+        self._thread = threading.Thread(target=self._run, name="PolicyServer", daemon=True)
+        self._thread.start()
+
+    def submit(self, obs: np.ndarray) -> Future:
+        fut = Future()
+        self._queue.put((obs, fut))
+        return fut
+
+    def predict(self, obs: np.ndarray, timeout: Optional[float] = None) -> int:
+        return self.submit(obs).result(timeout)
+
+    @property
+    def mean_batch(self) -> float:
+        return self.requests / self.batches if self.batches else 0.0
+
+    def close(self):
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _run(self):
+        stop = False
+        while not stop:
+            item = self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.max_batch:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    if len(batch) >= self._expected:
+                        break
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        break
+                    try:
+                        item = self._queue.get(timeout=remaining)
+                    except queue.Empty:
+                        break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+
+            try:
+                obs = np.stack([np.asarray(o, dtype=np.float32).reshape(-1) for o, _ in batch])
+                actions = self.policy.act(obs, self.deterministic, self._rng)
+            except Exception as e:
+                for _, fut in batch:
+                    fut.set_exception(e)
+                continue
+            self.requests += len(batch)
+            self.batches += 1
+            self._expected += 0.1 * (len(batch) - self._expected)
+            for (_, fut), a in zip(batch, actions):
+                fut.set_result(int(a))
+
+
+# --------- load generator ----------
+def run_load(predict, n_robots: int, seconds: float, obs: np.ndarray):
+    """n_robots closed-loop client threads calling predict(obs_row); returns (latencies_s, requests/s)."""
+    lat = [[] for _ in range(n_robots)]
+    stop_at = time.perf_counter() + seconds
+
+    def robot(k):
+        i, rec = k, lat[k]
+        while True:
+            t0 = time.perf_counter()
+            if t0 >= stop_at:
+                return
+            predict(obs[i % len(obs)])
+            rec.append(time.perf_counter() - t0)
+            i += n_robots
+
+    t0 = time.perf_counter()
+    threads = [threading.Thread(target=robot, args=(k,)) for k in range(n_robots)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+    lat = np.concatenate([np.asarray(x) for x in lat])
+    return lat, len(lat) / elapsed
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Policy inference server latency/throughput under local load")
+    ap.add_argument("--model", default=DEFAULT_MODEL)
+    ap.add_argument("--robots", type=int, nargs="+", default=[1, 8, 64])
+    ap.add_argument("--seconds", type=float, default=2.0, help="load duration per configuration")
+    ap.add_argument("--backends", nargs="+", choices=["sb3", "numpy", "torchscript"],
+                    default=["sb3", "numpy", "torchscript"])
+    ap.add_argument("--max-batch", type=int, default=64)
+    ap.add_argument("--max-wait-ms", type=float, default=1.0)
+    args = ap.parse_args()
+
+    from stable_baselines3 import PPO
+
+    model = PPO.load(args.model, device="cpu")
+    obs_norm = load_obs_norm(args.model)
+    policy = NumpyPolicy.from_sb3(model, obs_norm)
+    obs = np.stack([model.observation_space.sample() for _ in range(4096)])
+
+    # exported forward pass must pick the same actions as SB3 (fed normalized observations, as in training)
+    sb3_actions, _ = model.predict(normalize_obs(obs, obs_norm), deterministic=True)
+    assert (policy.act(obs) == sb3_actions).all(), "NumPy policy disagrees with SB3"
+    assert (TorchScriptPolicy(policy).act(obs) == sb3_actions).all(), "TorchScript policy disagrees with SB3"
+    print("Exported policies match model.predict(deterministic=True)\n")
+
+    print(f"{'backend':<12} {'robots':>6} {'req/s':>10} {'p50 ms':>8} {'p99 ms':>8} {'batch':>6}")
+    for backend in args.backends:
+        for n in args.robots:
+            if backend == "sb3":
+                # baseline: every robot calls model.predict itself, one observation at a time
+                lock = threading.Lock()
+
+                def predict(o):
+                    with lock:
+                        return model.predict(normalize_obs(o, obs_norm), deterministic=True)[0]
+
+                lat, rps = run_load(predict, n, args.seconds, obs)
+                batch = 1.0
+            else:
+                impl = policy if backend == "numpy" else TorchScriptPolicy(policy)
+                with PolicyServer(impl, args.max_batch, args.max_wait_ms) as server:
+                    lat, rps = run_load(server.predict, n, args.seconds, obs)
+                    batch = server.mean_batch
+            p50, p99 = np.percentile(lat * 1e3, [50, 99])
+            print(f"{backend:<12} {n:>6} {rps:>10.0f} {p50:>8.3f} {p99:>8.3f} {batch:>6.1f}")
@@ -1,23 +1,87 @@
 # scripts/preprocess.py
+import json
 import numpy as np
-import cv2
+
+from telemetry_wire import decode, decode_one, is_binary
+
+BATTERY_RANGE = (0, 100)
+SPEED_RANGE = (0.0, 1.5)
 
 def normalize_scalar(x, min_v, max_v):
     x = float(x)
     return max(0.0, min(1.0, (x - min_v) / (max_v - min_v + 1e-9)))
 
+def normalize_array(x, min_v, max_v):
+    """normalize_scalar over a whole column (float64 math, same results)."""
+    x = np.asarray(x, dtype=np.float64)
+    return np.clip((x - min_v) / (max_v - min_v + 1e-9), 0.0, 1.0)
+
 def preprocess_telemetry(msg):
+    if isinstance(msg, (bytes, bytearray, memoryview)):
+        # raw payload: a single-record binary frame, otherwise JSON
+        if not is_binary(msg):
+            return preprocess_telemetry(json.loads(bytes(msg)))
+        _, _, battery, speed, collisions, ts = decode_one(msg)
+        msg = {"battery": battery, "speed": speed, "collisions": collisions, "ts": ts}
     return {
-        "battery_norm": normalize_scalar(msg["battery"], 0, 100),
-        "speed_norm":   normalize_scalar(msg["speed"],   0.0, 1.5),
+        "battery_norm": normalize_scalar(msg["battery"], *BATTERY_RANGE),
+        "speed_norm":   normalize_scalar(msg["speed"],   *SPEED_RANGE),
         "collisions":   int(msg.get("collisions", 0)),
         "ts":           int(msg["ts"])
     }
 
+def preprocess_telemetry_frame(payload):
+    """
+    preprocess_telemetry for a whole binary telemetry frame (telemetry_wire), as columns.
+    device and collisions are views into the payload; only the normalized floats are computed.
+    """
+    frame = decode(payload)
+    r = frame.records
+    return {
+        "device":       r["device"],
+        "battery_norm": normalize_array(r["battery"] / 100, *BATTERY_RANGE),
+        "speed_norm":   normalize_array(r["speed"] / 100, *SPEED_RANGE),
+        "collisions":   r["collisions"],
+        "ts":           frame.ts,
+    }
+
 def preprocess_frame(frame_bgr, size=(84,84)):
+    import cv2  # lazily: the telemetry helpers above must not pay for OpenCV
+
     gray = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2GRAY)
     gray = cv2.GaussianBlur(gray, (3,3), 0)
     gray = cv2.resize(gray, size, interpolation=cv2.INTER_AREA)
     gray = gray.astype(np.float32) / 255.0
     # CHW for CNN
     return np.expand_dims(gray, 0)
+
+class FramePreprocessor:
+    """
+    preprocess_frame for N frames at once without per-frame temporaries: each frame goes
+    gray -> blur (in place) -> resize through reused scratch buffers, and the /255 scaling writes
+    straight into its slot of one preallocated float32 (N, 1, H, W) batch. Output matches
+    preprocess_frame exactly; the returned batch is a view that the next call overwrites.
+    """
+    def __init__(self, size=(84,84), max_batch=64):
+        import cv2  # noqa: F401  fail at construction, not on the first batch, if OpenCV is missing
+
+        self.size = size
+        self.batch = np.empty((max_batch, 1, size[1], size[0]), dtype=np.float32)
+        self._small = np.empty((size[1], size[0]), dtype=np.uint8)
+        self._gray = {}  # full-size gray scratch per input (H, W)
+
+    def __call__(self, frames_bgr):
+        import cv2
+
+        n = len(frames_bgr)
+        if n > len(self.batch):
+            self.batch = np.empty((n,) + self.batch.shape[1:], dtype=np.float32)
+        for i, frame in enumerate(frames_bgr):
+            gray = self._gray.get(frame.shape[:2])
+            if gray is None:
+                gray = self._gray[frame.shape[:2]] = np.empty(frame.shape[:2], dtype=np.uint8)
+            cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=gray)
+            cv2.GaussianBlur(gray, (3,3), 0, dst=gray)
+            cv2.resize(gray, self.size, dst=self._small, interpolation=cv2.INTER_AREA)
+            np.divide(self._small, np.float32(255.0), out=self.batch[i, 0])
+        return self.batch[:n]
@@ -0,0 +1,139 @@
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+
+
+class PhaseProfiler:
+    """
+    Per-phase timings in fixed-size ring buffers (last `capacity` samples per phase, in seconds):
+    - env code calls add(phase, seconds) only when a profiler is attached, so the disabled cost
+      is one `is not None` check per phase
+    - summary()/report() give counts and percentiles, histogram() log-spaced bins
+    Instances pickle cleanly, so SubprocVecEnv/SharedMemVecEnv workers can ship them back via get_attr.
+    """
+
+    def __init__(self, capacity: int = 4096):
+        self.capacity = capacity
+        self._buf: Dict[str, np.ndarray] = {}
+        self._count: Dict[str, int] = {}  # samples written to the ring
+        self._total: Dict[str, int] = {}  # samples ever recorded (differs from _count after merge)
+
+    def add(self, phase: str, seconds: float):
+        buf = self._buf.get(phase)
+        if buf is None:
+            buf = self._buf[phase] = np.zeros(self.capacity)
+            self._count[phase] = self._total[phase] = 0
+        n = self._count[phase]
+        buf[n % self.capacity] = seconds
+        self._count[phase] = n + 1
+        self._total[phase] += 1
+
+    @property
+    def phases(self):
+        return list(self._buf)
+
+    def count(self, phase: str) -> int:
+        return self._total.get(phase, 0)
+
+    def samples(self, phase: str) -> np.ndarray:
+        """Retained samples for phase (up to capacity), oldest first."""
+        buf = self._buf.get(phase)
+        if buf is None:
+            return np.empty(0)
+        n = self._count[phase]
+        if n <= self.capacity:
+            return buf[:n].copy()
+        k = n % self.capacity
+        return np.concatenate([buf[k:], buf[:k]])
+
+    def clear(self):
+        self._buf.clear()
+        self._count.clear()
+        self._total.clear()
+
+    @classmethod
+    def merge(cls, profilers: Iterable["PhaseProfiler"]) -> "PhaseProfiler":
+        """Pool the retained samples of several profilers (e.g. one per env) into one."""
+        profilers = list({id(p): p for p in profilers if p is not None}.values())
+        out = cls(capacity=sum(p.capacity for p in profilers) or 1)
+        for phase in dict.fromkeys(ph for p in profilers for ph in p.phases):
+            samples = np.concatenate([p.samples(phase) for p in profilers])
+            out._buf[phase] = np.zeros(out.capacity)
+            out._buf[phase][:samples.size] = samples
+            out._count[phase] = samples.size
+            out._total[phase] = sum(p.count(phase) for p in profilers)
+        return out
+
+    # --------- reporting ----------
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        out = {}
+        for phase in self.phases:
+            us = self.samples(phase) * 1e6
+            if us.size == 0:
+                continue
+            p50, p90, p99 = np.percentile(us, [50, 90, 99])
+            out[phase] = {"count": self.count(phase), "mean_us": float(us.mean()), "p50_us": float(p50),
+                          "p90_us": float(p90), "p99_us": float(p99), "max_us": float(us.max())}
+        return out
+
+    def histogram(self, phase: str, bins: int = 20):
+        """(counts, edges_us) over log-spaced bins of the retained samples."""
+        us = self.samples(phase) * 1e6
+        if us.size == 0:
+            return np.zeros(bins, dtype=np.int64), np.zeros(bins + 1)
+        lo, hi = max(us.min(), 1e-3), max(us.max(), 1e-3) * 1.0001
+        edges = np.geomspace(lo, hi, bins + 1) if hi > lo else np.linspace(lo, lo + 1, bins + 1)
+        return np.histogram(us, bins=edges)[0], edges
+
+    def report(self) -> str:
+        lines = [f"{'phase':<12} {'count':>9} {'mean us':>10} {'p50':>9} {'p90':>9} {'p99':>9} {'max':>10}"]
+        for phase, s in self.summary().items():
+            lines.append(f"{phase:<12} {s['count']:>9} {s['mean_us']:>10.1f} {s['p50_us']:>9.1f} "
+                         f"{s['p90_us']:>9.1f} {s['p99_us']:>9.1f} {s['max_us']:>10.1f}")
+        return "\n".join(lines)
+
+
+def make_profiling_callback(every_rollouts: int = 1):
+    """
+    SB3 callback exporting env phase percentiles (scalars) and sample histograms to the
+    TensorBoard run that PPO(tensorboard_log=...) writes under ./logs/.
+    """
+    from stable_baselines3.common.callbacks import BaseCallback
+    from stable_baselines3.common.logger import TensorBoardOutputFormat
+
+    class ProfilingCallback(BaseCallback):
+        def __init__(self):
+            super().__init__()
+            self._rollouts = 0
+
+        def _on_step(self) -> bool:
+            return True
+
+        def _on_rollout_end(self) -> None:
+            self._rollouts += 1
+            if self._rollouts % every_rollouts:
+                return
+            prof = self.profiler()
+            if prof is None or not prof.phases:
+                return
+            for phase, s in prof.summary().items():
+                for stat in ("p50_us", "p90_us", "p99_us", "mean_us"):
+                    self.logger.record(f"profile/{phase}_{stat}", s[stat])
+            for fmt in self.logger.output_formats:
+                if isinstance(fmt, TensorBoardOutputFormat):
+                    for phase in prof.phases:
+                        fmt.writer.add_histogram(f"profile/{phase}_us", prof.samples(phase) * 1e6,
+                                                 self.num_timesteps)
+
+        def _on_training_end(self) -> None:
+            prof = self.profiler()
+            if prof is not None and prof.phases:
+                print("\n" + prof.report())
+
+        def profiler(self) -> Optional[PhaseProfiler]:
+            try:
+                return PhaseProfiler.merge(self.training_env.get_attr("profiler"))
+            except AttributeError:
+                return None
+
+    return ProfilingCallback()
@@ -0,0 +1,221 @@
+import math
+import queue
+import threading
+from pathlib import Path
+from typing import Callable, Hashable, Optional, Tuple
+
+import numpy as np
+
+# BGR colors shared with robot_simulation.py
+OBSTACLE = (0, 0, 255)
+INFLATED = (220, 220, 220)
+GOAL = (0, 180, 255)
+ROBOT = (50, 180, 60)
+HEADING = (0, 0, 0)
+TRAIL = (100, 100, 255)
+MOVING = (0, 120, 230)  # dynamic obstacles
+
+
+def static_layer(canvas: np.ndarray, inflated_mask: np.ndarray) -> np.ndarray:
+    """Canvas with the inflated mask blended in as light gray (what every frame starts from)."""
+    import cv2
+
+    overlay = canvas.copy()
+    overlay[inflated_mask > 0] = INFLATED
+    return cv2.addWeighted(overlay, 0.35, canvas, 0.65, 0)
+
+
+class SceneRenderer:
+    """
+    Frame composition for the warehouse scene without per-frame full-canvas work:
+    - the static layer (canvas + inflated overlay) is built once per background key (map, view)
+    - the trail is drawn incrementally into a persistent copy of it, one new segment per frame; only
+      the newest max_trail points are kept to redraw it when the background changes (full paths
+      belong in a trajectory_store.TrajectoryWriter)
+    - a frame is one copy of that layer into the output buffer plus the goal/robot/heading on top
+    rgb=True produces RGB frames (Gymnasium's rgb_array convention) instead of OpenCV's BGR.
+    """
+
+    def __init__(self, robot_r: int, rgb: bool = False, trail: bool = True, max_trail: int = 10000):
+        self.robot_r = robot_r
+        self.rgb = rgb
+        self.trail = trail
+        self.max_trail = max_trail
+        self._color = (lambda c: c[::-1]) if rgb else (lambda c: c)
+        self._key = None
+        self._origin = (0, 0)
+        self._layer = None
+        self._points = []
+        self._drawn = 0  # trail points already in self._layer
+
+    def reset_trail(self):
+        self._points = []
+        if self._key is not None:
+            self._rebuild(self._static)
+
+    def _rebuild(self, static: np.ndarray):
+        self._static = static
+        self._layer = static.copy()
+        self._drawn = 0
+
+    def _set_background(self, key: Hashable, background: Callable[[], Tuple[np.ndarray, np.ndarray, int, int]]):
+        import cv2
+
+        if key == self._key:
+            return
+        canvas, inflated, x0, y0 = background()
+        static = static_layer(canvas, inflated)
+        if self.rgb:
+            static = cv2.cvtColor(static, cv2.COLOR_BGR2RGB)
+        self._key, self._origin = key, (x0, y0)
+        self._rebuild(static)
+
+    @property
+    def shape(self) -> Optional[Tuple[int, ...]]:
+        return None if self._layer is None else self._layer.shape
+
+    def frame(self, key: Hashable, background, pos, heading: float, goal=None,
+              out: Optional[np.ndarray] = None, overlay: Optional[Callable[[np.ndarray], None]] = None) -> np.ndarray:
+        """
+        Draw one frame into out (allocated if None) and return it.
+        background() -> (canvas, inflated_mask, x0, y0) is only called when key changes; x0, y0 is the
+        map position of the canvas' top-left pixel. overlay(out) draws per-frame content (moving
+        obstacles) over the background, under the goal and robot.
+        """
+        import cv2
+
+        self._set_background(key, background)
+        x0, y0 = self._origin
+        px, py = int(pos[0]), int(pos[1])
+        if self.trail:
+            self._points.append((px, py))
+            pts = self._points[max(self._drawn - 1, 0):]
+            if len(pts) > 1:
+                shifted = np.array(pts, dtype=np.int32) - (x0, y0)
+                cv2.polylines(self._layer, [shifted], False, self._color(TRAIL), 2)
+            if len(self._points) > self.max_trail:
+                del self._points[:-self.max_trail]
+            self._drawn = len(self._points)
+
+        if out is None:
+            out = self._layer.copy()
+        else:
+            np.copyto(out, self._layer)
+        c = self._color
+        if overlay is not None:
+            overlay(out)
+        if goal is not None:
+            cv2.circle(out, (int(goal[0]) - x0, int(goal[1]) - y0), 10, c(GOAL), -1)
+        cv2.circle(out, (px - x0, py - y0), self.robot_r, c(ROBOT), -1)
+        hx = int(pos[0] + math.cos(heading) * (self.robot_r + 12)) - x0
+        hy = int(pos[1] + math.sin(heading) * (self.robot_r + 12)) - y0
+        cv2.line(out, (px - x0, py - y0), (hx, hy), c(HEADING), 2)
+        return out
+
+
+class FrameRecorder:
+    """
+    Streams frames to a video file (.mp4 / .avi) or, for any other path, a directory of numbered PNGs.
+    Encoding runs on a background thread. Frames are drawn straight into a small pool of
+    preallocated buffers (buffer() / submit()), which the writer hands back once a frame is encoded,
+    so recording adds no per-frame allocation or copy to the sim loop.
+    When the writer falls behind: drop=False blocks the sim, drop=True skips frames (self.dropped).
+    """
+
+    VIDEO_CODECS = {".mp4": "mp4v", ".avi": "MJPG"}
+
+    def __init__(self, path: str, fps: float = 30.0, rgb: bool = False, pool: int = 8, drop: bool = False):
+        self.path = Path(path)
+        self.fps = fps
+        self.rgb = rgb
+        self.drop = drop
+        self.pool_size = pool
+        self.written = self.dropped = 0
+        self._free = queue.Queue()
+        self._todo = queue.Queue()
+        self._shape = None
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name="FrameRecorder", daemon=True)
+        self._thread.start()
+
+    def buffer(self, shape: Tuple[int, ...]) -> Optional[np.ndarray]:
+        """A free frame buffer of shape (H, W, 3); None if drop=True and every buffer is in flight."""
+        self._check()
+        if self._shape is None:
+            self._shape = tuple(shape)
+            for _ in range(self.pool_size):
+                self._free.put(np.empty(self._shape, dtype=np.uint8))
+        elif tuple(shape) != self._shape:
+            raise ValueError(f"frame shape {tuple(shape)} differs from the recording's {self._shape}")
+        if self.drop:
+            try:
+                return self._free.get_nowait()
+            except queue.Empty:
+                self.dropped += 1
+                return None
+        return self._free.get()
+
+    def submit(self, buf: np.ndarray):
+        """Queue a buffer from buffer() for writing; it must not be touched afterwards."""
+        self._todo.put(buf)
+
+    def write(self, frame: np.ndarray):
+        """Copy an arbitrary frame into a pool buffer and queue it."""
+        buf = self.buffer(frame.shape)
+        if buf is not None:
+            np.copyto(buf, frame)
+            self.submit(buf)
+
+    def close(self):
+        if self._thread.is_alive():
+            self._todo.put(None)
+            self._thread.join()
+        self._check()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # --------- writer thread ----------
+    def _check(self):
+        if self._error is not None:
+            raise RuntimeError(f"frame writer for {self.path} failed") from self._error
+
+    def _run(self):
+        import cv2
+
+        writer = None
+        codec = self.VIDEO_CODECS.get(self.path.suffix.lower())
+        try:
+            while True:
+                buf = self._todo.get()
+                if buf is None:
+                    break
+                frame = cv2.cvtColor(buf, cv2.COLOR_RGB2BGR) if self.rgb else buf
+                if codec is not None:
+                    if writer is None:
+                        self.path.parent.mkdir(parents=True, exist_ok=True)
+                        h, w = frame.shape[:2]
+                        writer = cv2.VideoWriter(str(self.path), cv2.VideoWriter_fourcc(*codec), self.fps, (w, h))
+                        if not writer.isOpened():
+                            raise IOError(f"could not open video writer for {self.path}")
+                    writer.write(frame)
+                else:
+                    self.path.mkdir(parents=True, exist_ok=True)
+                    cv2.imwrite(str(self.path / f"frame_{self.written:06d}.png"), frame)
+                self.written += 1
+                self._free.put(buf)
+        except Exception as e:  # surfaced to the sim thread on its next buffer()/close()
+            self._error = e
+            self._free.put(buf)
+            # keep returning buffers so a blocked sim wakes up and sees the error
+            while True:
+                buf = self._todo.get()
+                if buf is None:
+                    break
+                self._free.put(buf)
+        finally:
+            if writer is not None:
+                writer.release()
@@ -1,45 +1,118 @@
 import math
-import random
+from time import perf_counter
 from typing import Optional, Tuple
 
-import cv2
 import gymnasium as gym
 import numpy as np
 from gymnasium import spaces
 
+from box_map import BoxRayCaster
+from collision import segment_collides
+from distance_field import SphereTracer
+from dynamic_obstacles import DynamicObstacles
+from lidar import RayCaster
+from map_cache import MAP_CACHE, MapCache, MapKey
+from profiling import PhaseProfiler
+from rendering import MOVING, OBSTACLE, FrameRecorder, SceneRenderer
+
 
 class WarehouseNavEnv(gym.Env):
     """
     A tiny continuous 2D warehouse nav env:
-    - State (12 floats): [goal_dx, goal_dy, cos(h), sin(h), 8 lidar rays], all in [0,1] or [-1,1] range
+    - State (4 + num_rays floats): [goal_dx, goal_dy, cos(h), sin(h), num_rays lidar rays (default 8)],
+      all in [0,1] or [-1,1] range
     - Actions (Discrete 3): 0=forward, 1=turn_left, 2=turn_right
     - Rewards: + (prev_dist - new_dist)*5  , -10 on collision, +100 on goal, -0.01 step cost
+    - lidar="raycast" samples every pixel of each ray; lidar="sdf" builds a distance field once per
+      reset and sphere-traces it (also used for inflation and collision checks); lidar="boxes" answers
+      rays and collisions analytically on the map's obstacle rectangles (box_map.BoxMap): exact,
+      independent of pixel resolution and cheap on large sparse maps
+    - collision="endpoint" tests only the end of each move; "swept" tests every cell the move passes
+      through, so higher speed values cannot tunnel through thin obstacles
+    - profile=True (or a shared PhaseProfiler) records per-phase step/reset timings in self.profiler
+    - occupancy="tiled" keeps the masks as sparse bit-packed TiledGrids for very large maps (memory
+      follows the obstacles, not the map size); render then shows a window around the robot
+    - render_mode="rgb_array" renders headless (RGB frames); record(path) streams every step's frame
+      to a video or PNG sequence from a background thread, in any render mode
+    - shaping="geodesic" rewards progress along the obstacle-aware distance to the goal (a GoalField
+      cached with the map) instead of the straight-line distance, so detours are not punished;
+      goal_features=True appends [geodesic distance, downhill dx, dy] to the observation
+    - moving_boxes / moving_agents add forklifts and other robots (dynamic_obstacles.DynamicObstacles,
+      placed from the map seed) that move before the robot each step; they are stamped into the
+      env's own copies of the masks, so lidar and collision see them on the same step
     """
-    metadata = {"render_modes": ["human"], "render_fps": 30}
+    metadata = {"render_modes": ["human", "rgb_array"], "render_fps": 30}
 
-    def __init__(self, width: int = 700, height: int = 500, render_mode: Optional[str] = None):
+    def __init__(self, width: int = 700, height: int = 500, render_mode: Optional[str] = None,
+                 num_rays: int = 8, ray_dist: int = 80, lidar: str = "raycast",
+                 map_cache: Optional[MapCache] = None, profile=False,
+                 collision: str = "endpoint", speed: float = 4.0, occupancy: str = "dense",
+                 num_obstacles: int = 10, shaping: str = "euclidean", goal_features: bool = False,
+                 moving_boxes: int = 0, moving_agents: int = 0):
         super().__init__()
         self.W, self.H = width, height
         self.render_mode = render_mode
 
         # --- action/observation spaces ---
         self.action_space = spaces.Discrete(3)  # 0=forward, 1=left, 2=right
-        # obs = goal_dx_norm, goal_dy_norm, cos(h), sin(h), 8 lidar rays (normalized 0..1)
-        self.num_rays = 8
-        low = np.array([-1, -1, -1, -1] + [0.0] * self.num_rays, dtype=np.float32)
-        high = np.array([+1, +1, +1, +1] + [1.0] * self.num_rays, dtype=np.float32)
+        # obs = goal_dx_norm, goal_dy_norm, cos(h), sin(h), num_rays lidar rays (normalized 0..1)
+        self.num_rays = num_rays
+        # goal_features adds geodesic_dist_norm (0..1) and the downhill direction (-1..1)
+        self.goal_features = goal_features
+        extra_low, extra_high = ([0.0, -1, -1], [1.0, 1, 1]) if goal_features else ([], [])
+        low = np.array([-1, -1, -1, -1] + [0.0] * self.num_rays + extra_low, dtype=np.float32)
+        high = np.array([+1, +1, +1, +1] + [1.0] * self.num_rays + extra_high, dtype=np.float32)
         self.observation_space = spaces.Box(low=low, high=high, dtype=np.float32)
 
         # --- robot/physics params ---
         self.ROBOT_R = 10
-        self.SPEED = 4.0
+        self.SPEED = speed
         self.TURN = math.radians(18)
-        self.RAY_DIST = 80
+        self.RAY_DIST = ray_dist
+        if lidar not in ("raycast", "sdf", "boxes"):
+            raise ValueError(f"Unknown lidar mode: {lidar!r} (expected 'raycast', 'sdf' or 'boxes')")
+        self.lidar = lidar
+        caster_cls = {"sdf": SphereTracer, "boxes": BoxRayCaster}.get(lidar, RayCaster)
+        self.ray_caster = caster_cls(self.num_rays, r_min=self.ROBOT_R, r_max=self.RAY_DIST)
+        if collision not in ("endpoint", "swept"):
+            raise ValueError(f"Unknown collision mode: {collision!r} (expected 'endpoint' or 'swept')")
+        self.collision = collision
+        if occupancy not in ("dense", "tiled"):
+            raise ValueError(f"Unknown occupancy mode: {occupancy!r} (expected 'dense' or 'tiled')")
+        if occupancy == "tiled" and lidar == "sdf":
+            raise ValueError("occupancy='tiled' has no distance field; use lidar='raycast'")
+        self.occupancy = occupancy
+        if shaping not in ("euclidean", "geodesic"):
+            raise ValueError(f"Unknown shaping mode: {shaping!r} (expected 'euclidean' or 'geodesic')")
+        if occupancy == "tiled" and (shaping == "geodesic" or goal_features):
+            raise ValueError("occupancy='tiled' has no goal field; use shaping='euclidean'")
+        self.shaping = shaping
+        if (moving_boxes or moving_agents) and (lidar != "raycast" or occupancy != "dense"):
+            raise ValueError("moving obstacles are stamped into dense masks; use lidar='raycast', occupancy='dense'")
+        self.moving_boxes, self.moving_agents = moving_boxes, moving_agents
+        self.num_obstacles = num_obstacles
+        self.VIEW_W, self.VIEW_H = 700, 500  # render window for tiled maps
+
+        # rendering state: static layers are cached per map, frames reuse one buffer
+        self.renderer = None
+        self.recorder = None
+        self._frame = None
+
+        # maps are read-only and shared between envs through the cache
+        self.map_cache = map_cache if map_cache is not None else MAP_CACHE
+
+        # optional hot-path timings (None = disabled, one attribute check per phase)
+        self.profiler = profile if isinstance(profile, PhaseProfiler) else (PhaseProfiler() if profile else None)
 
         # will be filled in reset()
+        self.map = None
         self.canvas = None
         self.obstacle_mask = None
         self.inflated_mask = None
+        self.field = None
+        self.goal_field = None
+        self.boxes = None
+        self.dynamic = None
         self.pos = None
         self.heading = None
         self.goal = None
@@ -52,65 +125,106 @@ def _in_bounds(self, x: int, y: int) -> bool:
         return 0 <= x < self.W and 0 <= y < self.H
 
     def _collides_xy(self, x: int, y: int) -> bool:
+        if self.boxes is not None:
+            return bool(self.boxes.collides(x, y)[0])
+        if self.field is not None:
+            return self.field.collides(x, y)
         if not self._in_bounds(x, y):
             return True
         return self.inflated_mask[y, x] > 0
 
     def _lidar_rays(self) -> np.ndarray:
         """Cast self.num_rays rays in a ±90° fan around heading; return normalized distances [0..1]."""
-        rays = []
-        start = self.heading - math.pi / 2
-        end = self.heading + math.pi / 2
-        for ang in np.linspace(start, end, self.num_rays):
-            hit = self.RAY_DIST
-            for d in range(self.ROBOT_R, self.RAY_DIST):
-                x = int(self.pos[0] + math.cos(ang) * d)
-                y = int(self.pos[1] + math.sin(ang) * d)
-                if not self._in_bounds(x, y) or self.inflated_mask[y, x] > 0:
-                    hit = d
-                    break
-            rays.append(hit / self.RAY_DIST)
-        return np.array(rays, dtype=np.float32)
+        if self.boxes is not None:
+            return self.ray_caster.cast(self.boxes, self.pos, self.heading)
+        if self.field is not None:
+            return self.ray_caster.cast(self.field.clearance, self.pos, self.heading)
+        return self.ray_caster.cast(self.inflated_mask, self.pos, self.heading)
 
     def _observe(self) -> np.ndarray:
         dx = (self.goal[0] - self.pos[0]) / self.W
         dy = (self.goal[1] - self.pos[1]) / self.H
         obs = np.array([dx, dy, math.cos(self.heading), math.sin(self.heading)], dtype=np.float32)
-        rays = self._lidar_rays()
+        prof = self.profiler
+        if prof is not None:
+            t0 = perf_counter()
+            rays = self._lidar_rays()
+            prof.add("lidar", perf_counter() - t0)
+        else:
+            rays = self._lidar_rays()
+        if self.goal_features:
+            geo = self._geodesic_distance()
+            gx, gy = self.goal_field.direction(int(self.pos[0]), int(self.pos[1]))
+            extra = np.array([min(geo / (self.W + self.H), 1.0), gx, gy], dtype=np.float32)
+            return np.concatenate([obs, rays, extra]).astype(np.float32)
         return np.concatenate([obs, rays]).astype(np.float32)
 
     def _goal_distance(self) -> float:
         return float(np.linalg.norm(self.goal - self.pos))
 
+    def _geodesic_distance(self) -> float:
+        """Obstacle-aware distance to the goal; straight-line where the field has no value (inside inflation)."""
+        d = self.goal_field.at(int(self.pos[0]), int(self.pos[1]))
+        return d if math.isfinite(d) else self._goal_distance()
+
+    def _shaping_distance(self) -> float:
+        return self._geodesic_distance() if self.goal_field is not None and self.shaping == "geodesic" \
+            else self._goal_distance()
+
+    def _build_map(self, seed: Optional[int]):
+        """Fetch (or generate) the map for seed (None -> 42) from the shared map cache."""
+        goal = (self.W - 40, self.H - 40) if self.shaping == "geodesic" or self.goal_features else None
+        key = MapKey(seed if seed is not None else 42, self.W, self.H, self.ROBOT_R, self.num_obstacles,
+                     with_field=self.lidar == "sdf", tiled=self.occupancy == "tiled", goal=goal)
+        self.map = self.map_cache.get(key)
+        self.canvas = self.map.canvas
+        self.obstacle_mask = self.map.obstacle_mask
+        self.inflated_mask = self.map.inflated_mask
+        self.field = self.map.field
+        self.goal_field = self.map.goal_field
+        self.boxes = self.map.boxes if self.lidar == "boxes" else None
+        if self.moving_boxes or self.moving_agents:
+            # writable mask copies are made once per map; later resets only restamp the movers
+            if self.dynamic is None or self.dynamic.static_inflated is not self.map.inflated_mask:
+                self.dynamic = DynamicObstacles(self.map.obstacle_mask, self.map.inflated_mask, self.ROBOT_R)
+            self.dynamic.clear()
+            self.dynamic.populate(np.random.default_rng(key.seed), self.moving_boxes, self.moving_agents,
+                                  keep_clear=[(40, 40), (self.W - 40, self.H - 40)])
+            self.obstacle_mask = self.dynamic.obstacle_mask
+            self.inflated_mask = self.dynamic.inflated_mask
+
     # --------- Gym API ----------
     def reset(self, *, seed: Optional[int] = None, options: Optional[dict] = None) -> Tuple[np.ndarray, dict]:
         super().reset(seed=seed)
-        rng = random.Random(seed if seed is not None else 42)
-
-        # canvas & obstacles
-        self.canvas = np.ones((self.H, self.W, 3), dtype=np.uint8) * 255
-        for _ in range(10):
-            x1, y1 = rng.randint(30, self.W - 180), rng.randint(30, self.H - 140)
-            x2, y2 = x1 + rng.randint(40, 160), y1 + rng.randint(40, 140)
-            cv2.rectangle(self.canvas, (x1, y1), (x2, y2), (0, 0, 255), -1)
-
-        # edge mask + inflate by robot radius
-        gray = cv2.cvtColor(self.canvas, cv2.COLOR_BGR2GRAY)
-        edges = cv2.Canny(gray, 50, 150)
-        self.obstacle_mask = (edges > 0).astype(np.uint8)
-        kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (self.ROBOT_R * 2, self.ROBOT_R * 2))
-        self.inflated_mask = cv2.dilate(self.obstacle_mask, kernel, iterations=1)
+        prof = self.profiler
+        if prof is not None:
+            t0 = perf_counter()
+        self._build_map(seed)
+        if prof is not None:
+            prof.add("map_build", perf_counter() - t0)
 
         # start & goal
         self.pos = np.array([40.0, 40.0], dtype=np.float32)
         self.heading = 0.0
         self.goal = np.array([self.W - 40.0, self.H - 40.0], dtype=np.float32)
 
-        self.prev_goal_dist = self._goal_distance()
+        self.prev_goal_dist = self._shaping_distance()
         self.steps = 0
-        return self._observe(), {}
+        obs = self._observe()
+        if self.renderer is not None:
+            self.renderer.reset_trail()
+        if self.render_mode == "human":
+            self.render()
+        if self.recorder is not None:
+            self._record()
+        if prof is not None:
+            prof.add("reset", perf_counter() - t0)
+        return obs, {}
 
     def step(self, action: int):
+        prof = self.profiler
+        if prof is not None:
+            t0 = perf_counter()
         self.steps += 1
 
         # turn or move
@@ -120,19 +234,34 @@ def step(self, action: int):
             self.heading += self.TURN
 
         # propose new position (forward move each step)
-        nx = int(self.pos[0] + math.cos(self.heading) * self.SPEED)
-        ny = int(self.pos[1] + math.sin(self.heading) * self.SPEED)
+        tx = self.pos[0] + math.cos(self.heading) * self.SPEED
+        ty = self.pos[1] + math.sin(self.heading) * self.SPEED
+        nx, ny = int(tx), int(ty)
+        if prof is not None:
+            t1 = perf_counter()
+            prof.add("action", t1 - t0)
+        if self.dynamic is not None:
+            self.dynamic.step()  # the world moves first: this step's collision and lidar see it
+            if prof is not None:
+                t1, t_dyn = perf_counter(), t1
+                prof.add("dynamic", t1 - t_dyn)
 
         terminated = False
         reward = -0.01  # small step penalty
 
-        if self._collides_xy(nx, ny):
+        if self.collision == "swept" and self.boxes is not None:
+            collided = bool(self.boxes.swept_collides(self.pos[0], self.pos[1], tx, ty)[0])
+        elif self.collision == "swept":
+            collided = segment_collides(self.inflated_mask, self.pos, (tx, ty))
+        else:
+            collided = self._collides_xy(nx, ny)
+        if collided:
             reward -= 10.0
             terminated = True
         else:
             self.pos = np.array([nx, ny], dtype=np.float32)
             # reward for getting closer to goal
-            d = self._goal_distance()
+            d = self._shaping_distance()
             reward += (self.prev_goal_dist - d) * 5.0
             self.prev_goal_dist = d
 
@@ -142,32 +271,98 @@ def step(self, action: int):
             terminated = True
 
         truncated = self.steps >= self.max_steps
-        obs = self._observe()
+        if prof is not None:
+            t2 = perf_counter()
+            prof.add("collision", t2 - t1)
+        obs = self._observe()  # includes the "lidar" phase
         info = {}
+        if prof is not None:
+            t3 = perf_counter()
+            prof.add("observe", t3 - t2)
 
-        # optional render
-        if self.render_mode == "human":
-            self.render()
+        # optional render / recording
+        if self.render_mode == "human" or self.recorder is not None:
+            if self.render_mode == "human":
+                self.render()
+            if self.recorder is not None:
+                self._record()
+            if prof is not None:
+                prof.add("render", perf_counter() - t3)
+        if prof is not None:
+            prof.add("step", perf_counter() - t0)
 
         return obs, reward, terminated, truncated, info
 
+    # --------- rendering ----------
+    def _frame_shape(self) -> Tuple[int, int, int]:
+        if self.occupancy == "tiled":
+            return min(self.VIEW_H, self.H), min(self.VIEW_W, self.W), 3
+        return self.H, self.W, 3
+
+    def _view_origin(self) -> Tuple[int, int]:
+        """Top-left map pixel of the drawn area: (0, 0) for dense maps; for tiled maps a window around
+        the robot, moved in quarter-view steps so its static layer stays cached between frames."""
+        if self.occupancy != "tiled":
+            return 0, 0
+        vh, vw, _ = self._frame_shape()
+        sx, sy = max(vw // 4, 1), max(vh // 4, 1)
+        x0 = (int(self.pos[0]) - vw // 2 + sx // 2) // sx * sx
+        y0 = (int(self.pos[1]) - vh // 2 + sy // 2) // sy * sy
+        return min(max(x0, 0), self.W - vw), min(max(y0, 0), self.H - vh)
+
+    def _view(self, x0: int, y0: int):
+        """(canvas, inflated mask, x0, y0) of the drawn area; tiled maps materialize the window from the tiles."""
+        if self.canvas is not None:
+            return self.canvas, self.map.inflated_mask, 0, 0  # static: movers are drawn per frame
+        vh, vw, _ = self._frame_shape()
+        canvas = np.full((vh, vw, 3), 255, dtype=np.uint8)
+        canvas[self.obstacle_mask.window(x0, y0, x0 + vw, y0 + vh) > 0] = OBSTACLE
+        return canvas, self.inflated_mask.window(x0, y0, x0 + vw, y0 + vh), x0, y0
+
+    def _draw(self, out: Optional[np.ndarray] = None) -> np.ndarray:
+        if self.renderer is None:
+            self.renderer = SceneRenderer(self.ROBOT_R, rgb=self.render_mode == "rgb_array")
+        x0, y0 = self._view_origin()
+        overlay = None
+        if self.dynamic is not None:
+            color = MOVING[::-1] if self.renderer.rgb else MOVING
+            overlay = lambda img: self.dynamic.draw(img, color, x0, y0)
+        return self.renderer.frame((self.map, x0, y0), lambda: self._view(x0, y0),
+                                   self.pos, self.heading, self.goal, out, overlay)
+
     def render(self):
-        frame = self.canvas.copy()
-        # draw inflated mask as gray
-        overlay = frame.copy()
-        overlay[self.inflated_mask > 0] = (220, 220, 220)
-        frame = cv2.addWeighted(overlay, 0.35, frame, 0.65, 0)
-        # goal & robot
-        cv2.circle(frame, (int(self.goal[0]), int(self.goal[1])), 10, (0, 180, 255), -1)
-        cv2.circle(frame, (int(self.pos[0]), int(self.pos[1])), self.ROBOT_R, (50, 180, 60), -1)
-        hx = int(self.pos[0] + math.cos(self.heading) * (self.ROBOT_R + 12))
-        hy = int(self.pos[1] + math.sin(self.heading) * (self.ROBOT_R + 12))
-        cv2.line(frame, (int(self.pos[0]), int(self.pos[1])), (hx, hy), (0, 0, 0), 2)
-        cv2.imshow("RL Env (preview)", frame)
+        import cv2
+
+        if self.render_mode == "rgb_array":
+            return self._draw()
+        self._frame = self._draw(self._frame)
+        cv2.imshow("RL Env (preview)", self._frame)
         cv2.waitKey(1)
 
+    def record(self, path: str, fps: Optional[float] = None, drop: bool = False) -> FrameRecorder:
+        """Stream a frame per reset/step to path (.mp4/.avi video, otherwise a PNG directory) until close()."""
+        if self.recorder is not None:
+            self.recorder.close()
+        self.recorder = FrameRecorder(path, fps or self.metadata["render_fps"],
+                                      rgb=self.render_mode == "rgb_array", drop=drop)
+        return self.recorder
+
+    def _record(self):
+        if self.render_mode == "human":
+            self.recorder.write(self._frame)  # already drawn this step
+            return
+        buf = self.recorder.buffer(self._frame_shape())
+        if buf is not None:
+            self._draw(buf)
+            self.recorder.submit(buf)
+
     def close(self):
+        if self.recorder is not None:
+            self.recorder.close()
+            self.recorder = None
         if self.render_mode == "human":
+            import cv2
+
             cv2.destroyAllWindows()
 
 
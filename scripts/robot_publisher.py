@@ -1,7 +1,8 @@
 # scripts/robot_publisher.py
-import json, ssl, time, random, signal, sys
+# paho-mqtt and ssl are imported (and the certificates checked) only when connecting, so
+# --dry-run and `main.py publish --help` start without them.
+import argparse, json, time, random, signal
 from pathlib import Path
-import paho.mqtt.client as mqtt
 
 # ==== AWS IoT settings ====
 ENDPOINT = "a37wis2tab9brj-ats.iot.ap-south-1.amazonaws.com"
@@ -14,13 +15,19 @@
 BASE = Path(r"C:\Users\16reh\OneDrive\Desktop\Warehouse_Robot_Navigation\secrets\robot1")
 CA1 = BASE / "AmazonRootCA1.pem"
 CA3 = BASE / "AmazonRootCA3.pem"
-CA_PATH = CA1 if CA1.exists() else CA3
 CERT_PATH    = BASE / "1ddb11e352cb087eb8b14ff8025ae5ba6773ade49f196f0c22b92e7022c14ef4-certificate.pem.crt"
 PRIVKEY_PATH = BASE / "1ddb11e352cb087eb8b14ff8025ae5ba6773ade49f196f0c22b92e7022c14ef4-private.pem.key"
 
-for p in [CA_PATH, CERT_PATH, PRIVKEY_PATH]:
-    if not p.exists():
-        raise FileNotFoundError(f"Missing required file: {p}")
+PUBLISH_INTERVAL = 5  # seconds
+
+
+def cert_paths():
+    """(CA, cert, key) paths; raises FileNotFoundError if any is missing."""
+    ca = CA1 if CA1.exists() else CA3
+    for p in [ca, CERT_PATH, PRIVKEY_PATH]:
+        if not p.exists():
+            raise FileNotFoundError(f"Missing required file: {p}")
+    return ca, CERT_PATH, PRIVKEY_PATH
 
 # ==== MQTT callbacks ====
 def on_connect(client, userdata, flags, rc, properties=None):
@@ -38,57 +45,85 @@ def on_disconnect(client, userdata, rc, properties=None):
     print(f"[DISCONNECT] rc={rc}")
 
 # ==== Build client ====
-client = mqtt.Client(client_id=CLIENT_ID, protocol=mqtt.MQTTv5, transport="tcp")
-client.on_connect = on_connect
-client.on_message = on_message
-client.on_disconnect = on_disconnect
-
-client.tls_set(
-    ca_certs=str(CA_PATH),
-    certfile=str(CERT_PATH),
-    keyfile=str(PRIVKEY_PATH),
-    cert_reqs=ssl.CERT_REQUIRED,
-    tls_version=ssl.PROTOCOL_TLS_CLIENT
-)
-client.tls_insecure_set(False)
-
-# Graceful stop
-_running = True
-def _stop(*_):
-    global _running
-    _running = False
-signal.signal(signal.SIGINT, _stop)
-if hasattr(signal, "SIGTERM"):
-    signal.signal(signal.SIGTERM, _stop)
-
-# ==== Connect + publish loop ====
-PUBLISH_INTERVAL = 5  # seconds
-battery = 100
-
-print(f"Connecting to {ENDPOINT}:{PORT} ...")
-client.connect(ENDPOINT, PORT, keepalive=60)
-client.loop_start()
-
-print("Publishing every", PUBLISH_INTERVAL, "seconds. Press Ctrl+C to stop.")
-while _running:
-    # fake telemetry
-    battery = max(0, battery - random.randint(0, 2))
-    payload = {
-        "device": "robot1",
+def make_client():
+    import ssl
+    import paho.mqtt.client as mqtt
+
+    ca, cert, key = cert_paths()
+    client = mqtt.Client(client_id=CLIENT_ID, protocol=mqtt.MQTTv5, transport="tcp")
+    client.on_connect = on_connect
+    client.on_message = on_message
+    client.on_disconnect = on_disconnect
+
+    client.tls_set(
+        ca_certs=str(ca),
+        certfile=str(cert),
+        keyfile=str(key),
+        cert_reqs=ssl.CERT_REQUIRED,
+        tls_version=ssl.PROTOCOL_TLS_CLIENT
+    )
+    client.tls_insecure_set(False)
+    return client
+
+# ==== fake telemetry ====
+def fake_telemetry(battery: int) -> dict:
+    return {
+        "device": CLIENT_ID,
         "status": "online" if battery > 0 else "shutdown",
         "battery": battery,
         "speed": round(random.uniform(0.2, 1.0), 2),
         "collisions": random.choice([0, 0, 1]),   # occasional 1 for testing
         "ts": int(time.time())
     }
-    result = client.publish(TOPIC_PUB, json.dumps(payload), qos=1)
-    if result.rc != mqtt.MQTT_ERR_SUCCESS:
-        print("[WARN] publish rc:", result.rc)
-    else:
-        print("[PUB]", payload)
-    time.sleep(PUBLISH_INTERVAL)
-
-print("Stopping…")
-client.loop_stop()
-client.disconnect()
-print("Done.")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Publish fake robot telemetry to AWS IoT Core")
+    ap.add_argument("--interval", type=float, default=PUBLISH_INTERVAL, help="seconds between messages")
+    ap.add_argument("--count", type=int, default=None, help="stop after this many messages")
+    ap.add_argument("--dry-run", action="store_true", help="print payloads without connecting")
+    args = ap.parse_args()
+
+    # Graceful stop
+    running = True
+    def _stop(*_):
+        nonlocal running
+        running = False
+    signal.signal(signal.SIGINT, _stop)
+    if hasattr(signal, "SIGTERM"):
+        signal.signal(signal.SIGTERM, _stop)
+
+    client = None
+    if not args.dry_run:
+        client = make_client()
+        print(f"Connecting to {ENDPOINT}:{PORT} ...")
+        client.connect(ENDPOINT, PORT, keepalive=60)
+        client.loop_start()
+
+    # ==== publish loop ====
+    print("Publishing every", args.interval, "seconds. Press Ctrl+C to stop.")
+    battery, sent = 100, 0
+    while running and (args.count is None or sent < args.count):
+        battery = max(0, battery - random.randint(0, 2))
+        payload = fake_telemetry(battery)
+        sent += 1
+        if client is None:
+            print("[DRY]", json.dumps(payload))
+        else:
+            result = client.publish(TOPIC_PUB, json.dumps(payload), qos=1)
+            if result.rc != 0:  # mqtt.MQTT_ERR_SUCCESS
+                print("[WARN] publish rc:", result.rc)
+            else:
+                print("[PUB]", payload)
+        if args.count is None or sent < args.count:
+            time.sleep(args.interval)
+
+    print("Stopping…")
+    if client is not None:
+        client.loop_stop()
+        client.disconnect()
+    print("Done.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,26 @@
+import argparse
 import cv2
 import numpy as np
 import random
 import math
 
+from collision import segment_collides
+from dynamic_obstacles import DynamicObstacles
+from planner import PathPlanner
+from rendering import MOVING, FrameRecorder, SceneRenderer
+
+ap = argparse.ArgumentParser(description="Auto-navigating warehouse robot demo")
+ap.add_argument("--headless", action="store_true", help="no window (use with --record)")
+ap.add_argument("--record", default=None, help="stream frames to a .mp4/.avi video or a PNG directory")
+ap.add_argument("--frames", type=int, default=None, help="stop after this many frames (headless default: 600)")
+ap.add_argument("--nav", choices=["plan", "reactive"], default="reactive",
+                help="reactive: the original wandering walker; plan: follow D* Lite paths to random goals")
+ap.add_argument("--trajectory", default=None, help="store every frame's pose in this trajectory directory")
+ap.add_argument("--moving-boxes", type=int, default=0, help="forklift-like boxes driving along the aisles")
+ap.add_argument("--moving-agents", type=int, default=0, help="other robots wandering the floor")
+args = ap.parse_args()
+max_frames = args.frames or (600 if args.headless else None)
+
 W, H = 700, 500
 ROBOT_R = 10          # robot radius (pixels)
 SPEED = 2.5           # pixels per frame
@@ -25,14 +43,27 @@
 # --- Robot state ---
 pos = np.array([60.0, 60.0])                       # x, y
 heading = math.radians(0)                          # facing angle
-trail = []                                          # breadcrumb path
+renderer = SceneRenderer(ROBOT_R)                  # static layer + incremental breadcrumb trail
+recorder = FrameRecorder(args.record) if args.record else None
+frame = None
+writer = None
+if args.trajectory:
+    # one episode for the whole run: poses only (no discrete actions or observations)
+    from trajectory_store import TrajectoryWriter
+
+    writer = TrajectoryWriter(args.trajectory, obs_dim=0, meta={"source": "robot_simulation", "nav": args.nav})
+    writer.begin(42, pos[0], pos[1], heading)
 
 def in_bounds(p):
     x, y = int(p[0]), int(p[1])
     return 0 <= x < W and 0 <= y < H
 
-def collides_at(p):
-    """Check collision by sampling a small disk around p against obstacles or walls."""
+def collides_at(p, start=None):
+    """Check p against walls and the inflated obstacle mask (obstacles grown by the robot radius).
+    With start given, the move start -> p is checked instead: a supercover walk over every mask cell
+    the segment touches (collision.segment_collides), so thin walls can't be skipped."""
+    if start is not None:
+        return segment_collides(inflated_mask, start, p)
     x, y = int(p[0]), int(p[1])
     if not in_bounds((x, y)): 
         return True
@@ -52,18 +83,60 @@ def look_ahead_direction(angle):
 # Inflate obstacles by robot radius so we treat edges as solid thickness
 kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (ROBOT_R*2, ROBOT_R*2))
 inflated_mask = cv2.dilate(obstacle_mask, kernel, iterations=1)
+static_inflated = inflated_mask
+
+# moving obstacles are stamped into copies of the masks; everything below reads those copies
+dynamic = None
+if args.moving_boxes or args.moving_agents:
+    dynamic = DynamicObstacles(obstacle_mask, inflated_mask, ROBOT_R)
+    dynamic.populate(np.random.default_rng(42), args.moving_boxes, args.moving_agents, keep_clear=[pos])
+    obstacle_mask, inflated_mask = dynamic.obstacle_mask, dynamic.inflated_mask
+
+def new_goal(tries=20):
+    """Random free goal the planner can reach from pos, with its waypoints (pos first).
+    (None, None) after `tries` candidates, e.g. while a mover sits on the robot; retried next frame."""
+    for _ in range(tries):
+        g = (rng.uniform(ROBOT_R, W - ROBOT_R - 1), rng.uniform(ROBOT_R, H - ROBOT_R - 1))
+        if collides_at(g) or math.dist(g, pos) < 100:
+            continue
+        path = planner.plan(pos, g)
+        if path is not None:
+            return np.array(g), path
+    return None, None
+
+planner = PathPlanner(inflated_mask) if args.nav == "plan" else None
+if dynamic is not None and planner is not None:
+    dynamic.on_change = planner.update  # cached D* Lite searches are repaired as movers pass
+goal, waypoints, wp = None, None, 1
+goals_reached, travelled = 0, 0.0
 
 # --- Main loop ---
-while True:
-    frame = canvas.copy()
-
-    # draw inflated obstacles as light gray overlay (for visualization)
-    overlay = frame.copy()
-    overlay[inflated_mask > 0] = (220, 220, 220)
-    frame = cv2.addWeighted(overlay, 0.35, frame, 0.65, 0)
-
-    # plan: if path blocked, search left/right within FOV for a free angle
-    if not look_ahead_direction(heading):
+n_frames = 0
+while max_frames is None or n_frames < max_frames:
+    if dynamic is not None:
+        dynamic.step()
+    if planner is not None:
+        # follow the planned waypoints; a new goal once the last one is reached (none reachable: wait)
+        if goal is None or wp == len(waypoints):
+            if goal is not None:
+                goals_reached += 1
+            goal, waypoints = new_goal()
+            wp = 1
+    if planner is not None and goal is not None:
+        d = waypoints[wp] - pos
+        dist = math.hypot(d[0], d[1])
+        heading = math.atan2(d[1], d[0])
+        new_pos = waypoints[wp].copy() if dist <= SPEED else pos + d / dist * SPEED
+        if collides_at(new_pos, start=pos):
+            waypoints, wp = planner.plan(pos, goal), 1  # map disagrees with the plan: replan
+            if waypoints is None:
+                goal = None
+        else:
+            travelled += math.dist(pos, new_pos)
+            pos = new_pos
+            wp += dist <= SPEED
+    # reactive: if path blocked, search left/right within FOV for a free angle
+    if planner is None and not look_ahead_direction(heading):
         found_angle = None
         # try sweeping angles to left/right
         for delta in np.linspace(0, FOV/2, 20):
@@ -79,30 +152,28 @@ def look_ahead_direction(angle):
             found_angle = (heading + rng.uniform(-math.pi, math.pi)) % (2*math.pi)
         heading = found_angle
 
-    # move forward
-    new_pos = pos + np.array([math.cos(heading), math.sin(heading)]) * SPEED
+    if planner is None:
+        # move forward
+        new_pos = pos + np.array([math.cos(heading), math.sin(heading)]) * SPEED
 
-    # if new position collides, back up a bit and rotate
-    if collides_at(new_pos):
-        heading = (heading + rng.uniform(math.radians(20), math.radians(160))) % (2*math.pi)
-    else:
-        pos = new_pos
+        # if new position collides, back up a bit and rotate
+        if collides_at(new_pos, start=pos):
+            heading = (heading + rng.uniform(math.radians(20), math.radians(160))) % (2*math.pi)
+        else:
+            travelled += SPEED
+            pos = new_pos
 
     # keep inside bounds
     pos[0] = np.clip(pos[0], ROBOT_R, W-ROBOT_R-1)
     pos[1] = np.clip(pos[1], ROBOT_R, H-ROBOT_R-1)
 
-    # draw trail
-    trail.append(tuple(pos.astype(int)))
-    for i in range(1, len(trail)):
-        cv2.line(frame, trail[i-1], trail[i], (100, 100, 255), 2)
-
-    # draw robot
-    cv2.circle(frame, (int(pos[0]), int(pos[1])), ROBOT_R, (50, 180, 60), -1)
-    # draw heading line
-    hx = int(pos[0] + math.cos(heading) * (ROBOT_R + 12))
-    hy = int(pos[1] + math.sin(heading) * (ROBOT_R + 12))
-    cv2.line(frame, (int(pos[0]), int(pos[1])), (hx, hy), (0, 0, 0), 2)
+    # background with inflated obstacles (cached), trail, robot and heading line
+    out = recorder.buffer((H, W, 3)) if recorder else frame
+    overlay = (lambda img: dynamic.draw(img, MOVING)) if dynamic is not None else None
+    frame = renderer.frame("map", lambda: (canvas, static_inflated, 0, 0), pos, heading, goal=goal, out=out,
+                           overlay=overlay)
+    if waypoints is not None:
+        cv2.polylines(frame, [np.vstack([pos, waypoints[wp:]]).astype(np.int32)], False, (200, 120, 0), 1)
 
     # small look-ahead rays (visual)
     for ang in np.linspace(heading - FOV/2, heading + FOV/2, 9):
@@ -111,12 +182,29 @@ def look_ahead_direction(angle):
         color = (0, 200, 0) if look_ahead_direction(ang) else (0, 0, 200)
         cv2.line(frame, (int(pos[0]), int(pos[1])), (rx, ry), color, 1)
 
-    cv2.putText(frame, "Auto-avoid: q to quit", (10, 20),
+    cv2.putText(frame, f"{'Planner' if planner else 'Auto-avoid'}: q to quit", (10, 20),
                 cv2.FONT_HERSHEY_SIMPLEX, 0.6, (20, 20, 20), 2, cv2.LINE_AA)
 
-    cv2.imshow("Warehouse Robot - Auto Navigation (Sim)", frame)
-    key = cv2.waitKey(15) & 0xFF
-    if key == ord('q'):
-        break
-
-cv2.destroyAllWindows()
+    n_frames += 1
+    if writer is not None:
+        writer.add(-1, pos[0], pos[1], heading, 0.0, ())
+    if not args.headless:
+        cv2.imshow("Warehouse Robot - Auto Navigation (Sim)", frame)
+    if recorder:
+        recorder.submit(frame)  # the writer thread owns this buffer now
+        frame = None
+    if not args.headless:
+        key = cv2.waitKey(15) & 0xFF
+        if key == ord('q'):
+            break
+
+print(f"{n_frames} frames: travelled {travelled:.0f} px" + (f", reached {goals_reached} goals" if planner else ""))
+if recorder:
+    recorder.close()
+    print(f"Recorded {recorder.written} frames to {args.record}")
+if writer is not None:
+    writer.end(truncated=True)
+    writer.close()
+    print(f"Stored {writer.steps} poses in {args.trajectory}")
+if not args.headless:
+    cv2.destroyAllWindows()
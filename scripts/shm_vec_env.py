@@ -0,0 +1,294 @@
+import argparse
+import multiprocessing as mp
+import os
+import sys
+import time
+from multiprocessing import shared_memory
+from typing import Any, Callable, List, Optional, Sequence
+
+import gymnasium as gym
+import numpy as np
+from stable_baselines3.common.vec_env import VecEnv
+from stable_baselines3.common.vec_env.base_vec_env import CloudpickleWrapper
+
+
+class _SharedBuffers:
+    """
+    Step results for all envs in named shared-memory blocks, written in place by the workers:
+    actions, obs, rewards, terminated, truncated and the terminal obs of auto-reset envs.
+    """
+
+    def __init__(self, n_envs: int, obs_space: gym.spaces.Box, act_space: gym.spaces.Space,
+                 names: Optional[dict] = None):
+        self.specs = {
+            "actions": ((n_envs,) + act_space.shape, act_space.dtype),
+            "obs": ((n_envs,) + obs_space.shape, obs_space.dtype),
+            "terminal_obs": ((n_envs,) + obs_space.shape, obs_space.dtype),
+            "rewards": ((n_envs,), np.float32),
+            "terminated": ((n_envs,), np.bool_),
+            "truncated": ((n_envs,), np.bool_),
+        }
+        self.owner = names is None
+        self._shms = {}
+        for key, (shape, dtype) in self.specs.items():
+            nbytes = max(int(np.prod(shape)) * np.dtype(dtype).itemsize, 1)
+            if self.owner:
+                shm = shared_memory.SharedMemory(create=True, size=nbytes)
+            else:
+                shm = _attach(names[key])
+            self._shms[key] = shm
+            setattr(self, key, np.ndarray(shape, dtype=dtype, buffer=shm.buf))
+
+    @property
+    def names(self) -> dict:
+        return {key: shm.name for key, shm in self._shms.items()}
+
+    def close(self):
+        for key in self.specs:
+            setattr(self, key, None)  # drop views before closing the mappings
+        for shm in self._shms.values():
+            shm.close()
+            if self.owner:
+                shm.unlink()
+        self._shms = {}
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """Attach to a block owned by the parent; only the parent unlinks it."""
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    # workers share the parent's resource tracker, where the block is already registered
+    return shared_memory.SharedMemory(name=name)
+
+
+def _worker(remote, parent_remote, env_fns: CloudpickleWrapper, start: int, spec: tuple,
+            cpus: Optional[Sequence[int]]) -> None:
+    from stable_baselines3.common.env_util import is_wrapped
+
+    parent_remote.close()
+    if cpus and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cpus)
+    envs = [fn() for fn in env_fns.var]
+    bufs = _SharedBuffers(*spec)
+    idx = range(start, start + len(envs))
+
+    try:
+        while True:
+            cmd, data = remote.recv()
+            if cmd == "step":
+                infos = {}
+                for i, env in zip(idx, envs):
+                    obs, reward, terminated, truncated, info = env.step(bufs.actions[i])
+                    if terminated or truncated:
+                        # save final observation where the parent can read it, then reset
+                        bufs.terminal_obs[i] = obs
+                        obs, reset_info = env.reset()
+                    bufs.obs[i] = obs
+                    bufs.rewards[i] = reward
+                    bufs.terminated[i] = terminated
+                    bufs.truncated[i] = truncated
+                    if info:
+                        infos[i] = info
+                # only non-empty infos cross the pipe; the arrays are already in shared memory
+                remote.send(infos)
+            elif cmd == "reset":
+                reset_infos = {}
+                for i, env in zip(idx, envs):
+                    seed, options = data[i - start]
+                    maybe_options = {"options": options} if options else {}
+                    bufs.obs[i], reset_infos[i] = env.reset(seed=seed, **maybe_options)
+                remote.send(reset_infos)
+            elif cmd == "call":
+                # (indices, fn) where fn(env) runs in the worker; used for attrs and methods
+                indices, fn = data
+                remote.send([fn.var(envs[i - start]) for i in indices])
+            elif cmd == "is_wrapped":
+                indices, wrapper = data
+                remote.send([is_wrapped(envs[i - start], wrapper) for i in indices])
+            elif cmd == "close":
+                for env in envs:
+                    env.close()
+                break
+            else:
+                raise NotImplementedError(f"`{cmd}` is not implemented in the worker")
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        bufs.close()
+        remote.close()
+
+
+class SharedMemVecEnv(VecEnv):
+    """
+    Process-pool VecEnv: n_workers processes each own a contiguous chunk of the envs and write
+    obs/rewards/dones straight into shared memory, so only a command word and any non-empty info
+    dicts cross the pipes per step (SubprocVecEnv pickles every observation both ways).
+    cpu_affinity: None (OS decides), "auto" (worker k pinned to core k) or one core list per worker.
+    """
+
+    def __init__(self, env_fns: List[Callable[[], gym.Env]], n_workers: Optional[int] = None,
+                 cpu_affinity=None, start_method: Optional[str] = None):
+        n_envs = len(env_fns)
+        n_workers = min(n_workers or os.cpu_count() or 1, n_envs)
+        if start_method is None:
+            start_method = "forkserver" if "forkserver" in mp.get_all_start_methods() else "spawn"
+        ctx = mp.get_context(start_method)
+
+        # spaces come from a throwaway local env so the buffers exist before any worker starts
+        probe = env_fns[0]()
+        obs_space, act_space = probe.observation_space, probe.action_space
+        render_mode = getattr(probe, "render_mode", None)
+        probe.close()
+        self.bufs = _SharedBuffers(n_envs, obs_space, act_space)
+        spec = (n_envs, obs_space, act_space, self.bufs.names)
+
+        cpus = _affinity_plan(cpu_affinity, n_workers)
+        bounds = np.linspace(0, n_envs, n_workers + 1).astype(int)
+        self.chunks = [range(bounds[k], bounds[k + 1]) for k in range(n_workers)]
+        self.remotes, self.processes = [], []
+        for k, chunk in enumerate(self.chunks):
+            remote, work_remote = ctx.Pipe()
+            fns = CloudpickleWrapper([env_fns[i] for i in chunk])
+            args = (work_remote, remote, fns, chunk.start, spec, cpus[k])
+            # daemon=True: if the main process crashes, we should not cause things to hang
+            process = ctx.Process(target=_worker, args=args, daemon=True)
+            process.start()
+            work_remote.close()
+            self.remotes.append(remote)
+            self.processes.append(process)
+
+        self._render_mode = render_mode
+        self.waiting = False
+        self.closed = False
+        super().__init__(n_envs, obs_space, act_space)
+
+    # --------- VecEnv API ----------
+    def reset(self):
+        for remote, chunk in zip(self.remotes, self.chunks):
+            remote.send(("reset", [(self._seeds[i], self._options[i]) for i in chunk]))
+        self.reset_infos = [{} for _ in range(self.num_envs)]
+        for remote in self.remotes:
+            for i, info in remote.recv().items():
+                self.reset_infos[i] = info
+        self._reset_seeds()
+        self._reset_options()
+        return self.bufs.obs.copy()
+
+    def step_async(self, actions: np.ndarray) -> None:
+        self.bufs.actions[:] = np.asarray(actions).reshape(self.bufs.actions.shape)
+        for remote in self.remotes:
+            remote.send(("step", None))
+        self.waiting = True
+
+    def step_wait(self):
+        extra = {}
+        for remote in self.remotes:
+            extra.update(remote.recv())
+        self.waiting = False
+
+        b = self.bufs
+        dones = b.terminated | b.truncated
+        infos = []
+        for i in range(self.num_envs):
+            info = extra.get(i, {})
+            info["TimeLimit.truncated"] = bool(b.truncated[i] and not b.terminated[i])
+            if dones[i]:
+                info["terminal_observation"] = b.terminal_obs[i].copy()
+            infos.append(info)
+        return b.obs.copy(), b.rewards.copy(), dones, infos
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        if self.waiting:
+            for remote in self.remotes:
+                remote.recv()
+        for remote in self.remotes:
+            remote.send(("close", None))
+        for process in self.processes:
+            process.join()
+        self.bufs.close()
+        self.closed = True
+
+    def _indices(self, indices) -> List[int]:
+        if indices is None:
+            return list(range(self.num_envs))
+        if isinstance(indices, int):
+            return [indices]
+        return list(indices)
+
+    def _call(self, fn: Callable[[gym.Env], Any], indices) -> List[Any]:
+        """Run fn(env) inside the workers owning indices; results in indices order."""
+        wanted = self._indices(indices)
+        out = {}
+        for remote, chunk in zip(self.remotes, self.chunks):
+            mine = [i for i in wanted if i in chunk]
+            if mine:
+                remote.send(("call", (mine, CloudpickleWrapper(fn))))
+                out.update(zip(mine, remote.recv()))
+        return [out[i] for i in wanted]
+
+    def get_attr(self, attr_name: str, indices=None) -> List[Any]:
+        if attr_name == "render_mode":
+            return [self._render_mode for _ in self._indices(indices)]
+        return self._call(lambda env: env.get_wrapper_attr(attr_name), indices)
+
+    def set_attr(self, attr_name: str, value: Any, indices=None) -> None:
+        self._call(lambda env: setattr(env, attr_name, value), indices)
+
+    def env_method(self, method_name: str, *method_args, indices=None, **method_kwargs) -> List[Any]:
+        return self._call(lambda env: env.get_wrapper_attr(method_name)(*method_args, **method_kwargs), indices)
+
+    def env_is_wrapped(self, wrapper_class, indices=None) -> List[bool]:
+        wanted = self._indices(indices)
+        out = {}
+        for remote, chunk in zip(self.remotes, self.chunks):
+            mine = [i for i in wanted if i in chunk]
+            if mine:
+                remote.send(("is_wrapped", (mine, wrapper_class)))
+                out.update(zip(mine, remote.recv()))
+        return [out[i] for i in wanted]
+
+    def get_images(self) -> Sequence[Optional[np.ndarray]]:
+        return self.env_method("render")
+
+
+def _affinity_plan(cpu_affinity, n_workers: int) -> List[Optional[List[int]]]:
+    if cpu_affinity is None:
+        return [None] * n_workers
+    if cpu_affinity == "auto":
+        if hasattr(os, "sched_getaffinity"):
+            cores = sorted(os.sched_getaffinity(0))
+        else:
+            cores = list(range(os.cpu_count() or 1))
+        return [[cores[k % len(cores)]] for k in range(n_workers)]
+    if len(cpu_affinity) != n_workers:
+        raise ValueError(f"cpu_affinity has {len(cpu_affinity)} entries for {n_workers} workers")
+    return [list(c) for c in cpu_affinity]
+
+
+if __name__ == "__main__":
+    # throughput report per worker count
+    from rl_env import WarehouseNavEnv
+
+    ap = argparse.ArgumentParser(description="SharedMemVecEnv throughput per worker count")
+    ap.add_argument("--n-envs", type=int, default=64)
+    ap.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    ap.add_argument("--steps", type=int, default=300)
+    ap.add_argument("--affinity", action="store_true", help="pin worker k to core k")
+    args = ap.parse_args()
+
+    print(f"{'workers':>8} {'env-steps/s':>12} {'scaling':>8}")
+    base = None
+    for n_workers in args.workers:
+        venv = SharedMemVecEnv([WarehouseNavEnv for _ in range(args.n_envs)], n_workers=n_workers,
+                               cpu_affinity="auto" if args.affinity else None)
+        venv.reset()
+        actions = np.random.randint(0, 3, size=(args.steps, args.n_envs))
+        t0 = time.perf_counter()
+        for a in actions:
+            venv.step(a)
+        rate = args.steps * args.n_envs / (time.perf_counter() - t0)
+        venv.close()
+        base = base or rate
+        print(f"{n_workers:>8} {rate:>12.0f} {rate / base:>7.2f}x")
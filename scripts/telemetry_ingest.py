@@ -0,0 +1,311 @@
+import argparse
+import json
+import queue
+import re
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from preprocess import BATTERY_RANGE, SPEED_RANGE, normalize_array, preprocess_telemetry, preprocess_telemetry_frame
+from telemetry_wire import encode, is_binary
+
+# one row per message; `device` indexes TelemetryIngestor.devices
+TELEMETRY_DTYPE = np.dtype([
+    ("device", np.int32),
+    ("battery_norm", np.float32),
+    ("speed_norm", np.float32),
+    ("collisions", np.int32),
+    ("ts", np.int64),
+])
+
+# exactly what json.dumps(payload) produces in robot_publisher.py; anything else takes the slow path
+_NUM = rb"(-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?)"
+_INT = rb"(-?\d+)"
+_FAST = re.compile(
+    rb'\{"device": "([^"\\\n]*)", "status": "[^"\\\n]*", "battery": ' + _NUM + rb', "speed": ' + _NUM +
+    rb', "collisions": ' + _INT + rb', "ts": ' + _INT + rb"\}"
+)
+
+
+def parse_batch(payloads: List[bytes], devices: Dict[str, int], rejected: Optional[List[int]] = None) -> np.ndarray:
+    """
+    Raw MQTT payloads -> TELEMETRY_DTYPE rows, normalized like preprocess_telemetry.
+    Binary frames (telemetry_wire) are decoded column-wise straight from their buffers and
+    contribute one row per record, in payload order.
+    Each JSON payload is one message; NDJSON batches must be split into lines first (TelemetryIngestor.feed
+    does). JSON fast path: one regex pass over the joined batch pulls every field as bytes, NumPy converts and
+    normalizes whole columns. Payloads it doesn't match (other key order, extra fields, floats for
+    ints, missing collisions) are decoded with json.loads. devices maps names to ids and grows.
+    Payloads that don't decode (bad JSON, missing fields, corrupt frames) contribute no rows; their
+    indices are appended to rejected when given, so one bad message never costs the rest of the batch.
+    """
+    bad: List[int] = []
+    binary = [i for i, p in enumerate(payloads) if is_binary(p)]
+    if not binary:
+        out = _parse_json(payloads, devices, bad)
+        drop = bad
+    else:
+        frames, good = [], []
+        for i in binary:
+            try:
+                frames.append(preprocess_telemetry_frame(payloads[i]))
+                good.append(i)
+            except ValueError:
+                bad.append(i)
+        counts = np.ones(len(payloads), dtype=np.intp)  # a rejected frame holds one placeholder row
+        counts[good] = [len(f["ts"]) for f in frames]
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        out = np.empty(counts.sum(), dtype=TELEMETRY_DTYPE)
+
+        text = np.setdiff1d(np.arange(len(payloads)), binary)
+        if len(text):
+            text_bad: List[int] = []
+            out[starts[text]] = _parse_json([payloads[i] for i in text], devices, text_bad)
+            bad += text[text_bad].tolist()
+        if frames:
+            # output row of every binary record: its frame's start plus its position within the frame
+            sizes = counts[good]
+            rows = np.arange(sizes.sum()) + np.repeat(starts[good] - np.concatenate([[0], np.cumsum(sizes)[:-1]]), sizes)
+            out["device"][rows] = _device_ids(np.concatenate([f["device"] for f in frames]), devices)
+            for key in ("battery_norm", "speed_norm", "collisions", "ts"):
+                out[key][rows] = np.concatenate([f[key] for f in frames])
+        drop = starts[bad]
+    if bad:
+        out = np.delete(out, drop)
+        if rejected is not None:
+            rejected += sorted(bad)
+    return out
+
+
+def _parse_json(payloads: List[bytes], devices: Dict[str, int], bad: List[int]) -> np.ndarray:
+    """Rows aligned with payloads; indices of payloads that don't decode go to bad (their rows are garbage)."""
+    n = len(payloads)
+    out = np.empty(n, dtype=TELEMETRY_DTYPE)
+    if n == 0:
+        return out
+    joined = b"\n".join(payloads)
+    # a match counts only if it spans its whole payload: equal counts alone can pair rows with the
+    # wrong payloads (an NDJSON payload matching twice next to one that doesn't match at all)
+    lens = np.fromiter(map(len, payloads), dtype=np.intp, count=n)
+    starts = np.concatenate([[0], np.cumsum(lens[:-1] + 1)])
+    matches = list(_FAST.finditer(joined))
+    at = np.fromiter((m.start() for m in matches), dtype=np.intp, count=len(matches))
+    ends = np.fromiter((m.end() for m in matches), dtype=np.intp, count=len(matches))
+    idx = np.searchsorted(starts, at, side="right") - 1
+    whole = (at == starts[idx]) & (ends == starts[idx] + lens[idx])
+    fast = idx[whole]
+    if whole.all() and len(fast) == n:
+        rows, slow = [m.groups() for m in matches], []
+    else:
+        rows = [m.groups() for m, ok in zip(matches, whole) if ok]
+        slow = np.setdiff1d(np.arange(n), fast)
+
+    if len(fast):
+        cols = np.array(rows, dtype=object).T
+        out["device"][fast] = _device_ids(cols[0], devices)
+        # float()/int() accept the captured bytes directly, so the columns convert straight from objects
+        out["battery_norm"][fast] = normalize_array(cols[1].astype(np.float64), *BATTERY_RANGE)
+        out["speed_norm"][fast] = normalize_array(cols[2].astype(np.float64), *SPEED_RANGE)
+        out["collisions"][fast] = cols[3].astype(np.int64)
+        out["ts"][fast] = cols[4].astype(np.int64)
+
+    for i in slow:
+        try:
+            msg = json.loads(payloads[i])
+            t = preprocess_telemetry(msg)
+            name = str(msg.get("device", ""))
+        except (ValueError, KeyError, TypeError, AttributeError):  # not JSON, not an object, bad fields
+            bad.append(int(i))
+            continue
+        out[i] = (devices.setdefault(name, len(devices)), t["battery_norm"], t["speed_norm"],
+                  t["collisions"], t["ts"])
+    return out
+
+
+def _device_ids(names: np.ndarray, devices: Dict[str, int]) -> np.ndarray:
+    uniq, inverse = np.unique(names.astype(np.bytes_), return_inverse=True)
+    ids = np.array([devices.setdefault(u.decode(), len(devices)) for u in uniq], dtype=np.int32)
+    return ids[inverse]
+
+
+class TelemetryIngestor:
+    """
+    Streaming stage between the MQTT client and downstream consumers:
+    - feed(payload) / on_message(...) buffer raw payload bytes; a micro-batch is parsed with
+      parse_batch once batch_size payloads are waiting or the oldest has waited max_wait_ms
+    - parsed batches go to a bounded queue (max_batches); when consumers fall behind, feed() blocks
+      the producer (backpressure) instead of letting memory grow
+    - payloads that don't decode are dropped from their batch and counted in `rejected`
+    - consumers call get() or iterate; close() flushes the tail and ends iteration
+    """
+
+    def __init__(self, batch_size: int = 1024, max_wait_ms: float = 50.0, max_batches: int = 64):
+        self.batch_size = batch_size
+        self.max_wait = max_wait_ms / 1e3
+        self.out = queue.Queue(maxsize=max_batches)
+        self.devices: Dict[str, int] = {}
+        self.received = self.parsed = self.batches = self.rejected = 0
+        self._pending: List[bytes] = []
+        self._oldest = 0.0
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._ticker = threading.Thread(target=self._tick, name="TelemetryIngestor", daemon=True)
+        self._ticker.start()
+
+    # --------- producer side ----------
+    def feed(self, payload: bytes):
+        """One payload: a JSON message, an NDJSON batch (split into its lines) or a binary frame (kept whole;
+        parse_batch expands it)."""
+        if b"\n" in payload and not is_binary(payload):
+            self.feed_many(line for line in payload.split(b"\n") if line.strip())  # e.g. a trailing newline
+            return
+        with self._lock:
+            if not self._pending:
+                self._oldest = time.perf_counter()
+            self._pending.append(payload)
+            self.received += 1
+            if len(self._pending) < self.batch_size:
+                return
+            batch, self._pending = self._pending, []
+            self._emit(batch)
+
+    def feed_many(self, payloads: Iterable[bytes]):
+        for p in payloads:
+            self.feed(p)
+
+    def on_message(self, client, userdata, msg):
+        """paho-mqtt callback: client.on_message = ingestor.on_message
+        Batched NDJSON payloads (fleet_publisher.PooledPublisher) are split by feed()."""
+        self.feed(msg.payload)
+
+    def flush(self):
+        with self._lock:
+            if not self._pending:
+                return
+            batch, self._pending = self._pending, []
+            self._emit(batch)
+
+    def _emit(self, batch: List[bytes]):
+        # called with _lock held: the producer and the ticker can't reorder batches or race the counters
+        bad: List[int] = []
+        rows = parse_batch(batch, self.devices, bad)
+        self.rejected += len(bad)
+        if not len(rows):
+            return
+        self.out.put(rows)  # blocks while the queue is full
+        self.parsed += len(rows)
+        self.batches += 1
+
+    def _tick(self):
+        while not self._closed.wait(self.max_wait / 2):
+            if self._pending and time.perf_counter() - self._oldest >= self.max_wait:
+                try:
+                    self.flush()
+                except Exception as e:  # the batch is lost, but time-based flushing must go on
+                    print(f"⚠️ telemetry flush failed: {e!r}")
+
+    def close(self):
+        self._closed.set()
+        self._ticker.join()
+        self.flush()
+        self.out.put(None)
+
+    # --------- consumer side ----------
+    def get(self, timeout: Optional[float] = None) -> Optional[np.ndarray]:
+        """Next parsed batch (TELEMETRY_DTYPE rows); None once the ingestor is closed and drained."""
+        return self.out.get(timeout=timeout)
+
+    def __iter__(self):
+        while True:
+            rows = self.get()
+            if rows is None:
+                return
+            yield rows
+
+
+# --------- benchmark ----------
+def fake_payloads(n: int, n_robots: int = 1000, seed: int = 0) -> List[bytes]:
+    """Payloads shaped like robot_publisher.py's, from n_robots robots."""
+    rng = np.random.default_rng(seed)
+    ts0 = int(time.time())
+    out = []
+    for i in range(n):
+        battery = int(rng.integers(0, 101))
+        payload = {
+            "device": f"robot{int(rng.integers(n_robots))}",
+            "status": "online" if battery > 0 else "shutdown",
+            "battery": battery,
+            "speed": round(float(rng.uniform(0.2, 1.0)), 2),
+            "collisions": int(rng.choice([0, 0, 1])),
+            "ts": ts0 + i,
+        }
+        out.append(json.dumps(payload).encode())
+    return out
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Telemetry ingestion: per-message vs micro-batched")
+    ap.add_argument("--messages", type=int, default=200_000)
+    ap.add_argument("--batch", type=int, default=1024)
+    args = ap.parse_args()
+
+    payloads = fake_payloads(args.messages)
+    # a few off-pattern payloads exercise the fallback
+    payloads[::997] = [json.dumps({"ts": 5, "speed": 2.0, "battery": "50", "device": "odd"}).encode()
+                       for _ in payloads[::997]]
+
+    t0 = time.perf_counter()
+    ref = [preprocess_telemetry(json.loads(p)) for p in payloads]
+    t_ref = time.perf_counter() - t0
+
+    devices = {}
+    t0 = time.perf_counter()
+    parts = [parse_batch(payloads[i:i + args.batch], devices) for i in range(0, len(payloads), args.batch)]
+    t_batch = time.perf_counter() - t0
+    rows = np.concatenate(parts)
+    for key in ("battery_norm", "speed_norm", "collisions", "ts"):
+        expect = np.array([r[key] for r in ref], dtype=TELEMETRY_DTYPE[key])
+        assert (rows[key] == expect).all(), key
+    # a key-reordered payload (slow path) next to fast ones keeps its own row
+    odd = json.dumps({"ts": 7, "device": "reordered", "status": "online", "battery": 70, "speed": 0.5}).encode()
+    mixed = parse_batch([payloads[0], odd, payloads[1]], devices)
+    assert [r["ts"] for r in mixed] == [json.loads(payloads[0])["ts"], 7, json.loads(payloads[1])["ts"]]
+    # payloads that don't decode are dropped and reported, the rest of the batch survives
+    frame = encode([json.loads(payloads[2]), json.loads(payloads[3])])
+    junk = [b"not json", b"", b'{"device": "x"}', b"[1]", frame[:-3]]
+    rejected = []
+    kept = parse_batch([payloads[0], junk[0], frame, junk[1], odd, *junk[2:], payloads[1]], devices, rejected)
+    assert rejected == [1, 3, 5, 6, 7], rejected
+    assert [r["ts"] for r in kept] == [json.loads(payloads[i])["ts"] for i in (0, 2, 3)] + [7, json.loads(payloads[1])["ts"]]
+    print("parse_batch matches preprocess_telemetry")
+
+    # full stage: producer thread feeding, consumer draining the bounded queue
+    ing = TelemetryIngestor(batch_size=args.batch, max_batches=8)
+    consumed = []
+    consumer = threading.Thread(target=lambda: consumed.extend(len(b) for b in ing))
+    consumer.start()
+    t0 = time.perf_counter()
+    ing.feed_many(payloads[:-4])
+    ing.feed(b"\n".join(payloads[-4:]) + b"\n")  # NDJSON batch: one message per line, newline-terminated
+    ing.feed(b"not json")  # rejected, counted, and the stage keeps going
+    ing.close()
+    consumer.join()
+    t_stage = time.perf_counter() - t0
+    assert sum(consumed) == len(payloads) and ing.rejected == 1
+
+    # a bad payload in a time-flushed batch must not stop the ticker
+    ing = TelemetryIngestor(batch_size=1024, max_wait_ms=20)
+    ing.feed_many([payloads[0], b"not json", payloads[1]])
+    rows = ing.get(timeout=1.0)
+    assert len(rows) == 2 and ing.rejected == 1 and ing._ticker.is_alive()
+    ing.feed(payloads[2])
+    assert len(ing.get(timeout=1.0)) == 1
+    ing.close()
+    print("bad payloads rejected without losing their batch")
+
+    n = len(payloads)
+    print(f"{'path':<28} {'msgs/s':>12} {'us/msg':>8}")
+    for name, t in (("json.loads + preprocess", t_ref), ("parse_batch", t_batch), ("TelemetryIngestor (queued)", t_stage)):
+        print(f"{name:<28} {n / t:>12.0f} {t / n * 1e6:>8.2f}")
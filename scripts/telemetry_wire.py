@@ -0,0 +1,258 @@
+import argparse
+import json
+import struct
+import time
+from typing import Dict, Iterable, List, NamedTuple, Sequence
+
+import numpy as np
+
+# --------- wire layout (version 1) ----------
+# frame  = header + count fixed-size records, little-endian, no padding
+# header = magic, version, flags, record count, ts base (delta frames; 0 otherwise)
+# record = device (utf-8, NUL-padded), status code, battery and speed in hundredths, collisions, ts
+# The magic's first byte can never start a JSON document, so both formats can share a topic.
+MAGIC = b"\xa7T"
+VERSION = 1
+FLAG_DELTA = 0x01  # record ts is the difference to the previous record (first: to the header's base)
+DEVICE_BYTES = 16
+
+HEADER = struct.Struct("<2sBBHq")
+RECORD = struct.Struct(f"<{DEVICE_BYTES}sBHHHq")
+DELTA_RECORD = struct.Struct(f"<{DEVICE_BYTES}sBHHHi")
+
+RECORD_DTYPE = np.dtype([
+    ("device", f"S{DEVICE_BYTES}"),
+    ("status", "u1"),
+    ("battery", "<u2"),
+    ("speed", "<u2"),
+    ("collisions", "<u2"),
+    ("ts", "<i8"),
+])
+DELTA_RECORD_DTYPE = np.dtype(RECORD_DTYPE.descr[:-1] + [("ts", "<i4")])
+assert RECORD_DTYPE.itemsize == RECORD.size and DELTA_RECORD_DTYPE.itemsize == DELTA_RECORD.size
+
+STATUS = ("online", "shutdown")
+_STATUS_CODE = {s: i for i, s in enumerate(STATUS)}
+
+JSON = "json"
+BINARY = "bin1"
+FORMATS = (BINARY, JSON)  # preference order
+
+
+class Frame(NamedTuple):
+    records: np.ndarray  # RECORD_DTYPE / DELTA_RECORD_DTYPE view into the payload (read-only, no copy)
+    ts: np.ndarray  # int64 timestamps: records["ts"] itself, or rebuilt from the deltas
+
+
+# --------- encoder ----------
+def _centi(value, field: str) -> int:
+    """Fixed point at 0.01; values that would not round-trip exactly are rejected (use JSON)."""
+    c = round(float(value) * 100)
+    if abs(c - float(value) * 100) > 1e-6 or not 0 <= c <= 0xFFFF:
+        raise ValueError(f"{field}={value!r} does not fit the binary format (0..655.35 in steps of 0.01)")
+    return c
+
+
+def _fields(msg: dict):
+    device = str(msg["device"]).encode()
+    if len(device) > DEVICE_BYTES or b"\0" in device:
+        raise ValueError(f"device name {msg['device']!r} does not fit the binary format ({DEVICE_BYTES} bytes)")
+    status = _STATUS_CODE.get(msg["status"])
+    if status is None:
+        raise ValueError(f"status {msg['status']!r} has no binary code (expected one of {STATUS})")
+    return (device, status, _centi(msg["battery"], "battery"), _centi(msg["speed"], "speed"),
+            int(msg.get("collisions", 0)), int(msg["ts"]))
+
+
+def encode(msgs: Sequence[dict], delta: bool = False) -> bytes:
+    """
+    robot_publisher-style telemetry dicts -> one binary frame. delta=True stores each ts as the
+    difference to the previous one (4 bytes instead of 8), for batches from one publisher.
+    Raises ValueError for anything the fixed layout can't hold exactly; encode_or_json falls back.
+    """
+    n = len(msgs)
+    if not 0 < n <= 0xFFFF:
+        raise ValueError(f"a frame holds 1..65535 records, got {n}")
+    try:
+        rows = [_fields(m) for m in msgs]
+        if not delta:
+            return HEADER.pack(MAGIC, VERSION, 0, n, 0) + b"".join(RECORD.pack(*r) for r in rows)
+        base = prev = rows[0][-1]
+        parts = [HEADER.pack(MAGIC, VERSION, FLAG_DELTA, n, base)]
+        for r in rows:
+            parts.append(DELTA_RECORD.pack(*r[:-1], r[-1] - prev))
+            prev = r[-1]
+        return b"".join(parts)
+    except struct.error as e:  # collisions / ts deltas out of range
+        raise ValueError(f"telemetry does not fit the binary format: {e}") from None
+
+
+def encode_json(msgs: Sequence[dict]) -> bytes:
+    """The JSON wire format: robot_publisher's json.dumps per message, NDJSON for batches."""
+    return b"\n".join(json.dumps(m).encode() for m in msgs)
+
+
+def encode_or_json(msgs: Sequence[dict], fmt: str = BINARY, delta: bool = True) -> bytes:
+    """Encode in fmt; a batch the binary layout can't represent goes out as JSON instead."""
+    if fmt == BINARY:
+        try:
+            return encode(msgs, delta and len(msgs) > 1)
+        except ValueError:
+            pass
+    elif fmt != JSON:
+        raise ValueError(f"unknown telemetry format {fmt!r} (expected one of {FORMATS})")
+    return encode_json(msgs)
+
+
+# --------- decoder ----------
+def is_binary(payload) -> bool:
+    return bytes(payload[:2]) == MAGIC
+
+
+def record_count(payload) -> int:
+    """Telemetry messages in a payload: records of a binary frame, lines of (ND)JSON."""
+    if is_binary(payload):
+        return HEADER.unpack_from(payload)[3]
+    return bytes(payload).count(b"\n") + 1
+
+
+def decode_one(payload) -> tuple:
+    """Single-record frame -> (device, status, battery, speed, collisions, ts) via struct, no NumPy."""
+    magic, version, flags, n, base = HEADER.unpack_from(payload)
+    if magic != MAGIC or version != VERSION or n != 1:
+        raise ValueError("not a single-record version 1 telemetry frame")
+    rec = DELTA_RECORD if flags & FLAG_DELTA else RECORD
+    if len(payload) != HEADER.size + rec.size:
+        raise ValueError(f"telemetry frame of {len(payload)} bytes does not hold 1 record")
+    device, status, battery, speed, collisions, ts = rec.unpack_from(payload, HEADER.size)
+    return (device.rstrip(b"\0").decode(), STATUS[status], battery / 100, speed / 100, collisions,
+            ts + base if flags & FLAG_DELTA else ts)
+
+
+def decode(payload) -> Frame:
+    """
+    Binary frame -> Frame without copying the records: np.frombuffer over the payload's buffer
+    (bytes, bytearray, memoryview). Only delta frames allocate, for the rebuilt ts column.
+    """
+    buf = memoryview(payload)
+    if len(buf) < HEADER.size:
+        raise ValueError(f"telemetry frame too short ({len(buf)} bytes)")
+    magic, version, flags, n, base = HEADER.unpack_from(buf)
+    if magic != MAGIC:
+        raise ValueError("not a binary telemetry frame")
+    if version != VERSION:
+        raise ValueError(f"unsupported telemetry wire version {version} (this decoder reads {VERSION})")
+    dtype = DELTA_RECORD_DTYPE if flags & FLAG_DELTA else RECORD_DTYPE
+    if len(buf) != HEADER.size + n * dtype.itemsize:
+        raise ValueError(f"telemetry frame of {len(buf)} bytes does not hold {n} records")
+    records = np.frombuffer(buf, dtype=dtype, count=n, offset=HEADER.size)
+    if flags & FLAG_DELTA:
+        ts = np.cumsum(records["ts"], dtype=np.int64)
+        ts += base
+    else:
+        ts = records["ts"]
+    return Frame(records, ts)
+
+
+def to_dicts(frame: Frame) -> List[dict]:
+    """Decoded frame -> the original telemetry dicts (for consumers that want JSON-shaped messages)."""
+    r = frame.records
+    return [{"device": d.decode(), "status": STATUS[s], "battery": b / 100 if b % 100 else b // 100,
+             "speed": v / 100, "collisions": int(c), "ts": int(t)}
+            for d, s, b, v, c, t in zip(r["device"], r["status"].tolist(), r["battery"].tolist(),
+                                        r["speed"].tolist(), r["collisions"], frame.ts.tolist())]
+
+
+# --------- per-topic negotiation ----------
+def formats_topic(topic: str) -> str:
+    """Where a topic's subscribers announce the formats they read (retained)."""
+    return f"{topic}/formats"
+
+
+def announce(client, topic: str, formats: Iterable[str] = FORMATS, qos: int = 1):
+    """Subscriber side: publish (retained) the formats this consumer decodes, preferred first."""
+    client.publish(formats_topic(topic), " ".join(formats).encode(), qos=qos, retain=True)
+
+
+class FormatNegotiator:
+    """
+    Publisher-side choice of wire format per topic:
+    - subscribers announce what they read on formats_topic(topic); on_message records it
+      (subscribe the publisher's client to those topics, or call accept() for static setups)
+    - format_for(topic) is the publisher's first preference the topic's subscribers accept
+    - topics nobody announced for get JSON, which every consumer (and AWS IoT rules) understands
+    """
+
+    def __init__(self, prefer: Sequence[str] = FORMATS):
+        self.prefer = tuple(prefer)
+        self._accepted: Dict[str, tuple] = {}
+
+    def accept(self, topic: str, formats: Iterable[str]):
+        self._accepted[topic] = tuple(formats)
+
+    def on_message(self, client, userdata, msg):
+        """paho-mqtt callback for formats_topic(...) messages."""
+        topic = msg.topic[:-len("/formats")] if msg.topic.endswith("/formats") else msg.topic
+        self.accept(topic, msg.payload.decode(errors="replace").split())
+
+    def format_for(self, topic: str) -> str:
+        accepted = self._accepted.get(topic, ())
+        return next((f for f in self.prefer if f in accepted), JSON)
+
+
+if __name__ == "__main__":
+    from preprocess import preprocess_telemetry, preprocess_telemetry_frame
+    from telemetry_ingest import fake_payloads, parse_batch
+
+    ap = argparse.ArgumentParser(description="Telemetry wire formats: size and encode/decode speed")
+    ap.add_argument("--messages", type=int, default=100_000)
+    ap.add_argument("--batch", type=int, default=50)
+    args = ap.parse_args()
+
+    msgs = [json.loads(p) for p in fake_payloads(args.messages)]
+    batches = [msgs[i:i + args.batch] for i in range(0, len(msgs), args.batch)]
+
+    # every path must agree with json.loads + preprocess_telemetry
+    ref = [preprocess_telemetry(m) for m in msgs]
+    for delta in (False, True):
+        cols = [preprocess_telemetry_frame(encode(b, delta)) for b in batches]
+        for key in ("battery_norm", "speed_norm", "collisions", "ts"):
+            got = np.concatenate([c[key] for c in cols])
+            assert (got == np.array([r[key] for r in ref])).all(), (delta, key)
+        assert to_dicts(decode(encode(batches[0], delta))) == batches[0]
+    assert preprocess_telemetry(encode(msgs[:1])) == ref[0]
+    assert encode_or_json([dict(msgs[0], status="charging")]) == encode_json([dict(msgs[0], status="charging")])
+    neg = FormatNegotiator()
+    neg.accept("warehouse/fleet/0/batch", ["json", BINARY])
+    assert neg.format_for("warehouse/fleet/0/batch") == BINARY and neg.format_for("warehouse/robot1/status") == JSON
+    print("binary frames decode to the same telemetry as JSON\n")
+
+    def bench(fn, items):
+        t0 = time.perf_counter()
+        out = [fn(x) for x in items]
+        return out, (time.perf_counter() - t0) / len(msgs) * 1e6
+
+    def ingest(payloads):
+        # TelemetryIngestor's path: parse_batch over ~1024 messages' worth of payloads at a time
+        step = max(1024 * len(payloads) // len(msgs), 1)
+        return [parse_batch(payloads[i:i + step], {}) for i in range(0, len(payloads), step)]
+
+    singles = [[m] for m in msgs]
+    cases = [
+        ("json, 1/msg", singles, encode_json, preprocess_telemetry),
+        ("bin1, 1/msg", singles, encode, preprocess_telemetry),
+        (f"json, {args.batch}/payload", batches, encode_json,
+         lambda p: [preprocess_telemetry(line) for line in p.split(b"\n")]),
+        (f"bin1, {args.batch}/payload", batches, encode, preprocess_telemetry_frame),
+        (f"bin1 delta, {args.batch}/payload", batches, lambda b: encode(b, True), preprocess_telemetry_frame),
+    ]
+    print(f"{'format':<30} {'bytes/msg':>9} {'encode us/msg':>14} {'decode us/msg':>14}")
+    for name, items, enc, dec in cases:
+        payloads, t_enc = bench(enc, items)
+        _, t_dec = bench(dec, payloads)
+        size = sum(map(len, payloads)) / len(msgs)
+        print(f"{name:<30} {size:>9.1f} {t_enc:>14.2f} {t_dec:>14.2f}")
+        if dec is not preprocess_telemetry:
+            lines = [line for p in payloads for line in p.split(b"\n")] if name.startswith("json") else payloads
+            _, t_ing = bench(ingest, [lines])
+            print(f"{'  ... via parse_batch':<30} {'':>9} {'':>14} {t_ing:>14.2f}")
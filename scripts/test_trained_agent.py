@@ -1,15 +1,34 @@
+import argparse
 import time
 import numpy as np
 from stable_baselines3 import PPO
+from policy_server import load_obs_norm, normalize_obs
 from rl_env import WarehouseNavEnv
 
+ap = argparse.ArgumentParser(description="Run the trained PPO agent in the warehouse env")
+ap.add_argument("--headless", action="store_true", help="no window; render off-screen (use with --record)")
+ap.add_argument("--record", default=None, help="save the run as a .mp4/.avi video or a PNG directory")
+ap.add_argument("--trajectory", default=None,
+                help="store the episode's steps in this directory (replay: trajectory_store.py replay DIR)")
+args = ap.parse_args()
+
 # Load the trained model
 model_path = "models/ppo_nav/warehouse_robot_rl.zip"
 print(f"Loading model from: {model_path}")
 model = PPO.load(model_path)
+obs_norm = load_obs_norm(model_path)  # VecNormalize statistics if trained with --normalize
+
+# Initialize environment in human (visual) mode, or headless when recording on a server
+env = WarehouseNavEnv(render_mode="rgb_array" if args.headless else "human")
+if args.record:
+    env.record(args.record)
+writer = None
+if args.trajectory:
+    from trajectory_store import TrajectoryWriter, make_recorder
 
-# Initialize environment in human (visual) mode
-env = WarehouseNavEnv(render_mode="human")
+    writer = TrajectoryWriter(args.trajectory, env.observation_space.shape[0],
+                              meta={"model": model_path, "env": {}})
+    env = make_recorder(env, writer)
 obs, _ = env.reset(seed=42)
 
 print("\n🚀 Running trained agent in warehouse simulation...")
@@ -17,7 +36,7 @@
 
 total_reward = 0
 for step in range(300):  # Run for 300 steps (adjust as needed)
-    action, _ = model.predict(obs)
+    action, _ = model.predict(normalize_obs(obs, obs_norm))
     obs, reward, terminated, truncated, info = env.step(int(action))
     total_reward += reward
     if terminated or truncated:
@@ -26,3 +45,8 @@
 
 env.close()
 print(f"\n✅ Simulation finished. Total reward: {round(total_reward, 2)}")
+if args.record:
+    print(f"🎥 Run recorded to {args.record}")
+if writer is not None:
+    writer.close()
+    print(f"🗂️ {writer.steps} steps stored in {args.trajectory}")
@@ -1,32 +1,121 @@
 import os
-import gymnasium as gym
-from stable_baselines3 import PPO
-from stable_baselines3.common.env_util import make_vec_env
-from rl_env import WarehouseNavEnv
-
-# Make sure model directory exists
-os.makedirs("models/ppo_nav", exist_ok=True)
-
-# Create vectorized environment
-env = make_vec_env(lambda: WarehouseNavEnv(render_mode=None), n_envs=4)
-
-# Initialize PPO agent
-model = PPO(
-    "MlpPolicy",
-    env,
-    verbose=1,
-    learning_rate=3e-4,
-    n_steps=2048,
-    batch_size=64,
-    gamma=0.99,
-    tensorboard_log="./logs/",
-)
-
-# Train agent
-TIMESTEPS = 50000  # You can increase this later (e.g., 200000+)
-model.learn(total_timesteps=TIMESTEPS)
-
-# Save trained model
-model.save("models/ppo_nav/warehouse_robot_rl")
-
-print("\n✅ Training complete! Model saved at models/ppo_nav/warehouse_robot_rl.zip")
+import argparse
+from pathlib import Path
+# torch / SB3 / the envs load in main() after argument parsing, so --help and bad flags return at once
+
+
+def use_map_pool(pool_dir):
+    """Point this process's shared MAP_CACHE at a pre-generated pool (no-op for None)."""
+    if pool_dir:
+        from map_cache import MAP_CACHE
+
+        MAP_CACHE.pool_dir = Path(pool_dir)
+
+
+def make_env(args):
+    """Create the vectorized training environment selected by --vec (VecNormalize-wrapped with --normalize)."""
+    from stable_baselines3.common.env_util import make_vec_env
+    from stable_baselines3.common.vec_env import VecMonitor, VecNormalize
+    from rl_env import WarehouseNavEnv
+    from vec_env import WarehouseNavVecEnv
+    from shm_vec_env import SharedMemVecEnv
+
+    kw = dict(profile=args.profile, shaping=args.shaping, goal_features=args.goal_features)
+    pool = args.map_pool
+
+    def env_fn():
+        # runs where the env lives: --vec shm workers (forkserver/spawn) start with a fresh map_cache
+        use_map_pool(pool)
+        return WarehouseNavEnv(render_mode=None, **kw)
+
+    use_map_pool(pool)
+    if args.vec == "native":
+        env = VecMonitor(WarehouseNavVecEnv(args.n_envs, **kw))
+    elif args.vec == "shm":
+        affinity = "auto" if args.affinity else None
+        env = VecMonitor(SharedMemVecEnv([env_fn] * args.n_envs, n_workers=args.workers, cpu_affinity=affinity))
+    else:
+        env = make_vec_env(env_fn, n_envs=args.n_envs)
+    return VecNormalize(env) if args.normalize else env
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the PPO warehouse navigation agent")
+    parser.add_argument("--n-envs", type=int, default=4, help="number of parallel robots/environments")
+    parser.add_argument("--vec", choices=["native", "shm", "dummy"], default="native",
+                        help="native = batched WarehouseNavVecEnv, shm = shared-memory worker processes, "
+                             "dummy = SB3 make_vec_env over WarehouseNavEnv")
+    parser.add_argument("--workers", type=int, default=None, help="--vec shm: worker processes (default: all cores)")
+    parser.add_argument("--affinity", action="store_true", help="--vec shm: pin worker k to core k")
+    parser.add_argument("--map-pool", default=None,
+                        help="directory of pre-generated maps (python scripts/map_cache.py DIR) to load instead of generating")
+    parser.add_argument("--shaping", choices=["euclidean", "geodesic"], default="euclidean",
+                        help="progress reward along the straight line or the obstacle-aware goal distance field")
+    parser.add_argument("--goal-features", action="store_true",
+                        help="add geodesic goal distance and downhill direction to the observation")
+    parser.add_argument("--normalize", action="store_true", help="VecNormalize observations and rewards")
+    parser.add_argument("--timesteps", type=int, default=50000, help="total training timesteps (including resumed ones)")
+    parser.add_argument("--checkpoint-dir", default="models/ppo_nav/checkpoints")
+    parser.add_argument("--checkpoint-every", type=int, default=20000, help="timesteps between checkpoints (0 = off)")
+    parser.add_argument("--keep", type=int, default=3, help="newest checkpoints to retain")
+    parser.add_argument("--resume", action="store_true", help="continue from the newest checkpoint in --checkpoint-dir")
+    parser.add_argument("--profile", action="store_true",
+                        help="record env phase timings and export percentiles/histograms to ./logs/")
+    args = parser.parse_args()
+
+    from stable_baselines3 import PPO
+    from stable_baselines3.common.callbacks import CallbackList
+    from profiling import make_profiling_callback
+    from checkpoint import CheckpointWriter, make_checkpoint_callback, resume_latest
+
+    # Make sure model directory exists
+    os.makedirs("models/ppo_nav", exist_ok=True)
+
+    # Create vectorized environment
+    env = make_env(args)
+
+    # Initialize PPO agent
+    model = PPO(
+        "MlpPolicy",
+        env,
+        verbose=1,
+        learning_rate=3e-4,
+        n_steps=2048,
+        batch_size=64,
+        gamma=0.99,
+        tensorboard_log="./logs/",
+    )
+
+    # Resume model/optimizer/normalization state from the newest checkpoint
+    done = resume_latest(model, args.checkpoint_dir) if args.resume else 0
+    if done:
+        print(f"Resumed from {args.checkpoint_dir} at {done} timesteps")
+
+    # Train agent; checkpoints are written by a background thread while rollouts continue
+    callbacks = [make_profiling_callback()] if args.profile else []
+    writer = None
+    if args.checkpoint_every > 0:
+        writer = CheckpointWriter(args.checkpoint_dir, keep=args.keep)
+        callbacks.append(make_checkpoint_callback(writer, args.checkpoint_every))
+    if done < args.timesteps:
+        model.learn(total_timesteps=args.timesteps - done, callback=CallbackList(callbacks),
+                    reset_num_timesteps=not done)
+    if writer is not None:
+        writer.close()
+
+    # Save trained model
+    model.save("models/ppo_nav/warehouse_robot_rl")
+    # consumers (policy_server.load_obs_norm) apply vec_normalize.pkl whenever it sits next to the
+    # model, so an unnormalized run must not leave an older run's statistics behind
+    if args.normalize:
+        env.save("models/ppo_nav/vec_normalize.pkl")
+    else:
+        Path("models/ppo_nav/vec_normalize.pkl").unlink(missing_ok=True)
+    env.close()
+
+    print("\n✅ Training complete! Model saved at models/ppo_nav/warehouse_robot_rl.zip")
+
+
+# worker processes of --vec shm re-import this module, so training only runs from the entry point
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,459 @@
+import argparse
+import json
+import os
+import time
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Sequence, Tuple
+
+import numpy as np
+
+# per-step columns; obs is (obs_dim,) per step. x, y, heading are the pose after the step and obs the
+# observation the action was chosen from, so (obs, action) rows are behaviour-cloning pairs as stored
+STEP_COLUMNS = {
+    "action": np.int8,  # -1 where the recorder has no discrete action (robot_simulation.py)
+    "x": np.float32,
+    "y": np.float32,
+    "heading": np.float32,
+    "reward": np.float32,
+    "obs": np.float32,
+}
+
+# one row per finished episode; steps [start, start + length) of the store
+EPISODE_DTYPE = np.dtype([
+    ("seed", np.int64),      # map seed: with the recorded env settings it fixes the whole episode
+    ("start", np.int64),
+    ("length", np.int32),
+    ("x0", np.float32),      # pose after reset
+    ("y0", np.float32),
+    ("heading0", np.float32),
+    ("ret", np.float32),     # sum of rewards
+    ("terminated", np.bool_),
+    ("truncated", np.bool_),
+])
+
+
+def _chunk_dir(root: Path, k: int) -> Path:
+    return root / f"chunk_{k:06d}"
+
+
+class TrajectoryWriter:
+    """
+    Append-only trajectory store on disk, written through a bounded buffer:
+    - steps go into fixed-dtype raw column files (one per STEP_COLUMNS entry), cut into chunk
+      directories of chunk_steps rows so no file grows without bound and readers memory-map only
+      the chunks they touch
+    - add() fills a preallocated buffer of buffer_steps rows; a full buffer is written out in one
+      write per column, so memory stays at buffer_steps rows however long the run
+    - an episode's row reaches episodes.bin only after all its steps are on disk, so a killed run
+      leaves a store whose episodes are all complete
+    """
+
+    def __init__(self, path: str, obs_dim: int, chunk_steps: int = 1 << 16, buffer_steps: int = 4096,
+                 meta: Optional[dict] = None):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        if (self.path / "meta.json").exists():
+            raise FileExistsError(f"{self.path} already holds a trajectory store")
+        self.obs_dim, self.chunk_steps = obs_dim, chunk_steps
+        (self.path / "meta.json").write_text(json.dumps({
+            "obs_dim": obs_dim, "chunk_steps": chunk_steps,
+            "columns": {n: np.dtype(dt).str for n, dt in STEP_COLUMNS.items()},
+            "episode_dtype": EPISODE_DTYPE.descr, **(meta or {})}, indent=2))
+        self._episodes = open(self.path / "episodes.bin", "ab")
+
+        self._buf = {n: np.empty((buffer_steps, obs_dim) if n == "obs" else buffer_steps, dtype=dt)
+                     for n, dt in STEP_COLUMNS.items()}
+        self._n = 0                 # rows in the buffer
+        self._pending = []          # finished episodes whose steps may still be in the buffer
+        self._files = None          # open column files of the current chunk
+        self._chunk = -1
+        self._chunk_fill = chunk_steps
+        self.steps = 0              # steps added (buffered or written)
+        self.episodes = 0
+        self._open = None           # the episode being recorded
+
+    # --------- episodes ----------
+    def begin(self, seed: int, x: float, y: float, heading: float):
+        if self._open is not None:
+            raise RuntimeError("previous episode not ended")
+        ep = self._open = np.zeros((), dtype=EPISODE_DTYPE)
+        ep["seed"], ep["start"], ep["x0"], ep["y0"], ep["heading0"] = seed, self.steps, x, y, heading
+
+    def add(self, action: int, x: float, y: float, heading: float, reward: float, obs):
+        if self._n == len(self._buf["x"]):
+            self._write_buffer()
+        n, b = self._n, self._buf
+        b["action"][n], b["x"][n], b["y"][n], b["heading"][n], b["reward"][n] = action, x, y, heading, reward
+        b["obs"][n] = obs
+        self._n += 1
+        self.steps += 1
+        self._open["ret"] += reward
+
+    def end(self, terminated: bool = False, truncated: bool = False):
+        ep = self._open
+        ep["length"] = self.steps - ep["start"]
+        ep["terminated"], ep["truncated"] = terminated, truncated
+        self._pending.append(ep.item())
+        self._open = None
+        self.episodes += 1
+
+    def add_episode(self, seed: int, start_pose: Sequence[float], actions, x, y, heading, rewards, obs,
+                    terminated: bool = False, truncated: bool = False):
+        """A whole episode from (T,) / (T, obs_dim) arrays, e.g. one robot of a vec env once it is done."""
+        self.begin(seed, *start_pose)
+        cols = {"action": actions, "x": x, "y": y, "heading": heading, "reward": rewards, "obs": obs}
+        cols = {n: np.asarray(v, dtype=STEP_COLUMNS[n]) for n, v in cols.items()}
+        T = len(cols["x"])
+        if self._n + T <= len(self._buf["x"]):
+            for n, v in cols.items():
+                self._buf[n][self._n:self._n + T] = v
+            self._n += T
+        else:  # larger than the free buffer: write around it
+            self._write_buffer()
+            self._write(cols, T)
+        self.steps += T
+        self._open["ret"] = cols["reward"].sum(dtype=np.float64)
+        self.end(terminated, truncated)
+
+    # --------- disk ----------
+    def _write(self, cols: Dict[str, np.ndarray], n: int):
+        """Append n rows to the chunk files, opening a new chunk whenever one is full."""
+        done = 0
+        while done < n:
+            if self._chunk_fill == self.chunk_steps:
+                self._next_chunk()
+            k = min(n - done, self.chunk_steps - self._chunk_fill)
+            for name, f in self._files.items():
+                f.write(np.ascontiguousarray(cols[name][done:done + k]).tobytes())
+            self._chunk_fill += k
+            done += k
+
+    def _next_chunk(self):
+        self._close_files()
+        self._chunk += 1
+        d = _chunk_dir(self.path, self._chunk)
+        d.mkdir(exist_ok=True)
+        self._files = {n: open(d / f"{n}.bin", "ab") for n in STEP_COLUMNS}
+        self._chunk_fill = 0
+
+    def _write_buffer(self):
+        """Write the buffered steps, then the episodes they complete."""
+        if self._n:
+            self._write(self._buf, self._n)
+            self._n = 0
+        if self._pending:
+            self._episodes.write(np.array(self._pending, dtype=EPISODE_DTYPE).tobytes())
+            self._pending = []
+
+    def flush(self):
+        """Put every buffered step and finished episode on disk."""
+        self._write_buffer()
+        for f in (self._files or {}).values():
+            f.flush()
+        self._episodes.flush()
+
+    def _close_files(self):
+        if self._files is not None:
+            for f in self._files.values():
+                f.close()
+
+    def close(self):
+        """Flush and close; an episode still open is dropped (its steps stay, unreferenced)."""
+        self.flush()
+        self._close_files()
+        self._files = None
+        self._episodes.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class TrajectoryStore:
+    """
+    Read side of a TrajectoryWriter directory. Nothing is loaded up front: each chunk's columns are
+    memory-mapped on first access, so any step is a page read away and scans stream chunk by chunk.
+    Steps past the last complete chunk row and episodes not fully on disk (a killed writer) are ignored.
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.meta = json.loads((self.path / "meta.json").read_text())
+        self.obs_dim, self.chunk_steps = self.meta["obs_dim"], self.meta["chunk_steps"]
+        self._dtypes = {n: np.dtype(dt) for n, dt in self.meta["columns"].items()}
+        self._chunks: Dict[int, Dict[str, np.ndarray]] = {}
+
+        n_chunks = 0
+        while _chunk_dir(self.path, n_chunks).is_dir():
+            n_chunks += 1
+        self.num_steps = 0
+        if n_chunks:
+            # all chunks but the last are full; the last may have columns a write apart
+            last = _chunk_dir(self.path, n_chunks - 1)
+            rows = min(os.path.getsize(last / f"{n}.bin") // self._row_bytes(n)
+                       for n in self._dtypes if self._row_bytes(n))
+            self.num_steps = (n_chunks - 1) * self.chunk_steps + rows
+
+        ep_file = self.path / "episodes.bin"
+        n_eps = ep_file.stat().st_size // EPISODE_DTYPE.itemsize if ep_file.exists() else 0
+        episodes = np.memmap(ep_file, dtype=EPISODE_DTYPE, mode="r", shape=(n_eps,)) if n_eps \
+            else np.empty(0, dtype=EPISODE_DTYPE)
+        self.episodes = episodes[episodes["start"] + episodes["length"] <= self.num_steps]
+
+    def _row_bytes(self, name: str) -> int:
+        return self._dtypes[name].itemsize * (self.obs_dim if name == "obs" else 1)
+
+    def __len__(self) -> int:
+        return self.num_steps
+
+    def _chunk(self, k: int) -> Dict[str, np.ndarray]:
+        cols = self._chunks.get(k)
+        if cols is None:
+            rows = min(self.chunk_steps, self.num_steps - k * self.chunk_steps)
+            d = _chunk_dir(self.path, k)
+            cols = self._chunks[k] = {}
+            for n, dt in self._dtypes.items():
+                shape = (rows, self.obs_dim) if n == "obs" else (rows,)
+                # np.memmap cannot map zero bytes (obs_dim=0 stores, an empty last chunk)
+                cols[n] = np.memmap(d / f"{n}.bin", dtype=dt, mode="r", shape=shape) if rows * self._row_bytes(n) \
+                    else np.empty(shape, dtype=dt)
+        return cols
+
+    # --------- access ----------
+    def steps(self, start: int, stop: int, columns: Optional[Sequence[str]] = None) -> Dict[str, np.ndarray]:
+        """Columns of steps [start, stop): memory-mapped views within one chunk, copies across chunks."""
+        columns = list(columns or self._dtypes)
+        if not 0 <= start <= stop <= self.num_steps:
+            raise IndexError(f"steps [{start}, {stop}) outside the store's {self.num_steps}")
+        k0, k1 = start // self.chunk_steps, max(stop - 1, start) // self.chunk_steps
+        parts = []
+        for k in range(k0, k1 + 1):
+            base = k * self.chunk_steps
+            lo, hi = max(start - base, 0), min(stop - base, self.chunk_steps)
+            cols = self._chunk(k)
+            parts.append({n: cols[n][lo:hi] for n in columns})
+        if len(parts) == 1:
+            return parts[0]
+        return {n: np.concatenate([p[n] for p in parts]) for n in columns}
+
+    def step(self, i: int) -> Dict[str, np.ndarray]:
+        if not 0 <= i < self.num_steps:
+            raise IndexError(f"step {i} outside the store's {self.num_steps}")
+        cols = self._chunk(i // self.chunk_steps)
+        return {n: c[i % self.chunk_steps] for n, c in cols.items()}
+
+    def episode(self, k: int, columns: Optional[Sequence[str]] = None) -> Tuple[np.void, Dict[str, np.ndarray]]:
+        ep = self.episodes[k]
+        return ep, self.steps(int(ep["start"]), int(ep["start"] + ep["length"]), columns)
+
+    def iter_chunks(self, columns: Optional[Sequence[str]] = None) -> Iterator[Tuple[int, Dict[str, np.ndarray]]]:
+        """(first step, memory-mapped columns) per chunk: scans touch one chunk's pages at a time."""
+        for k in range(-(-self.num_steps // self.chunk_steps)):
+            cols = self._chunk(k)
+            yield k * self.chunk_steps, {n: cols[n] for n in (columns or self._dtypes)}
+
+
+# --------- recording / replay ----------
+def env_pose(env) -> Tuple[float, float, float]:
+    e = env.unwrapped
+    return float(e.pos[0]), float(e.pos[1]), float(e.heading)
+
+
+def make_recorder(env, writer: TrajectoryWriter):
+    """
+    Wrap a WarehouseNavEnv so every episode it runs is appended to writer; the seed recorded is the
+    map seed actually used (reset(seed=None) builds map 42). Episodes cut short by another reset are
+    recorded as truncated.
+    """
+    import gymnasium as gym
+
+    class RecordTrajectory(gym.Wrapper):
+        def __init__(self):
+            super().__init__(env)
+            self._obs = None
+
+        def reset(self, **kwargs):
+            if writer._open is not None:
+                writer.end(truncated=True)
+            obs, info = self.env.reset(**kwargs)
+            writer.begin(self.env.unwrapped.map.key.seed, *env_pose(self.env))
+            self._obs = obs
+            return obs, info
+
+        def step(self, action):
+            obs, reward, terminated, truncated, info = self.env.step(action)
+            writer.add(int(action), *env_pose(self.env), reward, self._obs)
+            self._obs = obs
+            if terminated or truncated:
+                writer.end(terminated, truncated)
+            return obs, reward, terminated, truncated, info
+
+        def close(self):
+            if writer._open is not None:
+                writer.end(truncated=True)
+            super().close()
+
+    return RecordTrajectory()
+
+
+def replay(store: TrajectoryStore, k: int, env) -> Iterator[int]:
+    """
+    Re-run episode k in env from its recorded actions (no policy), yielding each step index after
+    it is applied (render or record env there). Raises ValueError at the first step whose
+    observation or pose differs from the recording, i.e. the env is not the one recorded.
+    """
+    ep, steps = store.episode(k)
+    obs, _ = env.reset(seed=int(ep["seed"]))
+    if not np.allclose(env_pose(env), (ep["x0"], ep["y0"], ep["heading0"]), atol=1e-5):
+        raise ValueError(f"episode {k}: start pose differs from the recording")
+    for t in range(int(ep["length"])):
+        if store.obs_dim and not np.allclose(obs, steps["obs"][t], atol=1e-5):
+            raise ValueError(f"episode {k}: observation differs at step {t}")
+        obs, *_ = env.step(int(steps["action"][t]))
+        pose = (steps["x"][t], steps["y"][t], steps["heading"][t])
+        if not np.allclose(env_pose(env), pose, atol=1e-4):
+            raise ValueError(f"episode {k}: pose differs at step {t}: {env_pose(env)} vs {pose}")
+        yield t
+
+
+def _make_env(meta: dict, **kw):
+    from rl_env import WarehouseNavEnv
+
+    return WarehouseNavEnv(**meta.get("env", {}), **kw)
+
+
+def _record(args):
+    from policy_server import NumpyPolicy
+
+    policy = NumpyPolicy.load(args.model)
+    env_kw = dict(num_rays=policy.obs_dim - 4)
+    rng = np.random.default_rng(args.first_seed)
+    meta = {"model": args.model, "env": env_kw, "deterministic": not args.stochastic}
+    t0 = time.perf_counter()
+    with TrajectoryWriter(args.out, policy.obs_dim, meta=meta) as writer:
+        env = make_recorder(_make_env(meta), writer)
+        for seed in range(args.first_seed, args.first_seed + args.episodes):
+            obs, _ = env.reset(seed=seed)
+            done = False
+            while not done:
+                action = policy.act(obs[None], not args.stochastic, rng)[0]
+                obs, _, terminated, truncated, _ = env.step(action)
+                done = terminated or truncated
+        env.close()
+    elapsed = time.perf_counter() - t0
+    print(f"{writer.episodes} episodes, {writer.steps} steps in {elapsed:.1f} s -> {args.out}")
+
+
+def _replay(args):
+    store = TrajectoryStore(args.path)
+    if "env" not in store.meta:
+        raise SystemExit(f"{args.path} holds poses only ({store.meta.get('source')}); there are no actions to replay")
+    env = _make_env(store.meta, render_mode="rgb_array" if args.record else None)
+    if args.record:
+        env.record(args.record)
+    episodes = [args.episode] if args.episode is not None else range(len(store.episodes))
+    t0 = time.perf_counter()
+    n = 0
+    for k in episodes:
+        for _ in replay(store, k, env):  # a recording env writes each step's frame itself
+            n += 1
+    env.close()
+    rets = store.episodes["ret"]
+    print(f"replayed {len(episodes)} episodes ({n} steps) identically in {time.perf_counter() - t0:.2f} s; "
+          f"store: {len(store.episodes)} episodes, {len(store)} steps, mean return {rets.mean():.1f}")
+
+
+def _anon_mib() -> float:
+    """Anonymous (heap) resident memory; memory-mapped file pages are not counted. nan off Linux."""
+    try:
+        for line in Path("/proc/self/status").read_text().splitlines():
+            if line.startswith("RssAnon:"):
+                return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return float("nan")
+
+
+def _bench(args):
+    import shutil
+    import tempfile
+
+    root = Path(tempfile.mkdtemp(prefix="traj_bench_"))
+    try:
+        obs_dim, T = 12, 250
+        rng = np.random.default_rng(0)
+        ep_obs = rng.random((T, obs_dim), dtype=np.float32)
+        ep_act = rng.integers(0, 3, T).astype(np.int8)
+        ep_xy = rng.random((2, T), dtype=np.float32) * 500
+        anon0 = _anon_mib()
+
+        t0 = time.perf_counter()
+        with TrajectoryWriter(root / "bulk", obs_dim) as w:
+            for e in range(args.steps // T):
+                w.add_episode(e, (40, 40, 0), ep_act, ep_xy[0], ep_xy[1], ep_xy[0], ep_xy[1], ep_obs, True)
+        bulk = w.steps / (time.perf_counter() - t0)
+
+        t0 = time.perf_counter()
+        n_single = min(args.steps, 200_000)
+        with TrajectoryWriter(root / "single", obs_dim) as w:
+            for i in range(n_single):
+                if i % T == 0:
+                    w.begin(i // T, 40, 40, 0)
+                w.add(ep_act[i % T], ep_xy[0, i % T], ep_xy[1, i % T], 0.0, -0.01, ep_obs[i % T])
+                if i % T == T - 1:
+                    w.end(terminated=True)
+        single = n_single / (time.perf_counter() - t0)
+        anon_write = _anon_mib() - anon0
+
+        store = TrajectoryStore(root / "bulk")
+        size = sum(f.stat().st_size for f in (root / "bulk").rglob("*.bin"))
+        idx = rng.integers(0, len(store), 20000)
+        t0 = time.perf_counter()
+        for i in idx:
+            store.step(int(i))
+        rand_us = (time.perf_counter() - t0) / len(idx) * 1e6
+        eps = rng.integers(0, len(store.episodes), 2000)
+        t0 = time.perf_counter()
+        for k in eps:
+            store.episode(int(k), ["obs", "action"])
+        ep_us = (time.perf_counter() - t0) / len(eps) * 1e6
+        t0 = time.perf_counter()
+        total = 0.0
+        for _, cols in store.iter_chunks(["obs", "reward"]):
+            total += float(cols["obs"].sum(dtype=np.float64)) + float(cols["reward"].sum(dtype=np.float64))
+        scan = len(store) / (time.perf_counter() - t0)
+        anon_read = _anon_mib() - anon0
+
+        print(f"{len(store)} steps, {len(store.episodes)} episodes, {size / 2 ** 20:.0f} MiB on disk "
+              f"({size / len(store):.0f} B/step)")
+        print(f"write: {bulk / 1e6:.2f} M steps/s whole episodes, {single / 1e3:.0f} k steps/s step by step")
+        print(f"read: random step {rand_us:.1f} us, random episode (obs+action) {ep_us:.1f} us, "
+              f"full scan {scan / 1e6:.1f} M steps/s")
+        print(f"heap growth: {anon_write:.1f} MiB after writing, {anon_read:.1f} MiB after reading "
+              f"(store: {size / 2 ** 20:.0f} MiB, read through the page cache)")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+# --------- CLI ----------
+if __name__ == "__main__":
+    from policy_server import DEFAULT_MODEL
+
+    ap = argparse.ArgumentParser(description="Record, replay and benchmark episode trajectory stores")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    rec = sub.add_parser("record", help="run the trained policy on seeded maps and store every step")
+    rec.add_argument("--out", default="runs/trajectories")
+    rec.add_argument("--model", default=DEFAULT_MODEL)
+    rec.add_argument("--episodes", type=int, default=100)
+    rec.add_argument("--first-seed", type=int, default=100_000)
+    rec.add_argument("--stochastic", action="store_true")
+    rep = sub.add_parser("replay", help="re-run stored episodes from their actions and check they match")
+    rep.add_argument("path")
+    rep.add_argument("--episode", type=int, default=None, help="one episode (default: all)")
+    rep.add_argument("--record", default=None, help="render the replay to a video / PNG directory")
+    bench = sub.add_parser("bench", help="write / random-access / scan throughput on a synthetic store")
+    bench.add_argument("--steps", type=int, default=2_000_000)
+    args = ap.parse_args()
+    {"record": _record, "replay": _replay, "bench": _bench}[args.cmd](args)
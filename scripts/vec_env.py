@@ -0,0 +1,267 @@
+from time import perf_counter
+from typing import Any, List, Optional, Sequence
+
+import numpy as np
+from stable_baselines3.common.vec_env import VecEnv
+
+from box_map import BoxMap
+from collision import swept_collides
+from distance_field import goal_directions
+from profiling import PhaseProfiler
+from rl_env import WarehouseNavEnv
+
+
+def _push(buf: np.ndarray, n: int, layer: np.ndarray):
+    """Append layer after buf[:n] -> (buffer, view of its n + 1 layers); capacity doubles when full."""
+    if n == len(buf) or buf.dtype != layer.dtype:
+        grown = np.empty((max(2 * len(buf), n + 1),) + layer.shape, dtype=layer.dtype)
+        grown[:n] = buf[:n]
+        buf = grown
+    buf[n] = layer
+    return buf, buf[:n + 1]
+
+
+class WarehouseNavVecEnv(VecEnv):
+    """
+    N WarehouseNavEnv robots stepped together as stacked NumPy arrays (SB3 VecEnv interface):
+    - positions, headings, goals, step counters and previous goal distances are (N, ...) arrays
+    - physics, collision, reward and lidar for all robots run as single vectorized calls
+    - maps are built once per seed and shared; each robot indexes its map layer
+    Same dynamics and rewards as WarehouseNavEnv, with SB3-style auto-reset on done; shaping="geodesic"
+    and goal_features read a stacked (layers, H, W) array of GoalField distances the same way;
+    lidar="boxes" stacks the maps' BoxMaps into one multi-layer BoxMap instead of pixel grids.
+    profile=True records per-phase timings of each batched step in self.profiler.
+    """
+
+    def __init__(self, num_envs: int, width: int = 700, height: int = 500,
+                 num_rays: int = 8, ray_dist: int = 80, lidar: str = "raycast", profile=False,
+                 collision: str = "endpoint", speed: float = 4.0, shaping: str = "euclidean",
+                 goal_features: bool = False):
+        # single-robot env used as the source of spaces, physics constants and map building
+        self.proto = WarehouseNavEnv(width, height, num_rays=num_rays, ray_dist=ray_dist, lidar=lidar,
+                                     collision=collision, speed=speed, shaping=shaping,
+                                     goal_features=goal_features)
+        self.W, self.H = width, height
+        self.render_mode = None
+        super().__init__(num_envs, self.proto.observation_space, self.proto.action_space)
+
+        p = self.proto
+        self.ROBOT_R, self.SPEED, self.TURN = p.ROBOT_R, p.SPEED, p.TURN
+        self.max_steps = p.max_steps
+        self.collision = p.collision
+        self.shaping, self.goal_features = p.shaping, p.goal_features
+        self.ray_caster = p.ray_caster
+        self.profiler = profile if isinstance(profile, PhaseProfiler) else (PhaseProfiler() if profile else None)
+
+        # map layers, one per distinct seed seen so far; _grids / _goal_dists are views of the first
+        # layers of buffers that grow geometrically (_push), so new seeds never copy the whole stack
+        self._layer_of_seed = {}
+        self._grids = np.empty((0, self.H, self.W), dtype=np.uint8)
+        self._goal_dists = np.empty((0, self.H, self.W), dtype=np.float32)
+        self._grids_buf, self._goal_dists_buf = self._grids, self._goal_dists
+        self._boxes: Optional[BoxMap] = None
+
+        # batched robot state
+        n = num_envs
+        self.pos = np.zeros((n, 2), dtype=np.float32)  # float32 like WarehouseNavEnv.pos
+        self.heading = np.zeros(n)
+        self.goal = np.tile([self.W - 40.0, self.H - 40.0], (n, 1))
+        self.prev_goal_dist = np.zeros(n)
+        self.steps = np.zeros(n, dtype=np.int64)
+        self.layer = np.zeros(n, dtype=np.intp)
+        self._actions = np.zeros(n, dtype=np.int64)
+
+    # --------- maps ----------
+    def _map_layer(self, seed: Optional[int]) -> int:
+        key = seed if seed is not None else 42
+        layer = self._layer_of_seed.get(key)
+        if layer is None:
+            self.proto._build_map(key)
+            if self.proto.boxes is not None:
+                boxes = self.proto.boxes
+                # a private copy first: the map's own BoxMap lives in the shared MapCache
+                self._boxes = BoxMap.stack([boxes]) if self._boxes is None else self._boxes.append(boxes)
+            else:
+                grid = self.proto.field.clearance if self.proto.field is not None else self.proto.inflated_mask
+                self._grids_buf, self._grids = _push(self._grids_buf, len(self._grids), grid)
+            if self.proto.goal_field is not None:
+                self._goal_dists_buf, self._goal_dists = _push(self._goal_dists_buf, len(self._goal_dists),
+                                                               self.proto.goal_field.dist)
+            layer = self._layer_of_seed[key] = len(self._layer_of_seed)
+        return layer
+
+    def _blocked(self, xi: np.ndarray, yi: np.ndarray, layer: np.ndarray) -> np.ndarray:
+        if self._boxes is not None:
+            return self._boxes.collides(xi, yi, layer)
+        oob = (xi.view(np.uintp) >= self.W) | (yi.view(np.uintp) >= self.H)
+        vals = self._grids[layer, np.clip(yi, 0, self.H - 1), np.clip(xi, 0, self.W - 1)]
+        blocked = vals < 0 if self.proto.field is not None else vals > 0
+        return oob | blocked
+
+    # --------- batched geometry ----------
+    def _goal_distance(self, idx=slice(None)) -> np.ndarray:
+        return np.hypot(*(self.goal[idx] - self.pos[idx]).T)
+
+    def _geodesic_distance(self, idx=slice(None)) -> np.ndarray:
+        """GoalField distance per robot, straight-line where it is not finite (as WarehouseNavEnv)."""
+        xi, yi = self.pos[idx, 0].astype(np.intp), self.pos[idx, 1].astype(np.intp)
+        inside = (xi >= 0) & (xi < self.W) & (yi >= 0) & (yi < self.H)
+        d = np.where(inside, self._goal_dists[self.layer[idx], np.clip(yi, 0, self.H - 1),
+                                              np.clip(xi, 0, self.W - 1)], np.inf).astype(np.float64)
+        bad = ~np.isfinite(d)
+        if bad.any():
+            d[bad] = self._goal_distance(idx)[bad]
+        return d
+
+    def _shaping_distance(self, idx=slice(None)) -> np.ndarray:
+        return self._geodesic_distance(idx) if self.shaping == "geodesic" else self._goal_distance(idx)
+
+    def _observe(self, idx=slice(None)) -> np.ndarray:
+        d = self.goal[idx] - self.pos[idx]
+        h = self.heading[idx]
+        grids = self._boxes if self._boxes is not None else self._grids
+        rays = self.ray_caster.cast_batch(grids, self.pos[idx], h, self.layer[idx])
+        n_rays = rays.shape[1]
+        obs = np.empty((len(h), 4 + n_rays + 3 * self.goal_features), dtype=np.float32)
+        obs[:, 0] = d[:, 0] / self.W
+        obs[:, 1] = d[:, 1] / self.H
+        obs[:, 2] = np.cos(h)
+        obs[:, 3] = np.sin(h)
+        obs[:, 4:4 + n_rays] = rays
+        if self.goal_features:
+            xi, yi = self.pos[idx, 0].astype(np.intp), self.pos[idx, 1].astype(np.intp)
+            obs[:, -3] = np.minimum(self._geodesic_distance(idx) / (self.W + self.H), 1.0)
+            obs[:, -2:] = goal_directions(self._goal_dists, self.layer[idx], xi, yi, self.goal[idx])
+        return obs
+
+    def _reset_envs(self, idx: np.ndarray):
+        for i in idx:
+            self.layer[i] = self._map_layer(self._seeds[i])
+        self.pos[idx] = (40.0, 40.0)
+        self.heading[idx] = 0.0
+        self.steps[idx] = 0
+        self.prev_goal_dist[idx] = self._shaping_distance(idx)
+
+    # --------- VecEnv API ----------
+    def reset(self) -> np.ndarray:
+        idx = np.arange(self.num_envs)
+        self._reset_envs(idx)
+        self._reset_seeds()
+        self._reset_options()
+        self.reset_infos = [{} for _ in range(self.num_envs)]
+        return self._observe()
+
+    def step_async(self, actions: np.ndarray) -> None:
+        self._actions = np.asarray(actions).reshape(self.num_envs)
+
+    def step_wait(self):
+        prof = self.profiler
+        if prof is not None:
+            t0 = perf_counter()
+        a = self._actions
+        self.steps += 1
+        self.heading += self.TURN * ((a == 2).astype(np.float64) - (a == 1))
+
+        # propose new position (forward move each step), truncated like int()
+        tx = self.pos[:, 0] + (np.cos(self.heading) * self.SPEED).astype(np.float32)
+        ty = self.pos[:, 1] + (np.sin(self.heading) * self.SPEED).astype(np.float32)
+        nx, ny = tx.astype(np.intp), ty.astype(np.intp)
+
+        if prof is not None:
+            t1 = perf_counter()
+            prof.add("action", t1 - t0)
+
+        rewards = np.full(self.num_envs, -0.01)
+        if self.collision == "swept" and self._boxes is not None:
+            collided = self._boxes.swept_collides(self.pos[:, 0], self.pos[:, 1], tx, ty, self.layer)
+        elif self.collision == "swept":
+            collided = swept_collides(self._grids, self.pos[:, 0], self.pos[:, 1], tx, ty, self.layer,
+                                      clearance=self.proto.field is not None)
+        else:
+            collided = self._blocked(nx, ny, self.layer)
+        rewards[collided] -= 10.0
+
+        moved = ~collided
+        self.pos[moved, 0] = nx[moved]
+        self.pos[moved, 1] = ny[moved]
+        d = self._shaping_distance()
+        rewards[moved] += (self.prev_goal_dist[moved] - d[moved]) * 5.0
+        self.prev_goal_dist[moved] = d[moved]
+
+        success = (self._goal_distance() if self.shaping == "geodesic" else d) < 20.0
+        rewards[success] += 100.0
+        terminated = collided | success
+        truncated = self.steps >= self.max_steps
+        dones = terminated | truncated
+        if prof is not None:
+            t2 = perf_counter()
+            prof.add("collision", t2 - t1)
+
+        obs = self._observe()
+        if prof is not None:
+            t3 = perf_counter()
+            prof.add("observe", t3 - t2)
+        infos: List[dict] = [{} for _ in range(self.num_envs)]
+        done_idx = np.flatnonzero(dones)
+        if done_idx.size:
+            for i in done_idx:
+                infos[i]["terminal_observation"] = obs[i].copy()
+                infos[i]["TimeLimit.truncated"] = bool(truncated[i] and not terminated[i])
+            self._reset_envs(done_idx)
+            self._reset_seeds()
+            obs[done_idx] = self._observe(done_idx)
+            if prof is not None:
+                prof.add("reset", perf_counter() - t3)
+        if prof is not None:
+            prof.add("step", perf_counter() - t0)
+
+        return obs, rewards.astype(np.float32), dones, infos
+
+    def close(self) -> None:
+        self.proto.close()
+
+    def _indices(self, indices) -> Sequence[int]:
+        if indices is None:
+            return range(self.num_envs)
+        if isinstance(indices, int):
+            return [indices]
+        return indices
+
+    def get_attr(self, attr_name: str, indices=None) -> List[Any]:
+        value = getattr(self, attr_name)
+        if isinstance(value, np.ndarray) and value.shape[:1] == (self.num_envs,):
+            return [value[i] for i in self._indices(indices)]
+        return [value for _ in self._indices(indices)]
+
+    def set_attr(self, attr_name: str, value: Any, indices=None) -> None:
+        current = getattr(self, attr_name, None)
+        if isinstance(current, np.ndarray) and current.shape[:1] == (self.num_envs,):
+            current[list(self._indices(indices))] = value
+        else:
+            setattr(self, attr_name, value)
+
+    def env_method(self, method_name: str, *method_args, indices=None, **method_kwargs) -> List[Any]:
+        """
+        One result per index from calling method_name on the shared prototype WarehouseNavEnv (maps,
+        spaces, constants, map building). Robot state lives in this env's arrays, not in the
+        prototype, so methods that read a robot's pose see the prototype's own.
+        """
+        method = getattr(self.proto, method_name)
+        return [method(*method_args, **method_kwargs) for _ in self._indices(indices)]
+
+    def env_is_wrapped(self, wrapper_class, indices=None) -> List[bool]:
+        return [False for _ in self._indices(indices)]
+
+
+if __name__ == "__main__":
+    # quick smoke test + throughput
+    import time
+
+    for n in (1, 64, 256, 1024):
+        venv = WarehouseNavVecEnv(n)
+        venv.reset()
+        t0 = time.perf_counter()
+        for _ in range(200):
+            obs, rew, done, info = venv.step(np.random.randint(0, 3, size=n))
+        dt = time.perf_counter() - t0
+        print(f"n_envs={n:5d}  {200 * n / dt:10.0f} env-steps/s")